@@ -0,0 +1,362 @@
+"""
+Benchmarks for the edk-sar hot paths on synthetic data.
+
+    python -m benchmarks.run --sizes small medium
+    python -m benchmarks.run --save-baseline benchmarks/baseline.json
+    python -m benchmarks.run --baseline benchmarks/baseline.json --threshold 0.2
+
+Every measurement runs in a fresh process: the timed runs without any
+memory tracking, then one run for the peak RSS growth (sampled, above the RSS
+after setup) and one under tracemalloc for the peak Python allocations. With
+--baseline the run fails (exit code 1) when a case is slower than the stored
+time by more than --threshold, or uses more memory than stored by more than
+--memory-threshold.
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import tracemalloc
+import multiprocessing
+
+# Number of SLC zips in the footprint benchmarks, per size
+N_SCENES = {"small": 10, "medium": 50, "large": 100}
+# Memory growth below this never counts as a regression (allocator noise)
+MEMORY_SLACK_MB = 1.0
+MEMORY_KEYS = ("alloc_peak_mb", "peak_rss_mb")
+
+
+def _prepare(size, work_dir):
+    from benchmarks import synthetic
+
+    shape = synthetic.SIZES[size]
+    inputs = {"shape": shape}
+    inputs["lon"], inputs["lat"] = synthetic.write_geometry(
+        os.path.join(work_dir, "geom"), shape
+    )
+    inputs["slcs"] = synthetic.write_slc_stack(
+        os.path.join(work_dir, "slcs"), N_SCENES[size]
+    )
+    return inputs
+
+
+def _interferogram(inputs):
+    import xarray as xr
+    from benchmarks import synthetic
+
+    arr = synthetic.make_interferogram(inputs["shape"])[None]
+    return xr.DataArray(arr, dims=("band", "y", "x"), name="interferogram")
+
+
+def _coherence(inputs):
+    import xarray as xr
+    from benchmarks import synthetic
+
+    arr = synthetic.make_coherence(inputs["shape"])[None]
+    return xr.DataArray(arr, dims=("band", "y", "x"), name="coherence")
+
+
+# Each case returns (setup, run): setup is untimed, run(state) is timed.
+
+
+def case_common_bbox_cold(inputs, work_dir):
+    from edk_sar.workflows.base import helpers
+
+    cache_path = os.path.join(work_dir, "footprints_cold.json")
+
+    def setup():
+        # Every repeat starts without the footprint cache
+        if os.path.exists(cache_path):
+            os.remove(cache_path)
+
+    return setup, lambda _: helpers.get_bboxes(inputs["slcs"], cache_path=cache_path)
+
+
+def case_common_bbox_warm(inputs, work_dir):
+    from edk_sar.workflows.base import helpers
+
+    cache_path = os.path.join(work_dir, "footprints_warm.json")
+
+    def setup():
+        helpers.get_bboxes(inputs["slcs"], cache_path=cache_path)
+
+    return setup, lambda _: helpers.get_bboxes(inputs["slcs"], cache_path=cache_path)
+
+
+def case_geocode_index_build(inputs, work_dir):
+    from edk_sar import geocoding
+
+    return None, lambda _: geocoding.GeolocationIndex.build(
+        inputs["lon"], inputs["lat"]
+    )
+
+
+def case_geocode_index(inputs, work_dir):
+    from edk_sar import geocoding
+
+    def setup():
+        geocoding.get_geolocation_index(inputs["lon"], inputs["lat"])
+        return _interferogram(inputs)
+
+    return setup, lambda da: da.edk.geocode(inputs["lon"], inputs["lat"])
+
+
+def case_geocode_streaming(inputs, work_dir):
+    from edk_sar import geocoding
+
+    def setup():
+        geocoding.get_geolocation_index(inputs["lon"], inputs["lat"])
+        return _interferogram(inputs).chunk({"y": 256})
+
+    return setup, lambda da: da.edk.geocode(
+        inputs["lon"], inputs["lat"], max_memory=16 * 1024**2
+    )
+
+
+def case_geocode_warp(inputs, work_dir):
+    return (
+        lambda: _interferogram(inputs),
+        lambda da: da.edk.geocode(inputs["lon"], inputs["lat"], use_index=False),
+    )
+
+
+def case_export_cog(inputs, work_dir):
+    out_path = os.path.join(work_dir, "export.tif")
+
+    def setup():
+        return _coherence(inputs).edk.geocode(inputs["lon"], inputs["lat"])
+
+    return setup, lambda da: da.edk.export(out_path)
+
+
+def case_coherence(inputs, work_dir):
+    import xarray as xr
+    from benchmarks import synthetic
+
+    def setup():
+        slc1 = synthetic.make_interferogram(inputs["shape"], seed=1)
+        slc2 = synthetic.make_interferogram(inputs["shape"], seed=2)
+        return xr.DataArray(slc1, dims=("y", "x")), xr.DataArray(slc2, dims=("y", "x"))
+
+    return setup, lambda pair: pair[0].edk.coherence(pair[1], window=(11, 11))
+
+
+def case_datashader_pyramid_build(inputs, work_dir):
+    def setup():
+        from edk_sar.edk_datashader import PyramidGrid
+
+        da = _coherence(inputs).edk.geocode(inputs["lon"], inputs["lat"])
+        da = da.sel(band=1)
+        return da, PyramidGrid.from_dataarray(da, cache_dir=work_dir)
+
+    def run(state):
+        from edk_sar.edk_datashader import Pyramid
+
+        da, grid = state
+        return Pyramid.build(da, os.path.join(work_dir, "pyramid_build"), grid)
+
+    return setup, run
+
+
+def _geocoded_layers(inputs, n):
+    da = _coherence(inputs).edk.geocode(inputs["lon"], inputs["lat"]).sel(band=1)
+    return {f"layer_{i}": da + i for i in range(n)}
+
+
+def _datashader_case(inputs, work_dir, n_layers):
+    def setup():
+        from edk_sar.edk_datashader import Datashader
+
+        m = Datashader(_geocoded_layers(inputs, n_layers), cache_dir=work_dir)
+        grid = m.get_grid()
+        for layer in m.layers.values():
+            layer.get_pyramid(work_dir, grid=grid)
+        return m
+
+    # Full-extent view, as rendered when the map is first shown
+    return setup, lambda m: m.rasterize()()
+
+
+def case_datashader_rasterize(inputs, work_dir):
+    return _datashader_case(inputs, work_dir, 1)
+
+
+def case_datashader_rasterize_5_layers(inputs, work_dir):
+    return _datashader_case(inputs, work_dir, 5)
+
+
+CASES = {
+    name[len("case_") :]: func
+    for name, func in sorted(globals().items())
+    if name.startswith("case_")
+}
+
+
+def _run_case(name, work_dir, inputs_path, mode, queue):
+    # Child process: untimed setup, then one run measured according to mode
+    import logging
+    import edk_sar  # noqa: F401  (registers the .edk accessors)
+    from edk_sar import tracing
+
+    logging.disable(logging.INFO)
+    with open(inputs_path) as f:
+        inputs = json.load(f)
+    inputs["shape"] = tuple(inputs["shape"])
+
+    setup, run = CASES[name](inputs, work_dir)
+    state = setup() if setup else None
+
+    if mode == "time":
+        start = time.perf_counter()
+        run(state)
+        queue.put({"seconds": time.perf_counter() - start})
+    elif mode == "rss":
+        # The span's sampled peak above the RSS it started with
+        tracing.enable()
+        with tracing.trace("benchmark"):
+            run(state)
+        event = [e for e in tracing.get_events() if e["name"] == "benchmark"][-1]
+        peak = event["args"]["peak_rss_bytes"]
+        queue.put({"peak_rss_mb": peak / 1e6 if peak is not None else None})
+    else:
+        tracemalloc.start()
+        run(state)
+        _, alloc_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        queue.put({"alloc_peak_mb": alloc_peak / 1e6})
+
+
+def _measure(ctx, name, size, size_dir, inputs_path, mode):
+    queue = ctx.Queue()
+    proc = ctx.Process(
+        target=_run_case, args=(name, size_dir, inputs_path, mode, queue)
+    )
+    proc.start()
+    proc.join()
+    if proc.exitcode != 0:
+        raise RuntimeError(f"Benchmark {name}[{size}] failed ({mode})")
+    return queue.get()
+
+
+def run_benchmarks(sizes, cases, work_dir, repeat=1):
+    ctx = multiprocessing.get_context("spawn")
+    results = {}
+    for size in sizes:
+        size_dir = os.path.join(work_dir, size)
+        os.makedirs(size_dir, exist_ok=True)
+        inputs_path = os.path.join(size_dir, "inputs.json")
+        with open(inputs_path, "w") as f:
+            json.dump(_prepare(size, size_dir), f)
+
+        for name in cases:
+            # Best of the repeats is the least noisy time estimate
+            seconds = min(
+                _measure(ctx, name, size, size_dir, inputs_path, "time")["seconds"]
+                for _ in range(repeat)
+            )
+            result = {"seconds": seconds}
+            result.update(_measure(ctx, name, size, size_dir, inputs_path, "rss"))
+            result.update(_measure(ctx, name, size, size_dir, inputs_path, "alloc"))
+            results[f"{name}[{size}]"] = result
+
+            rss = result["peak_rss_mb"]
+            print(
+                f"{name + '[' + size + ']':<40} {seconds:>9.3f} s "
+                f"{result['alloc_peak_mb']:>9.1f} MB alloc "
+                + (f"{rss:>9.1f} MB RSS" if rss is not None else "      n/a RSS")
+            )
+    return results
+
+
+def _is_regression(key, value, ref, threshold):
+    if value is None or ref is None:
+        return False
+    if key in MEMORY_KEYS and value - ref <= MEMORY_SLACK_MB:
+        return False
+    return value > ref * (1 + threshold)
+
+
+def compare(results, baseline, threshold, memory_threshold=None):
+    """
+    Compares seconds against threshold and the memory peaks against
+    memory_threshold (threshold when None). Returns the regressed
+    "case[size] metric" names.
+    """
+    memory_threshold = threshold if memory_threshold is None else memory_threshold
+    regressions = []
+    for case, result in results.items():
+        if case not in baseline:
+            continue
+        for key, unit in (
+            ("seconds", "s"),
+            ("alloc_peak_mb", "MB"),
+            ("peak_rss_mb", "MB"),
+        ):
+            ref = baseline[case].get(key)
+            value = result.get(key)
+            if ref is None or value is None:
+                continue
+            limit = threshold if key == "seconds" else memory_threshold
+            status = "REGRESSION" if _is_regression(key, value, ref, limit) else "ok"
+            ratio = f"{value / ref:.2f}x" if ref else "n/a"
+            print(
+                f"{case:<40} {key:<14} {ref:>9.3f} {unit} -> {value:>9.3f} {unit} "
+                f"({ratio}) {status}"
+            )
+            if status != "ok":
+                regressions.append(f"{case} {key}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--sizes", nargs="+", default=["small"], choices=["small", "medium", "large"]
+    )
+    parser.add_argument("--cases", nargs="+", default=list(CASES), choices=list(CASES))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--baseline", help="JSON results to compare against")
+    parser.add_argument(
+        "--threshold", type=float, default=0.2, help="allowed slowdown, 0.2 = 20%%"
+    )
+    parser.add_argument(
+        "--memory-threshold",
+        type=float,
+        help="allowed peak memory growth (default: --threshold)",
+    )
+    parser.add_argument("--save-baseline", help="write the results to this JSON file")
+    parser.add_argument(
+        "--work-dir", help="keep synthetic inputs here instead of a temp dir"
+    )
+    args = parser.parse_args(argv)
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="edk_sar_bench_")
+    # Isolate the benchmark caches from the user's
+    os.environ["EDK_SAR_CACHE_DIR"] = os.path.join(work_dir, "cache")
+    try:
+        results = run_benchmarks(args.sizes, args.cases, work_dir, repeat=args.repeat)
+    finally:
+        if not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(
+                results, json.load(f), args.threshold, args.memory_threshold
+            )
+        if regressions:
+            print(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
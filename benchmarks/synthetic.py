@@ -0,0 +1,157 @@
+"""
+Synthetic inputs for the benchmarks: Sentinel-1-like SLC zips, complex
+interferograms and curvilinear lon/lat geometry rasters. Everything is
+generated locally, no Docker or ISCE2 needed.
+"""
+
+import os
+import zipfile
+import numpy as np
+from osgeo import gdal, osr
+
+gdal.UseExceptions()
+
+SIZES = {
+    "small": (512, 512),
+    "medium": (2048, 2048),
+    "large": (4096, 4096),
+}
+
+# Roughly Mount Etna
+CENTER_LON = 15.0
+CENTER_LAT = 37.75
+
+
+def make_geometry(shape, extent_deg=0.5, rotation_deg=12.0):
+    """
+    Curvilinear lon/lat arrays of a radar-like geometry: a rotated, slightly
+    sheared grid around CENTER_LON/CENTER_LAT.
+    """
+    ny, nx = shape
+    az, rg = np.meshgrid(
+        np.linspace(-0.5, 0.5, ny), np.linspace(-0.5, 0.5, nx), indexing="ij"
+    )
+    theta = np.deg2rad(rotation_deg)
+    lon = CENTER_LON + extent_deg * (np.cos(theta) * rg - np.sin(theta) * az)
+    lat = CENTER_LAT + extent_deg * (np.sin(theta) * rg + np.cos(theta) * az)
+    # Range-dependent shear, like the ground-range stretching of a real swath
+    lon += 0.03 * extent_deg * rg**2
+    return lon, lat
+
+
+def make_interferogram(shape, seed=0):
+    # Deformation bowl fringes plus noise, complex64
+    rng = np.random.default_rng(seed)
+    ny, nx = shape
+    y, x = np.ogrid[-1 : 1 : complex(0, ny), -1 : 1 : complex(0, nx)]
+    phase = 12 * np.pi * np.exp(-(x**2 + y**2) / 0.2)
+    amp = 1 + 0.1 * rng.standard_normal(shape)
+    noise = 0.3 * rng.standard_normal(shape)
+    return (amp * np.exp(1j * (phase + noise))).astype(np.complex64)
+
+
+def make_coherence(shape, seed=0):
+    rng = np.random.default_rng(seed)
+    return np.clip(0.6 + 0.2 * rng.standard_normal(shape), 0, 1).astype(np.float32)
+
+
+def write_raster(path, arr, driver="GTiff"):
+    if arr.ndim == 2:
+        arr = arr[np.newaxis]
+    nb, ny, nx = arr.shape
+    gdal_type = gdal.GetDataTypeByName(
+        {
+            np.dtype("float32"): "Float32",
+            np.dtype("float64"): "Float64",
+            np.dtype("complex64"): "CFloat32",
+            np.dtype("int16"): "Int16",
+        }[arr.dtype]
+    )
+    ds = gdal.GetDriverByName(driver).Create(path, nx, ny, nb, gdal_type)
+    for i in range(nb):
+        ds.GetRasterBand(i + 1).WriteArray(arr[i])
+    ds = None
+    return path
+
+
+def write_geometry(out_dir, shape):
+    os.makedirs(out_dir, exist_ok=True)
+    lon, lat = make_geometry(shape)
+    lon_path = write_raster(os.path.join(out_dir, "lon.rdr.tif"), lon)
+    lat_path = write_raster(os.path.join(out_dir, "lat.rdr.tif"), lat)
+    return lon_path, lat_path
+
+
+def get_annotation_xml(lon, lat, step=32):
+    points = []
+    for i in range(0, lon.shape[0], step):
+        for j in range(0, lon.shape[1], step):
+            points.append(
+                "<geolocationGridPoint>"
+                f"<line>{i}</line><pixel>{j}</pixel>"
+                f"<latitude>{lat[i, j]}</latitude><longitude>{lon[i, j]}</longitude>"
+                "<height>0</height>"
+                "</geolocationGridPoint>"
+            )
+    return (
+        "<product><geolocationGrid>"
+        f'<geolocationGridPointList count="{len(points)}">'
+        + "".join(points)
+        + "</geolocationGridPointList></geolocationGrid></product>"
+    )
+
+
+def get_gcp_tiff_bytes(lon, lat, step=32):
+    # A small complex measurement TIFF carrying GCPs, like the S1 SLC rasters
+    ny, nx = lon.shape
+    path = f"/vsimem/synthetic_{os.getpid()}_{id(lon)}.tiff"
+    ds = gdal.GetDriverByName("GTiff").Create(path, nx, ny, 1, gdal.GDT_CInt16)
+    gcps = [
+        gdal.GCP(float(lon[i, j]), float(lat[i, j]), 0.0, j + 0.5, i + 0.5)
+        for i in range(0, ny, step)
+        for j in range(0, nx, step)
+    ]
+    srs = osr.SpatialReference()
+    srs.ImportFromEPSG(4326)
+    ds.SetGCPs(gcps, srs.ExportToWkt())
+    ds = None
+
+    f = gdal.VSIFOpenL(path, "rb")
+    gdal.VSIFSeekL(f, 0, 2)
+    size = gdal.VSIFTellL(f)
+    gdal.VSIFSeekL(f, 0, 0)
+    data = gdal.VSIFReadL(1, size, f)
+    gdal.VSIFCloseL(f)
+    gdal.Unlink(path)
+    return data
+
+
+def write_slc_zip(path, date, offset_deg=0.0, shape=(256, 256), swaths=3):
+    """
+    Sentinel-1-like SLC zip: manifest, one annotation XML and one GCP'd
+    measurement TIFF per swath. offset_deg shifts the footprint slightly so
+    the stack has a non-trivial common bounding box.
+    """
+    name = f"S1A_IW_SLC__1SDV_{date}T050000_{date}T050030_000000_000000_0000"
+    safe = f"{name}.SAFE/"
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_STORED) as zf:
+        zf.writestr(safe + "manifest.safe", "<manifest/>")
+        for swath in range(1, swaths + 1):
+            lon, lat = make_geometry(shape, extent_deg=0.3)
+            lon = lon + offset_deg + 0.25 * (swath - 2)
+            lat = lat + offset_deg
+            stem = f"s1a-iw{swath}-slc-vv-{date}t050000-{date}t050030-000000-000000-00{swath}"
+            zf.writestr(safe + f"annotation/{stem}.xml", get_annotation_xml(lon, lat))
+            zf.writestr(safe + f"annotation/calibration/calibration-{stem}.xml", "<c/>")
+            zf.writestr(safe + f"measurement/{stem}.tiff", get_gcp_tiff_bytes(lon, lat))
+    return path
+
+
+def write_slc_stack(out_dir, n_scenes, shape=(256, 256)):
+    os.makedirs(out_dir, exist_ok=True)
+    paths = []
+    for k in range(n_scenes):
+        date = f"2024{1 + (k // 28) % 12:02d}{1 + k % 28:02d}"
+        path = os.path.join(out_dir, f"scene_{k:03d}.zip")
+        paths.append(write_slc_zip(path, date, offset_deg=0.01 * (k % 5), shape=shape))
+    return paths
@@ -1,7 +1,13 @@
 import edk_sar.workflows
 import edk_sar.frameworks
+import edk_sar.geocoding
+import edk_sar.cog
+import edk_sar.insar
+import edk_sar.readers
+import edk_sar.timeseries
 import edk_sar.xarray_accessor
 import edk_sar.constants
+import edk_sar.tracing
 
 import logging
 import os
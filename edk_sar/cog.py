@@ -0,0 +1,164 @@
+import os
+import logging
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from osgeo import gdal, gdal_array, osr
+from edk_sar.geocoding import iter_row_windows
+
+gdal.UseExceptions()
+
+logger = logging.getLogger(__name__)
+
+# Source window budget for streaming export, in bytes
+DEFAULT_MAX_MEMORY = 256 * 1024**2
+BLOCK_SIZE = 512
+# Compressions that accept a PREDICTOR creation option
+PREDICTOR_COMPRESSIONS = ("LZW", "DEFLATE", "ZSTD")
+
+
+def get_predictor(dtype, compress=None):
+    # Horizontal differencing for integers, floating point predictor for
+    # floats; complex data, and compressions without predictor, get none.
+    if compress is not None and compress.upper() not in PREDICTOR_COMPRESSIONS:
+        return None
+    dtype = np.dtype(dtype)
+    if np.issubdtype(dtype, np.integer):
+        return "STANDARD"
+    if np.issubdtype(dtype, np.floating):
+        return "FLOATING_POINT"
+    return None
+
+
+def get_overview_levels(ny, nx, min_size=BLOCK_SIZE):
+    # Power-of-two factors until the overview fits in one block
+    levels = []
+    factor = 2
+    while max(ny, nx) / factor >= min_size / 2:
+        levels.append(factor)
+        factor *= 2
+    return levels
+
+
+def get_geotransform(da):
+    lon = da["lon"].values
+    lat = da["lat"].values
+    dx = lon[1] - lon[0] if lon.size > 1 else 1.0
+    dy = lat[1] - lat[0] if lat.size > 1 else -1.0
+    return (lon[0] - dx / 2, dx, 0.0, lat[0] - dy / 2, 0.0, dy)
+
+
+def block_mean(arr, factor):
+    # (band, y, x) -> block averages; edges are padded by replication the
+    # way GDAL sizes overviews (ceil(n / factor)).
+    nb, ny, nx = arr.shape
+    pad_y = -ny % factor
+    pad_x = -nx % factor
+    if pad_y or pad_x:
+        arr = np.pad(arr, ((0, 0), (0, pad_y), (0, pad_x)), mode="edge")
+    nb, ny, nx = arr.shape
+    blocks = arr.reshape(nb, ny // factor, factor, nx // factor, factor)
+    return blocks.mean(axis=(2, 4)).astype(arr.dtype)
+
+
+def write_cog(
+    da,
+    output_path,
+    compress="LZW",
+    num_threads="ALL_CPUS",
+    max_memory=DEFAULT_MAX_MEMORY,
+):
+    """
+    Streams a geocoded (band, lat, lon) DataArray to a Cloud Optimized GeoTIFF.
+
+    Row windows (dask chunks when present) are computed one at a time and
+    written to a tiled GTiff together with their contribution to every
+    overview level, so neither the array nor the written file is ever read
+    back whole. The file is then laid out as a COG, reusing those overviews,
+    with multi-threaded compression and a dtype-appropriate predictor.
+    """
+    if da.ndim == 2:
+        da = da.expand_dims("band")
+    nb, ny, nx = da.shape
+
+    levels = get_overview_levels(ny, nx)
+    # Windows must start on multiples of the largest overview factor
+    align = levels[-1] if levels else 1
+    row_bytes = nb * nx * da.dtype.itemsize
+    max_rows = max(align, int(max_memory // row_bytes) // align * align)
+
+    tmp_path = f"{output_path}.{os.getpid()}.tmp.tif"
+    tmp_ds = gdal.GetDriverByName("GTiff").Create(
+        tmp_path,
+        nx,
+        ny,
+        nb,
+        gdal_array.NumericTypeCodeToGDALTypeCode(da.dtype),
+        options=[
+            "TILED=YES",
+            f"BLOCKXSIZE={BLOCK_SIZE}",
+            f"BLOCKYSIZE={BLOCK_SIZE}",
+            "BIGTIFF=IF_SAFER",
+        ],
+    )
+    srs = osr.SpatialReference()
+    srs.ImportFromEPSG(4326)
+    tmp_ds.SetProjection(srs.ExportToWkt())
+    tmp_ds.SetGeoTransform(get_geotransform(da))
+    if levels:
+        # Empty overview IFDs, filled window by window below
+        tmp_ds.BuildOverviews("NONE", levels)
+
+    try:
+        for y0, y1 in iter_row_windows(da, max_rows):
+            if y0 % align:
+                # Dask chunk boundary not aligned with the overview grid;
+                # re-read from the aligned start so every block is complete.
+                y0 -= y0 % align
+            window = np.asarray(da[:, y0:y1, :].values)
+            for i in range(nb):
+                band = tmp_ds.GetRasterBand(i + 1)
+                band.WriteArray(window[i], 0, y0)
+
+            for k, factor in enumerate(levels):
+                reduced = block_mean(window, factor)
+                for i in range(nb):
+                    ovr = tmp_ds.GetRasterBand(i + 1).GetOverview(k)
+                    rows = min(reduced.shape[1], ovr.YSize - y0 // factor)
+                    ovr.WriteArray(reduced[i, :rows], 0, y0 // factor)
+        tmp_ds.FlushCache()
+        tmp_ds = None
+
+        options = [
+            f"COMPRESS={compress}",
+            f"NUM_THREADS={num_threads}",
+            "BLOCKSIZE=512",
+            "OVERVIEWS=FORCE_USE_EXISTING" if levels else "OVERVIEWS=NONE",
+            "BIGTIFF=IF_SAFER",
+        ]
+        predictor = get_predictor(da.dtype, compress)
+        if predictor:
+            options.append(f"PREDICTOR={predictor}")
+
+        cog_ds = gdal.Translate(
+            output_path, tmp_path, format="COG", creationOptions=options
+        )
+        cog_ds = None
+    finally:
+        tmp_ds = None
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    return output_path
+
+
+def export_many(das, output_paths, max_workers=None, **kwargs):
+    """
+    Exports several DataArrays concurrently; extra keyword arguments go to
+    EDKAccessor.export.
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = [
+            pool.submit(da.edk.export, path, **kwargs)
+            for da, path in zip(das, output_paths)
+        ]
+        return [f.result() for f in futures]
@@ -1,2 +1,12 @@
+import os
+
 SENTINEL_WAVELENGTH = 0.056
 PI = 3.141592653589793
+
+# Host side of the /data mount of the ISCE2 container
+DATA_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "data"))
+
+# Persistent cache for derived artefacts (geolocation indices, footprints, ...)
+CACHE_DIR = os.environ.get(
+    "EDK_SAR_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "edk_sar")
+)
@@ -1,3 +1,7 @@
+import os
+import json
+import hashlib
+import logging
 import numpy as np
 import xarray as xr
 import rioxarray
@@ -12,63 +16,553 @@ from holoviews import opts
 from holoviews.operation.datashader import rasterize, shade
 import datashader.transfer_functions as tf
 from holoviews.operation import decimate
-from osgeo import osr
 from pyproj import Transformer
+from edk_sar.constants import CACHE_DIR
 
 hv.extension("bokeh")
 gv.extension("bokeh")
 pn.extension()
 
+logger = logging.getLogger(__name__)
 
-class Datashader:
-    def __init__(self, da):
-        if da.ndim == 2 and "lon" in da.coords and "lat" in da.coords:
-            self.da = da
-        else:
-            raise ValueError(
-                "DataArray must have lon and lat coordinates and should have only two dimensions"
+PLOT_WIDTH = 600
+PLOT_HEIGHT = 600
+# Rows averaged at a time while building a pyramid level
+PYRAMID_BLOCK_ROWS = 2048
+
+# Named colormaps accepted by plot(colors=...)
+CMAPS = {"linear": cc.fire, "cyclic": cc.colorwheel, "diverging": cc.coolwarm}
+
+# Web Mercator (plot coordinates) -> lon/lat, built once per process
+MERCATOR_TO_LONLAT = Transformer.from_crs("EPSG:3857", "EPSG:4326", always_xy=True)
+
+
+def get_cmap(colors):
+    """
+    Colormap for datashader: a CMAPS key, a colorcet palette name, a single
+    color or a list of colors.
+    """
+    if colors is None:
+        return CMAPS["linear"]
+    if isinstance(colors, str):
+        if colors in CMAPS:
+            return CMAPS[colors]
+        if colors in cc.palette:
+            return cc.palette[colors]
+        return [colors]
+    return list(colors)
+
+
+def get_fingerprint(da, sample=64):
+    """
+    Cheap identity of a geocoded layer: shape, dtype, grid and a strided
+    sample of the values.
+    """
+    h = hashlib.sha1()
+    lon = da["lon"].values
+    lat = da["lat"].values
+    h.update(
+        json.dumps(
+            [
+                da.shape,
+                str(da.dtype),
+                str(da.name),
+                [float(lon[0]), float(lon[-1]), float(lat[0]), float(lat[-1])],
+            ]
+        ).encode()
+    )
+    step_y = max(1, da.shape[0] // sample)
+    step_x = max(1, da.shape[1] // sample)
+    h.update(np.ascontiguousarray(da[::step_y, ::step_x].values).tobytes())
+    return h.hexdigest()
+
+
+def _block_nanmean(arr, factor=2):
+    # (y, x) float array -> NaN-aware factor x factor block means
+    ny, nx = arr.shape
+    pad_y = -ny % factor
+    pad_x = -nx % factor
+    arr = np.pad(arr, ((0, pad_y), (0, pad_x)), constant_values=np.nan)
+    blocks = arr.reshape(arr.shape[0] // factor, factor, arr.shape[1] // factor, factor)
+    valid = ~np.isnan(blocks)
+    total = np.where(valid, blocks, 0).sum(axis=(1, 3))
+    count = valid.sum(axis=(1, 3))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return (total / count).astype(np.float32)
+
+
+def _coarsen_coords(coords, factor=2):
+    n = len(coords)
+    pad = -n % factor
+    # Extrapolate the regular spacing for the padded tail
+    if pad:
+        step = coords[-1] - coords[-2] if n > 1 else 1.0
+        coords = np.concatenate([coords, coords[-1] + step * np.arange(1, pad + 1)])
+    return coords.reshape(-1, factor).mean(axis=1)
+
+
+class PyramidGrid:
+    """
+    Web-Mercator coordinates of every pyramid level of a lon/lat grid.
+
+    Level 0 is the full grid, each level halves the previous one until it
+    fits min_size. The coordinates are projected once per grid and stored as
+    .npy files under CACHE_DIR/pyramids/<key>/, shared by every layer on that
+    grid.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "levels.json")) as f:
+            self.shapes = [tuple(shape) for shape in json.load(f)["shapes"]]
+        self.n_levels = len(self.shapes)
+        self.levels = [
+            (
+                np.load(os.path.join(path, f"x_{k}.npy")),
+                np.load(os.path.join(path, f"y_{k}.npy")),
             )
+            for k in range(self.n_levels)
+        ]
 
-    def rasterize(self):
-        lon = self.da["lon"].values  # 1D
-        lat = self.da["lat"].values  # 1D
+    @staticmethod
+    def get_key(lon, lat, min_size=PLOT_WIDTH):
+        h = hashlib.sha1(str(min_size).encode())
+        h.update(np.ascontiguousarray(lon, np.float64).tobytes())
+        h.update(np.ascontiguousarray(lat, np.float64).tobytes())
+        return h.hexdigest()
 
-        vals = self.da.values
-        x_merc, y_merc = ds.utils.lnglat_to_meters(lon, lat)
+    @classmethod
+    def build(cls, lon, lat, path, min_size=PLOT_WIDTH):
+        os.makedirs(path, exist_ok=True)
+        shapes = []
+        while True:
+            x_merc, y_merc = ds.utils.lnglat_to_meters(lon, lat)
+            np.save(os.path.join(path, f"x_{len(shapes)}.npy"), x_merc)
+            np.save(os.path.join(path, f"y_{len(shapes)}.npy"), y_merc)
+            shapes.append((len(lat), len(lon)))
+            if max(len(lat), len(lon)) <= min_size:
+                break
+            lon = _coarsen_coords(lon)
+            lat = _coarsen_coords(lat)
 
-        quad = hv.QuadMesh((x_merc, y_merc, vals), kdims=["lon", "lat"])
+        # Written last: its presence marks a complete grid
+        with open(os.path.join(path, "levels.json"), "w") as f:
+            json.dump({"shapes": shapes}, f)
+        return cls(path)
 
-        dyn = rasterize(quad)
+    @classmethod
+    def from_dataarray(cls, da, cache_dir=None, min_size=PLOT_WIDTH):
+        lon = da["lon"].values
+        lat = da["lat"].values
+        key = cls.get_key(lon, lat, min_size)
+        path = os.path.join(cache_dir or CACHE_DIR, "pyramids", key)
+        if not os.path.exists(os.path.join(path, "levels.json")):
+            return cls.build(lon, lat, path, min_size=min_size)
+        return cls(path)
 
-        # dyn = rasterize(img)  # this creates a dynamic, server-side aggregation
-        shaded = shade(dyn, cmap=cc.fire).opts(
-            width=600, height=600, tools=["tap"], active_tools=["tap"]
-        )
-        return shaded
+    def select_level(self, x_range=None, width=PLOT_WIDTH):
+        # Coarsest level that still has at least `width` pixels across the view
+        for k in reversed(range(self.n_levels)):
+            x = self.levels[k][0]
+            if not _is_set(x_range):
+                n = len(x)
+            else:
+                n = np.count_nonzero((x >= x_range[0]) & (x <= x_range[1]))
+            if n >= width:
+                return k
+        return 0
+
+    def get_window(self, k, x_range=None, y_range=None, pad=2):
+        # Row/column slices of level k covering the view (+ a small margin)
+        x, y = self.levels[k]
+        xs = slice(None)
+        ys = slice(None)
+        if _is_set(x_range):
+            i0, i1 = np.searchsorted(x, x_range)
+            xs = slice(max(i0 - pad, 0), i1 + pad)
+        if _is_set(y_range):
+            # Latitude (and so Mercator y) is usually descending
+            if y[0] > y[-1]:
+                i0 = len(y) - np.searchsorted(y[::-1], y_range[1], side="right")
+                i1 = len(y) - np.searchsorted(y[::-1], y_range[0], side="left")
+            else:
+                i0, i1 = np.searchsorted(y, y_range)
+            ys = slice(max(i0 - pad, 0), i1 + pad)
+        return ys, xs
+
+
+class Pyramid:
+    """
+    Overview pyramid of one geocoded 2-D layer on a PyramidGrid.
+
+    Level 0 is the layer itself, read window by window; levels 1 and up are
+    NaN-aware 2x2 block means stored as .npy files in <grid dir>/<fingerprint>/
+    and memory mapped, so building happens
+    once per dataset and views only touch the pixels they show. Only values
+    are stored per layer; coordinates come from the shared grid.
+    """
+
+    def __init__(self, grid, path, da):
+        self.grid = grid
+        self.path = path
+        self.n_levels = grid.n_levels
+        values = [da] + [
+            np.load(os.path.join(path, f"level_{k}.npy"), mmap_mode="r")
+            for k in range(1, self.n_levels)
+        ]
+        self.levels = [(x, y, level) for (x, y), level in zip(grid.levels, values)]
+
+    @classmethod
+    def build(cls, da, path, grid):
+        logger.info(f"Building display pyramid in {path}")
+        os.makedirs(path, exist_ok=True)
+
+        level = da
+        for k in range(1, grid.n_levels):
+            ny, nx = level.shape
+            next_level = np.lib.format.open_memmap(
+                os.path.join(path, f"level_{k}.npy"),
+                mode="w+",
+                dtype=np.float32,
+                shape=grid.shapes[k],
+            )
+            for y0 in range(0, ny, PYRAMID_BLOCK_ROWS):
+                block = np.asarray(level[y0 : y0 + PYRAMID_BLOCK_ROWS], np.float32)
+                next_level[y0 // 2 : (y0 + block.shape[0] + 1) // 2] = _block_nanmean(
+                    block
+                )
+            next_level.flush()
+            level = next_level
+
+        # Written last: its presence marks a complete pyramid
+        with open(os.path.join(path, "levels.json"), "w") as f:
+            json.dump({"n_levels": grid.n_levels}, f)
+        return cls(grid, path, da)
+
+    @classmethod
+    def from_dataarray(cls, da, cache_dir=None, grid=None):
+        grid = grid or PyramidGrid.from_dataarray(da, cache_dir=cache_dir)
+        path = os.path.join(grid.path, get_fingerprint(da))
+        if not os.path.exists(os.path.join(path, "levels.json")):
+            return cls.build(da, path, grid)
+        return cls(grid, path, da)
+
+    def select_level(self, x_range=None, width=PLOT_WIDTH):
+        return self.grid.select_level(x_range, width=width)
+
+    def get_window(self, k, x_range=None, y_range=None, pad=2):
+        return self.grid.get_window(k, x_range, y_range, pad=pad)
+
+    def window(self, k, x_range=None, y_range=None, pad=2):
+        # Coordinates and values of level k inside the view
+        x, y, level = self.levels[k]
+        ys, xs = self.get_window(k, x_range, y_range, pad=pad)
+        return x[xs], y[ys], np.asarray(level[ys, xs])
+
+
+class GridLocator:
+    """
+    Nearest-pixel lookup on a lon/lat grid. Regular grids (what geocoding
+    produces) are resolved by index arithmetic, others by binary search.
+    """
+
+    def __init__(self, lon, lat):
+        self.lon = np.asarray(lon)
+        self.lat = np.asarray(lat)
+        self._lon_step = self._get_step(self.lon)
+        self._lat_step = self._get_step(self.lat)
+
+    @staticmethod
+    def _get_step(coords):
+        if coords.size < 2:
+            return None
+        step = (coords[-1] - coords[0]) / (coords.size - 1)
+        if np.allclose(np.diff(coords), step, rtol=1e-6, atol=0):
+            return step
+        return None
+
+    @staticmethod
+    def _nearest(coords, step, value):
+        n = coords.size
+        if step is not None:
+            i = int(round((value - coords[0]) / step))
+        else:
+            ascending = coords[-1] >= coords[0]
+            c = coords if ascending else coords[::-1]
+            i = int(np.clip(np.searchsorted(c, value), 1, n - 1))
+            i = i - 1 if value - c[i - 1] < c[i] - value else i
+            i = i if ascending else n - 1 - i
+        if 0 <= i < n:
+            return i
+        return None
+
+    def locate(self, lon, lat):
+        # (row, col) of the nearest pixel, or None outside the grid
+        row = self._nearest(self.lat, self._lat_step, lat)
+        col = self._nearest(self.lon, self._lon_step, lon)
+        if row is None or col is None:
+            return None
+        return row, col
+
+
+class PixelInspector:
+    """
+    Point queries over several geocoded layers. Layers are 2-D (lat, lon) or
+    stacks with leading dimensions (e.g. (date, lat, lon)); a stack returns
+    the values of every date. Only the queried pixel is read, so lazily
+    loaded and memory-mapped stacks stay on disk.
+    """
+
+    def __init__(self, layers):
+        self.layers = dict(layers)
+        # One locator per distinct grid
+        self._locators = {}
+        for name, da in self.layers.items():
+            key = self._grid_key(da)
+            if key not in self._locators:
+                self._locators[key] = GridLocator(da["lon"].values, da["lat"].values)
 
-    def opacity(self, shaded):
-        alpha_slider = pn.widgets.FloatSlider(
-            name="Opacity", start=0.0, end=1.0, step=0.01, value=0.8
+    @staticmethod
+    def _grid_key(da):
+        lon = da["lon"]
+        lat = da["lat"]
+        return (
+            lon.size,
+            lat.size,
+            float(lon[0]),
+            float(lon[-1]),
+            float(lat[0]),
+            float(lat[-1]),
         )
 
-        # ---- 4. Tie the slider's value to the plot's 'alpha' option
-        # apply.opts will "replay" opts reactively when the parameter changes
-        shaded_with_alpha = shaded.apply.opts(alpha=alpha_slider.param.value)
-        return shaded_with_alpha, alpha_slider
+    def query_lonlat(self, lon, lat, names=None):
+        """
+        Values of every layer (or only `names`) at the pixel nearest to
+        lon/lat: a scalar for 2-D layers, a DataArray over the leading
+        dimensions for stacks, None when the point falls outside that layer.
+        """
+        values = {}
+        for name in names or self.layers:
+            da = self.layers[name]
+            loc = self._locators[self._grid_key(da)].locate(lon, lat)
+            if loc is None:
+                values[name] = None
+                continue
+            pixel = da.isel(lat=loc[0], lon=loc[1])
+            values[name] = pixel.values.item() if pixel.ndim == 0 else pixel.load()
+        return values
+
+    def query(self, x, y):
+        # x, y in Web Mercator, as reported by the plot streams
+        lon, lat = MERCATOR_TO_LONLAT.transform(x, y)
+        return lon, lat, self.query_lonlat(lon, lat)
+
+
+class Layer:
+    """
+    One plotted variable: its colormap, opacity and (lazily built) pyramid.
+    Complex data is plotted as phase.
+    """
+
+    def __init__(self, name, da, colors="linear", opacity=0.8):
+        if np.iscomplexobj(da):
+            logger.info(f"Found complex layer {name}, will plot phase")
+            da = xr.apply_ufunc(np.angle, da, dask="allowed")
+        self.name = name
+        self.da = da
+        self.cmap = get_cmap(colors)
+        self.opacity = 0.8 if opacity is None else opacity
+        self._pyramid = None
+
+    def get_pyramid(self, cache_dir=None, grid=None):
+        if self._pyramid is None:
+            self._pyramid = Pyramid.from_dataarray(
+                self.da, cache_dir=cache_dir, grid=grid
+            )
+        return self._pyramid
+
+
+def _is_set(view_range):
+    return view_range is not None and None not in view_range
+
+
+def _per_layer(value, name):
+    # plot options may be given once for all layers or as {name: value}
+    if isinstance(value, dict):
+        return value.get(name)
+    return value
+
+
+class Datashader:
+    """
+    Interactive map of one or more geocoded layers on the same lon/lat grid.
+
+    The pyramid level and view window are resolved once per pan/zoom and
+    shared by every layer; each visible layer is then aggregated on the same
+    datashader canvas and shaded with its own colormap. Hidden layers are
+    not computed at all, and opacity changes reuse the cached images.
+    """
+
+    def __init__(
+        self, layers, cache_dir=None, inspect=None, colors="linear", opacity=0.8
+    ):
+        if isinstance(layers, xr.DataArray):
+            layers = {layers.name or "value": layers}
+
+        self.layers = {}
+        for name, da in layers.items():
+            if not (da.ndim == 2 and "lon" in da.coords and "lat" in da.coords):
+                raise ValueError(
+                    "DataArray must have lon and lat coordinates and should have only two dimensions"
+                )
+            self.layers[name] = Layer(
+                name,
+                da,
+                colors=_per_layer(colors, name),
+                opacity=_per_layer(opacity, name),
+            )
+
+        grids = {PixelInspector._grid_key(layer.da) for layer in self.layers.values()}
+        if len(grids) > 1:
+            raise ValueError("All layers must share the same lon/lat grid")
+
+        self.cache_dir = cache_dir
+        # Layers queried on tap/hover besides the plotted ones, e.g. a
+        # memory-mapped (date, lat, lon) interferogram stack
+        inspected = {name: layer.da for name, layer in self.layers.items()}
+        inspected.update(inspect or {})
+        self.inspector = PixelInspector(inspected)
+
+        # Mercator coordinates of the shared grid, projected once for all layers
+        self._grid = None
+        # Shaded images of the current view, by layer name
+        self._view_key = None
+        self._images = {}
+
+    @property
+    def da(self):
+        return next(iter(self.layers.values())).da
+
+    def get_grid(self):
+        if self._grid is None:
+            self._grid = PyramidGrid.from_dataarray(self.da, cache_dir=self.cache_dir)
+        return self._grid
+
+    def _shade_view(self, x_range, y_range, visible):
+        if not visible:
+            return {}
+        # Level and window depend only on the grid, shared by every layer
+        grid = self.get_grid()
+        pyramids = {
+            name: self.layers[name].get_pyramid(self.cache_dir, grid=grid)
+            for name in visible
+        }
+        k = grid.select_level(x_range, width=PLOT_WIDTH)
+        ys, xs = grid.get_window(k, x_range, y_range)
+        x, y = grid.levels[k]
+        x, y = x[xs], y[ys]
+        flip = y.size > 1 and y[0] > y[-1]
+        if flip:
+            y = y[::-1]
+
+        key = (k, ys.start, ys.stop, xs.start, xs.stop)
+        if key != self._view_key:
+            self._view_key = key
+            self._images = {}
+
+        canvas = None
+        for name, pyramid in pyramids.items():
+            if name in self._images:
+                continue
+            if canvas is None:
+                # One canvas per view, shared by every layer
+                canvas = ds.Canvas(
+                    plot_width=PLOT_WIDTH,
+                    plot_height=PLOT_HEIGHT,
+                    x_range=(x[0], x[-1]) if not _is_set(x_range) else x_range,
+                    y_range=(y[0], y[-1]) if not _is_set(y_range) else y_range,
+                )
+            vals = np.asarray(pyramid.levels[k][2][ys, xs])
+            if flip:
+                vals = vals[::-1]
+            quad = xr.DataArray(vals, coords={"y": y, "x": x}, dims=("y", "x"))
+            agg = canvas.quadmesh(quad, x="x", y="y")
+            self._images[name] = tf.shade(agg, cmap=self.layers[name].cmap)
+        return {name: self._images[name] for name in visible}
+
+    def rasterize(self, visible=None, **opacities):
+        """
+        Overlay of the visible layers for the current view, as hv.RGB images.
+        opacities maps "opacity_<i>" to the opacity of the i-th layer.
+        """
+        names = list(self.layers)
+        if visible is None:
+            visible = names
+
+        def _view(x_range=None, y_range=None, visible=visible, **kwargs):
+            visible = [name for name in names if name in visible]
+            images = self._shade_view(x_range, y_range, visible)
+            elements = []
+            for name, img in images.items():
+                alpha = kwargs.get(
+                    f"opacity_{names.index(name)}", self.layers[name].opacity
+                )
+                rgba = img.data.view(np.uint8).reshape(img.shape + (4,))
+                rgb = hv.RGB(
+                    (
+                        img["x"].values,
+                        img["y"].values,
+                        rgba[..., 0],
+                        rgba[..., 1],
+                        rgba[..., 2],
+                        rgba[..., 3],
+                    ),
+                    vdims=list("RGBA"),
+                    label=name,
+                )
+                elements.append(rgb.opts(alpha=alpha))
+            return hv.Overlay(elements)
+
+        return _view
 
     def basemap(self):
         tiles = gv.tile_sources.OSM()
         return tiles
 
     def plot(self):
-        shaded = self.rasterize()
-        shaded_with_alpha, alpha_slider = self.opacity(shaded)
+        names = list(self.layers)
+
+        # Layer toggle and one opacity slider per layer; hiding a layer skips
+        # its aggregation, opacity changes reuse the shaded image
+        toggle = pn.widgets.CheckBoxGroup(name="Layers", options=names, value=names)
+        sliders = [
+            pn.widgets.FloatSlider(
+                name=f"{name} opacity",
+                start=0.0,
+                end=1.0,
+                step=0.01,
+                value=self.layers[name].opacity,
+            )
+            for name in names
+        ]
+        streams = [
+            hv.streams.RangeXY(),
+            hv.streams.Params(toggle, ["value"], rename={"value": "visible"}),
+        ]
+        streams += [
+            hv.streams.Params(slider, ["value"], rename={"value": f"opacity_{i}"})
+            for i, slider in enumerate(sliders)
+        ]
+        shaded = hv.DynamicMap(self.rasterize(), streams=streams).opts(
+            width=PLOT_WIDTH, height=PLOT_HEIGHT, tools=["tap"], active_tools=["tap"]
+        )
 
         # Interactivity
         #
-        # 4. Tap stream: listens for clicks on the plot
+        # Tap stream: listens for clicks on the plot
         #
-        tap_stream = hv.streams.Tap(source=shaded_with_alpha, x=None, y=None)
+        tap_stream = hv.streams.Tap(source=shaded, x=None, y=None)
+        hover_stream = hv.streams.PointerXY(source=shaded, x=None, y=None)
 
         #
         # 5. Popup panel, initially empty
@@ -79,49 +573,71 @@ class Datashader:
             collapsible=False,
             width=300,
         )
+        hover_md = pn.pane.Markdown("", width=600)
+
+        def _format_scalars(lon, lat, values):
+            lines = [f"lon: {lon:.5f}, lat: {lat:.5f}"]
+            for name, val in values.items():
+                if val is None or np.ndim(val) == 0:
+                    lines.append(f"{name}: {val}")
+            return lines
+
+        def _on_hover(x, y, **kwargs):
+            # Only 2-D layers are shown on hover, stacks are read on tap
+            if x is None or y is None:
+                return
+            lon, lat = MERCATOR_TO_LONLAT.transform(x, y)
+            flat = [n for n, da in self.inspector.layers.items() if da.ndim == 2]
+            values = self.inspector.query_lonlat(lon, lat, names=flat)
+            hover_md.object = " | ".join(_format_scalars(lon, lat, values))
 
         def _on_tap(x, y, **kwargs):
             """
-            x, y are in data coordinates where the user clicked.
-            We'll do 3 things:
-            - find nearest point in the original dataframe
-            - update popup text
-            - (optional) you could trigger more UI here: table, image, etc.
+            x, y are in Web Mercator where the user clicked. Shows the value of
+            every layer at that pixel and the full series of stacked layers.
             """
             if x is None or y is None:
                 return
             try:
-                # Convert lon, lat from EPSG:3857 to EPSG:4326
-                srs_3857 = osr.SpatialReference()
-                srs_3857.ImportFromEPSG(3857)
-                srs_4326 = osr.SpatialReference()
-                srs_4326.ImportFromEPSG(4326)
-                trans = osr.CoordinateTransformation(srs_3857, srs_4326)
-                lat, lon, _ = trans.TransformPoint(x, y)
-
-                val = self.da.sel(lon=lon, lat=lat, method="nearest").values
-
-                popup_md = f"""
-                    ### lon: {lon}
-                    ### lat: {lat}
-                    ### val: {val}
-                """
-                popup_card.objects = [pn.pane.Markdown(popup_md)]
+                lon, lat, values = self.inspector.query(x, y)
+                objects = [
+                    pn.pane.Markdown(
+                        "\n".join(
+                            f"### {line}" for line in _format_scalars(lon, lat, values)
+                        )
+                    )
+                ]
+                for name, val in values.items():
+                    if val is None or np.ndim(val) == 0:
+                        continue
+                    dim = val.dims[0]
+                    series, label = val.values, name
+                    if np.iscomplexobj(series):
+                        # Interferogram stacks: wrapped phase per pair
+                        series, label = np.angle(series), f"{name} phase"
+                    curve = hv.Curve((val[dim].values, series), dim, label).opts(
+                        width=280, height=200, title=label
+                    )
+                    objects.append(pn.pane.HoloViews(curve))
+                popup_card.objects = objects
             except Exception as e:
                 popup_md = f"""
                     ### Error: {e.__str__()}
                 """
                 popup_card.objects = [pn.pane.Markdown(popup_md)]
 
-        # connect the callback to the stream
+        # connect the callbacks to the streams
         tap_stream.add_subscriber(_on_tap)
+        hover_stream.add_subscriber(_on_hover)
 
         tiles = self.basemap()
 
         proj = ccrs.GOOGLE_MERCATOR  # Web Mercator in meters
-        map_view = (tiles * shaded_with_alpha).opts(
-            hv.opts.Overlay(projection=proj, frame_width=600)
+        map_view = (tiles * shaded).opts(
+            hv.opts.Overlay(projection=proj, frame_width=PLOT_WIDTH)
         )
 
-        m = pn.Row(pn.Column(alpha_slider, map_view), popup_card).servable()
+        m = pn.Row(
+            pn.Column(toggle, *sliders, map_view, hover_md), popup_card
+        ).servable()
         return m
@@ -1 +1,3 @@
+import edk_sar.frameworks.events
+import edk_sar.frameworks.backends
 import edk_sar.frameworks.isce2
@@ -0,0 +1,186 @@
+import os
+import re
+import shlex
+import logging
+import threading
+import subprocess
+import docker
+from edk_sar.constants import DATA_DIR
+from edk_sar.frameworks.events import LineBuffer
+
+logger = logging.getLogger(__name__)
+
+CONTAINER_NAME = "edk-sar-isce2"
+
+# Host side of the container mounts (see dockerfiles/docker-compose.yml)
+WORKSPACE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+def _print_output(line):
+    print(line)
+
+
+def _consume(chunks, get_exit_code, output):
+    # Emit whole lines only, however the output happened to be chunked
+    lines = LineBuffer()
+    for chunk in chunks:
+        for line in lines.feed(chunk):
+            output(line)
+    for line in lines.flush():
+        output(line)
+    return get_exit_code()
+
+
+def join_cmds(cmds):
+    # Several commands as a single shell invocation, stopping at the first failure
+    return f"bash -c {shlex.quote(' && '.join(cmds))}"
+
+
+class DockerBackend:
+    """
+    Runs commands in the ISCE2 container. The Docker client and the container
+    handle are created once and reused by every command.
+    """
+
+    def __init__(self, container_name=CONTAINER_NAME):
+        self.container_name = container_name
+        self._client = None
+        self._container = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        with self._lock:
+            if self._client is None:
+                self._client = docker.from_env()
+            return self._client
+
+    def get_container(self, refresh=False):
+        with self._lock:
+            if self._container is not None and not refresh:
+                return self._container
+
+        containers = self.client.containers.list(filters={"name": self.container_name})
+        if not containers:
+            raise RuntimeError(f"No running container named {self.container_name}")
+
+        with self._lock:
+            self._container = containers[0]
+            return self._container
+
+    def _exec_create(self, cmd):
+        container = self.get_container()
+        try:
+            return self.client.api.exec_create(
+                container.id, cmd, stdout=True, stderr=True
+            )["Id"]
+        except docker.errors.NotFound:
+            # Container was recreated since we cached it
+            container = self.get_container(refresh=True)
+            return self.client.api.exec_create(
+                container.id, cmd, stdout=True, stderr=True
+            )["Id"]
+
+    def stream(self, cmd):
+        """
+        Starts cmd and returns (chunks, get_exit_code): an iterator over raw
+        output chunks and a callable giving the exit code once it is exhausted.
+        """
+        exec_id = self._exec_create(cmd)
+        chunks = self.client.api.exec_start(exec_id, stream=True)
+        return chunks, lambda: self.client.api.exec_inspect(exec_id)["ExitCode"]
+
+    def run(self, cmd, output=_print_output):
+        chunks, get_exit_code = self.stream(cmd)
+        return _consume(chunks, get_exit_code, output)
+
+    def run_many(self, cmds, output=_print_output):
+        return self.run(join_cmds(cmds), output=output)
+
+    def get_stats(self):
+        """
+        Cumulative container counters: cpu_s, read_bytes, write_bytes and
+        memory_bytes. Commands running concurrently share the container, so
+        deltas around one command include the others.
+        """
+        stats = self.get_container().stats(stream=False, one_shot=True)
+
+        read_bytes = write_bytes = 0
+        blkio = stats.get("blkio_stats", {}).get("io_service_bytes_recursive") or []
+        for entry in blkio:
+            op = entry.get("op", "").lower()
+            if op == "read":
+                read_bytes += entry.get("value", 0)
+            elif op == "write":
+                write_bytes += entry.get("value", 0)
+
+        memory = stats.get("memory_stats", {})
+        return {
+            "cpu_s": stats["cpu_stats"]["cpu_usage"]["total_usage"] / 1e9,
+            "read_bytes": read_bytes,
+            "write_bytes": write_bytes,
+            "memory_bytes": memory.get("max_usage") or memory.get("usage", 0),
+        }
+
+
+class LocalBackend:
+    """
+    Runs the same commands as subprocesses on the host, with the container
+    mount points (/workspace, /data) mapped to their host directories. Useful
+    for tests and benchmarks on machines without Docker.
+    """
+
+    def __init__(self, path_map=None):
+        if path_map is None:
+            path_map = {"/workspace": WORKSPACE_DIR, "/data": DATA_DIR}
+        self.path_map = path_map
+
+    def map_paths(self, cmd):
+        for container_path, host_path in self.path_map.items():
+            pattern = r"(?<![\w./-])" + re.escape(container_path) + r"(?=/|\s|$|['\"])"
+            cmd = re.sub(pattern, lambda m: host_path, cmd)
+        return cmd
+
+    def stream(self, cmd):
+        proc = subprocess.Popen(
+            shlex.split(self.map_paths(cmd)),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+        )
+        chunks = iter(lambda: proc.stdout.read1(65536), b"")
+        return chunks, proc.wait
+
+    def run(self, cmd, output=_print_output):
+        chunks, get_exit_code = self.stream(cmd)
+        return _consume(chunks, get_exit_code, output)
+
+    def run_many(self, cmds, output=_print_output):
+        return self.run(join_cmds(cmds), output=output)
+
+    def get_stats(self):
+        # Host subprocesses are already accounted for by the tracing layer
+        return {}
+
+
+BACKENDS = {"docker": DockerBackend, "local": LocalBackend}
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    # Selected with EDK_SAR_BACKEND (docker or local), docker by default
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            name = os.environ.get("EDK_SAR_BACKEND", "docker").lower()
+            if name not in BACKENDS:
+                raise ValueError(f"Unknown execution backend {name}")
+            _backend = BACKENDS[name]()
+        return _backend
+
+
+def set_backend(backend):
+    global _backend
+    with _backend_lock:
+        _backend = backend
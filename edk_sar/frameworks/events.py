@@ -0,0 +1,93 @@
+import re
+import codecs
+import asyncio
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+RUN_FILE_RE = re.compile(r"run_files/(run_\d+_\w+)")
+PERCENT_RE = re.compile(r"(\d{1,3}(?:\.\d+)?)\s*%")
+
+
+class LineBuffer:
+    """
+    Turns a stream of raw output chunks into complete lines. Multi-byte
+    characters and lines split across chunks are held back until complete.
+    """
+
+    def __init__(self):
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._pending = ""
+
+    def feed(self, chunk):
+        text = self._pending + self._decoder.decode(chunk)
+        lines = text.split("\n")
+        self._pending = lines.pop()
+        return [line.rstrip("\r") for line in lines]
+
+    def flush(self):
+        text = self._pending + self._decoder.decode(b"", final=True)
+        self._pending = ""
+        return [text.rstrip("\r")] if text else []
+
+
+class EventBus:
+    """
+    Publishes progress events to subscribers. Subscribers are plain callables
+    or coroutine functions; the latter are scheduled on the running loop.
+    """
+
+    def __init__(self):
+        self._subscribers = []
+        self._lock = threading.Lock()
+
+    def subscribe(self, callback):
+        with self._lock:
+            self._subscribers.append(callback)
+        return callback
+
+    def unsubscribe(self, callback):
+        with self._lock:
+            self._subscribers.remove(callback)
+
+    def publish(self, event):
+        with self._lock:
+            subscribers = list(self._subscribers)
+
+        for callback in subscribers:
+            try:
+                result = callback(event)
+                if asyncio.iscoroutine(result):
+                    asyncio.ensure_future(result)
+            except Exception:
+                logger.exception(f"Progress subscriber {callback} failed")
+
+
+# Default bus that run_cmd_async publishes to
+bus = EventBus()
+
+
+def parse_progress(line, step=None, run_file=None):
+    """
+    Progress event for an output line, or None if it carries no progress
+    information. Events are dicts with step, run_file, percent and message.
+    """
+    run_file_match = RUN_FILE_RE.search(line)
+    if run_file_match:
+        run_file = run_file_match.group(1)
+
+    percent = None
+    percent_match = PERCENT_RE.search(line)
+    if percent_match and float(percent_match.group(1)) <= 100:
+        percent = float(percent_match.group(1))
+
+    if percent is None and run_file_match is None:
+        return None
+
+    return {
+        "step": step,
+        "run_file": run_file,
+        "percent": percent,
+        "message": line,
+    }
@@ -1,9 +1,18 @@
+import os
+import re
+import time
+import asyncio
+import threading
 import subprocess
-import docker
 import logging
+from edk_sar.constants import DATA_DIR
+from edk_sar import tracing
+from edk_sar.frameworks import backends, events
 
 logger = logging.getLogger(__name__)
 
+LOG_DIR = os.path.join(DATA_DIR, "logs")
+
 
 def init(env_path):
     docker_compose_path = "edk_sar/dockerfiles/docker-compose.yml"
@@ -25,18 +34,138 @@ def init(env_path):
 
 
 def get_container_id():
-    cmd = ["docker", "ps", "-q", "-f", "name=edk-sar-isce2"]
-    result = subprocess.run(cmd, capture_output=True, text=True)
-    return result.stdout.strip()
+    return backends.get_backend().get_container().id
+
+
+# Last container stats sample as (backend, stats), shared by traced commands
+_last_stats = (None, None)
+_last_stats_lock = threading.Lock()
+
+
+def _sample_stats(backend):
+    """
+    One stats sample per traced command, taken when it ends. Returns it with
+    the previous sample of the same backend (None for the first), so the
+    counter deltas cover the container's activity since the last command.
+    """
+    global _last_stats
+    stats = backend.get_stats()
+    with _last_stats_lock:
+        prev_backend, prev = _last_stats
+        _last_stats = (backend, stats)
+    return stats, prev if prev_backend is backend else None
+
+
+def _run_traced(name, cmd, run):
+    backend = backends.get_backend()
+    if not tracing.is_enabled():
+        return run(backend)
 
+    with tracing.trace(name, cmd=cmd) as span:
+        exit_code = run(backend)
+        stats, prev = _sample_stats(backend)
+        # What the command did inside the container, as seen by its cgroup
+        for key in ("cpu_s", "read_bytes", "write_bytes"):
+            if prev is not None and key in prev and key in stats:
+                span.args[f"container_{key}"] = stats[key] - prev[key]
+        if "memory_bytes" in stats:
+            span.args["container_memory_bytes"] = stats["memory_bytes"]
+        span.args["exit_code"] = exit_code
+    return exit_code
 
-def run_cmd(cmd):
+
+def _check(cmd, exit_code, check):
+    # Same contract as subprocess.run(check=True)
+    if check and exit_code:
+        raise subprocess.CalledProcessError(exit_code, cmd)
+    return exit_code
+
+
+def run_cmd(cmd, check=False):
     logger.info(f"Running command: {cmd}")
-    container_id = get_container_id()
-    client = docker.from_env()
-    container = client.containers.get(container_id)
-
-    # Stream output as it is produced
-    exec_result = container.exec_run(cmd, stdout=True, stderr=True, stream=True)
-    for chunk in exec_result.output:
-        print(chunk.decode().rstrip())
+    exit_code = _run_traced("run_cmd", cmd, lambda backend: backend.run(cmd))
+    return _check(cmd, exit_code, check)
+
+
+def run_cmds(cmds, check=False):
+    # Several commands in one exec; stops at the first failing one
+    logger.info(f"Running commands: {cmds}")
+    exit_code = _run_traced("run_cmds", cmds, lambda backend: backend.run_many(cmds))
+    return _check(cmds, exit_code, check)
+
+
+class CommandResult:
+    def __init__(self, cmd, exit_code, log_path, duration):
+        self.cmd = cmd
+        self.exit_code = exit_code
+        self.log_path = log_path
+        self.duration = duration
+
+    @property
+    def ok(self):
+        return self.exit_code == 0
+
+    def __repr__(self):
+        return f"CommandResult(exit_code={self.exit_code}, log_path={self.log_path!r})"
+
+
+async def run_cmd_async(cmd, step=None, log_dir=LOG_DIR, max_buffered=256, bus=None):
+    """
+    Runs cmd on the execution backend without blocking the event loop.
+
+    Output is split into whole lines and written to <log_dir>/<step>.log;
+    lines carrying progress (run file, percent) are published as events on bus
+    (events.bus by default). At most max_buffered output chunks are held in
+    memory; a slow consumer makes the reader wait rather than buffering more.
+    """
+    bus = bus or events.bus
+    loop = asyncio.get_running_loop()
+    backend = backends.get_backend()
+
+    step = step or re.sub(r"\W+", "_", cmd).strip("_")[:64]
+    os.makedirs(log_dir, exist_ok=True)
+    log_path = os.path.join(log_dir, f"{step}.log")
+    logger.info(f"Running command: {cmd} (log: {log_path})")
+
+    queue = asyncio.Queue(maxsize=max_buffered)
+    done = object()
+
+    def _read():
+        # Runs in a worker thread; blocks on a full queue (backpressure)
+        chunks, get_exit_code = backend.stream(cmd)
+        try:
+            for chunk in chunks:
+                asyncio.run_coroutine_threadsafe(queue.put(chunk), loop).result()
+            return get_exit_code()
+        finally:
+            asyncio.run_coroutine_threadsafe(queue.put(done), loop).result()
+
+    start = time.time()
+    reader = loop.run_in_executor(None, _read)
+
+    run_file = None
+    lines = events.LineBuffer()
+    with open(log_path, "w") as log:
+        while True:
+            chunk = await queue.get()
+            new_lines = lines.flush() if chunk is done else lines.feed(chunk)
+            for line in new_lines:
+                log.write(line + "\n")
+                event = events.parse_progress(line, step=step, run_file=run_file)
+                if event is not None:
+                    run_file = event["run_file"]
+                    bus.publish(event)
+            if chunk is done:
+                break
+
+    exit_code = await reader
+    result = CommandResult(cmd, exit_code, log_path, time.time() - start)
+    bus.publish(
+        {
+            "step": step,
+            "run_file": run_file,
+            "percent": 100.0 if result.ok else None,
+            "message": f"finished with exit code {exit_code}",
+        }
+    )
+    return result
@@ -0,0 +1,459 @@
+import os
+import hashlib
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+import numpy as np
+import xarray as xr
+from osgeo import gdal, gdal_array, osr
+from edk_sar.constants import CACHE_DIR
+
+gdal.UseExceptions()
+
+logger = logging.getLogger(__name__)
+
+# In-process cache (key -> Future of the index) so repeated geocode calls
+# don't even hit the disk
+_indices = {}
+_indices_lock = threading.Lock()
+
+# Default source window budget for streaming geocode, in bytes
+DEFAULT_MAX_MEMORY = 256 * 1024**2
+
+
+def get_geolocation_metadata(lon_rdr, lat_rdr):
+    srs = osr.SpatialReference()
+    srs.ImportFromEPSG(4326)
+
+    return {
+        "X_DATASET": lon_rdr,
+        "X_BAND": "1",
+        "Y_DATASET": lat_rdr,
+        "Y_BAND": "1",
+        "PIXEL_OFFSET": "0",
+        "LINE_OFFSET": "0",
+        "PIXEL_STEP": "1",
+        "LINE_STEP": "1",
+        "SRS": srs.ExportToWkt(),
+    }
+
+
+def get_coords(gt, nx, ny):
+    # Pixel-center coordinates for a north-up geotransform (x0, dx, rx, y0, ry, dy)
+    x0, dx, _, y0, _, dy = gt
+    x = x0 + dx * (np.arange(nx) + 0.5)
+    y = y0 + dy * (np.arange(ny) + 0.5)
+    return x, y
+
+
+def _file_identity(path):
+    # A VRT is only a pointer, so also fingerprint the raw file it wraps
+    paths = [path]
+    root, ext = os.path.splitext(path)
+    if ext.lower() == ".vrt" and os.path.exists(root):
+        paths.append(root)
+
+    parts = []
+    for p in paths:
+        st = os.stat(p)
+        parts.append(f"{os.path.abspath(p)}:{st.st_size}:{st.st_mtime_ns}")
+    return "|".join(parts)
+
+
+def get_index_key(lon_rdr, lat_rdr):
+    identity = f"{_file_identity(lon_rdr)}#{_file_identity(lat_rdr)}"
+    return hashlib.sha1(identity.encode()).hexdigest()
+
+
+class GeolocationIndex:
+    """
+    Radar-to-geo nearest-neighbour lookup table.
+
+    For every valid output pixel it stores the flat index of the radar pixel
+    that GDAL's geolocation warper would have picked, so geocoding any layer on
+    the same geometry reduces to a single gather.
+    """
+
+    def __init__(self, src_shape, dst_shape, geotransform, src_index, dst_index):
+        self.src_shape = tuple(int(s) for s in src_shape)
+        self.dst_shape = tuple(int(s) for s in dst_shape)
+        self.geotransform = tuple(float(g) for g in geotransform)
+        self.src_index = src_index
+        self.dst_index = dst_index
+        self._row_order = None
+
+    @classmethod
+    def build(cls, lon_rdr, lat_rdr):
+        logger.info(f"Building geolocation index for {lon_rdr}, {lat_rdr}")
+        lon_ds = gdal.Open(lon_rdr)
+        nx, ny = lon_ds.RasterXSize, lon_ds.RasterYSize
+        lon_ds = None
+
+        # Warp the radar row/column numbers themselves; the result tells us
+        # which source pixel landed on each output pixel.
+        src_ds = gdal.GetDriverByName("MEM").Create("", nx, ny, 2, gdal.GDT_Int32)
+        rows, cols = np.indices((ny, nx), dtype=np.int32)
+        src_ds.GetRasterBand(1).WriteArray(rows)
+        src_ds.GetRasterBand(2).WriteArray(cols)
+        del rows, cols
+        src_ds.SetMetadata(get_geolocation_metadata(lon_rdr, lat_rdr), "GEOLOCATION")
+
+        warped_ds = gdal.Warp(
+            "",
+            src_ds,
+            format="MEM",
+            dstSRS="EPSG:4326",
+            dstNodata=-1,
+            resampleAlg="near",
+            multithread=True,
+        )
+        src_ds = None
+
+        src_rows = warped_ds.GetRasterBand(1).ReadAsArray()
+        src_cols = warped_ds.GetRasterBand(2).ReadAsArray()
+        dst_shape = (warped_ds.RasterYSize, warped_ds.RasterXSize)
+        gt = warped_ds.GetGeoTransform()
+        warped_ds = None
+
+        valid = src_rows.ravel() >= 0
+        dst_index = np.flatnonzero(valid)
+        src_index = (
+            src_rows.ravel()[valid].astype(np.int64) * nx + src_cols.ravel()[valid]
+        )
+
+        return cls((ny, nx), dst_shape, gt, src_index, dst_index)
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(
+            tmp_path,
+            src_shape=np.array(self.src_shape),
+            dst_shape=np.array(self.dst_shape),
+            geotransform=np.array(self.geotransform),
+            src_index=self.src_index,
+            dst_index=self.dst_index,
+        )
+        # Atomic so concurrent runs never read a half-written index
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as f:
+            return cls(
+                f["src_shape"],
+                f["dst_shape"],
+                f["geotransform"],
+                f["src_index"],
+                f["dst_index"],
+            )
+
+    def coords(self):
+        ny, nx = self.dst_shape
+        return get_coords(self.geotransform, nx, ny)
+
+    def apply(self, arr, fill_value=0):
+        # arr: (band, y, x) in radar geometry -> (band, lat, lon)
+        nb = arr.shape[0]
+        if tuple(arr.shape[1:]) != self.src_shape:
+            raise ValueError(
+                f"DataArray shape {tuple(arr.shape[1:])} does not match geometry shape {self.src_shape}"
+            )
+
+        out = np.full(
+            (nb, self.dst_shape[0] * self.dst_shape[1]), fill_value, dtype=arr.dtype
+        )
+        src = arr.reshape(nb, -1)
+        for i in range(nb):
+            out[i, self.dst_index] = src[i, self.src_index]
+        return out.reshape((nb,) + self.dst_shape)
+
+    def _get_row_order(self):
+        # Lookup entries sorted by source pixel, so that the entries fed by a
+        # block of radar rows form one contiguous slice.
+        if self._row_order is None:
+            order = np.argsort(self.src_index, kind="stable")
+            self._row_order = (self.src_index[order], self.dst_index[order])
+        return self._row_order
+
+    def apply_windowed(self, da_src, max_memory, out=None, fill_value=0):
+        """
+        Streaming variant of apply: reads the source in row windows of at most
+        max_memory bytes and scatters each one into the (band, lat, lon) output.
+        """
+        nb, ny, nx = da_src.shape
+        if (ny, nx) != self.src_shape:
+            raise ValueError(
+                f"DataArray shape {(ny, nx)} does not match geometry shape {self.src_shape}"
+            )
+
+        dtype = da_src.dtype
+        if out is None:
+            out = np.full((nb,) + self.dst_shape, fill_value, dtype=dtype)
+        out_flat = out.reshape(nb, -1)
+
+        src_sorted, dst_sorted = self._get_row_order()
+        row_bytes = nb * nx * dtype.itemsize
+        for y0, y1 in iter_row_windows(da_src, max(1, int(max_memory // row_bytes))):
+            k0, k1 = np.searchsorted(src_sorted, [y0 * nx, y1 * nx])
+            if k0 == k1:
+                continue
+
+            window = np.asarray(da_src[:, y0:y1, :].values).reshape(nb, -1)
+            src = src_sorted[k0:k1] - y0 * nx
+            dst = dst_sorted[k0:k1]
+            for i in range(nb):
+                out_flat[i, dst] = window[i, src]
+
+        if isinstance(out, np.memmap):
+            out.flush()
+        return out
+
+    def geocode(self, da_src, max_memory=None, out_path=None):
+        nb = da_src.shape[0]
+        if max_memory is None and out_path is None:
+            out_arr = self.apply(da_src.values)
+        else:
+            out = None
+            if out_path is not None:
+                # Disk-backed output; pages are only touched as windows land
+                out = np.memmap(
+                    out_path,
+                    mode="w+",
+                    dtype=da_src.dtype,
+                    shape=(nb,) + self.dst_shape,
+                )
+            out_arr = self.apply_windowed(
+                da_src, max_memory or DEFAULT_MAX_MEMORY, out=out
+            )
+
+        x, y = self.coords()
+        return xr.DataArray(
+            out_arr,
+            dims=("band", "lat", "lon"),
+            coords={"band": 1 + np.arange(nb), "lat": y, "lon": x},
+            name=getattr(da_src, "name", None),
+        )
+
+
+def iter_row_windows(da_src, max_rows):
+    """
+    Yields (y0, y1) row windows of at most max_rows rows. For dask-backed arrays
+    windows never straddle a chunk boundary, so each chunk is computed once.
+    """
+    ny = da_src.shape[-2]
+    chunks = getattr(da_src, "chunks", None)
+    if chunks:
+        bounds = np.cumsum((0,) + tuple(chunks[-2]))
+    else:
+        bounds = np.array([0, ny])
+
+    for c0, c1 in zip(bounds[:-1], bounds[1:]):
+        for y0 in range(int(c0), int(c1), max_rows):
+            yield y0, min(y0 + max_rows, int(c1))
+
+
+def get_geolocation_index(lon_rdr, lat_rdr, cache_dir=None):
+    """
+    Returns the lookup index for a geometry, building and persisting it on first use.
+
+    The global lock only guards the lookup: each geometry gets a future that
+    the first caller fills, so indices of different geometries build in
+    parallel and callers of the same one wait for that single build.
+    """
+    key = get_index_key(lon_rdr, lat_rdr)
+    with _indices_lock:
+        future = _indices.get(key)
+        owner = future is None
+        if owner:
+            future = _indices[key] = Future()
+    if not owner:
+        return future.result()
+
+    try:
+        index_path = os.path.join(cache_dir or CACHE_DIR, "geolocation", f"{key}.npz")
+        if os.path.exists(index_path):
+            logger.debug(f"Loading geolocation index from {index_path}")
+            index = GeolocationIndex.load(index_path)
+        else:
+            index = GeolocationIndex.build(lon_rdr, lat_rdr)
+            index.save(index_path)
+    except BaseException as exc:
+        # Let a later call retry instead of caching the failure
+        with _indices_lock:
+            del _indices[key]
+        future.set_exception(exc)
+        raise
+
+    future.set_result(index)
+    return index
+
+
+def warp(da_src, lon_rdr, lat_rdr):
+    """
+    Full GDAL geolocation warp of a (band, y, x) DataArray.
+
+    The source is a MEM dataset pointing straight at the numpy buffer (no copy,
+    no compression, no named /vsimem file), so concurrent calls from several
+    threads never share any GDAL state.
+    """
+    arr = np.ascontiguousarray(da_src.values)
+    nb = arr.shape[0]
+
+    src_ds = gdal_array.OpenArray(arr)
+    if src_ds is None:
+        raise RuntimeError("Could not wrap array as a GDAL dataset")
+    # No geotransform/projection on source (curvilinear); GEOLOCATION arrays instead
+    src_ds.SetMetadata(get_geolocation_metadata(lon_rdr, lat_rdr), "GEOLOCATION")
+
+    warped_ds = gdal.Warp(
+        "",
+        src_ds,
+        format="MEM",
+        dstSRS="EPSG:4326",
+        multithread=True,
+    )
+    src_ds = None
+
+    out_arr = warped_ds.ReadAsArray()
+    if nb == 1:
+        out_arr = np.array([out_arr])
+
+    x, y = get_coords(
+        warped_ds.GetGeoTransform(), warped_ds.RasterXSize, warped_ds.RasterYSize
+    )
+    warped_ds = None
+
+    return xr.DataArray(
+        out_arr,
+        dims=("band", "lat", "lon"),
+        coords={"band": 1 + np.arange(nb), "lat": y, "lon": x},
+        name=getattr(da_src, "name", None),
+    )
+
+
+def _as_bands(da):
+    # (band, y, x) view of a 2-D or 3-D variable
+    return da.expand_dims("band") if da.ndim == 2 else da
+
+
+def _stream_members(index, members, out, max_memory):
+    """
+    Scatters the (band, y, x) members of one dtype group into the stacked
+    (band, lat, lon) out, one row window of every member at a time.
+    """
+    src_sorted, dst_sorted = index._get_row_order()
+    nx = index.src_shape[1]
+    out_flat = out.reshape(out.shape[0], -1)
+    row_bytes = out.shape[0] * nx * out.dtype.itemsize
+    max_rows = max(1, int(max_memory // row_bytes))
+
+    for y0, y1 in iter_row_windows(members[0], max_rows):
+        k0, k1 = np.searchsorted(src_sorted, [y0 * nx, y1 * nx])
+        if k0 == k1:
+            continue
+        src = src_sorted[k0:k1] - y0 * nx
+        dst = dst_sorted[k0:k1]
+        offset = 0
+        for da in members:
+            nb = da.shape[0]
+            window = np.asarray(da[:, y0:y1, :].values).reshape(nb, -1)
+            for i in range(nb):
+                out_flat[offset + i, dst] = window[i, src]
+            offset += nb
+    return out
+
+
+def geocode_dataset(ds, lon_rdr, lat_rdr, use_index=True, max_memory=None):
+    """
+    Geocodes every data variable of a Dataset sharing one radar geometry.
+
+    With the lookup index, variables of the same dtype are streamed together
+    in row windows of at most max_memory bytes: each window of every variable
+    is read once and scattered, so dask or memory-mapped variables are never
+    loaded whole. Without it, all variables are stacked in their common dtype
+    and warped once, then cast back. 2-D variables come back as (lat, lon);
+    band dimensions keep the coordinates they had, if any.
+    """
+    variables = {name: _as_bands(da) for name, da in ds.data_vars.items()}
+    for name, da in variables.items():
+        if da.ndim != 3:
+            raise ValueError(f"{name} has dims {da.dims}, expected 2 or 3")
+
+    warped = {}
+    if use_index:
+        index = get_geolocation_index(lon_rdr, lat_rdr)
+        x, y = index.coords()
+        groups = {}
+        for name, da in variables.items():
+            groups.setdefault(da.dtype, []).append(name)
+        for dtype, names in groups.items():
+            members = [variables[n] for n in names]
+            for da in members:
+                if tuple(da.shape[1:]) != index.src_shape:
+                    raise ValueError(
+                        f"Variable shape {tuple(da.shape[1:])} does not match "
+                        f"geometry shape {index.src_shape}"
+                    )
+            stacked = np.zeros(
+                (sum(da.shape[0] for da in members),) + index.dst_shape, dtype
+            )
+            _stream_members(index, members, stacked, max_memory or DEFAULT_MAX_MEMORY)
+            offset = 0
+            for name, da in zip(names, members):
+                warped[name] = stacked[offset : offset + da.shape[0]]
+                offset += da.shape[0]
+    else:
+        # GDAL needs the whole source in memory; one warp for all variables
+        dtype = np.result_type(*[da.dtype for da in variables.values()])
+        stacked = np.concatenate(
+            [np.asarray(da.values).astype(dtype) for da in variables.values()]
+        )
+        warped_da = warp(xr.DataArray(stacked), lon_rdr, lat_rdr)
+        del stacked
+        x, y = warped_da["lon"].values, warped_da["lat"].values
+        offset = 0
+        for name, da in variables.items():
+            part = warped_da.values[offset : offset + da.shape[0]]
+            if np.iscomplexobj(part) and not np.iscomplexobj(da):
+                part = part.real
+            warped[name] = part.astype(da.dtype, copy=False)
+            offset += da.shape[0]
+
+    out = {}
+    for name, da in ds.data_vars.items():
+        coords = {"lat": y, "lon": x}
+        if da.ndim == 2:
+            out[name] = xr.DataArray(
+                warped[name][0], dims=("lat", "lon"), coords=coords, attrs=da.attrs
+            )
+            continue
+        band_dim = da.dims[0]
+        # Only coordinates the input had: never align synthetic band labels
+        if band_dim in da.coords:
+            coords[band_dim] = da[band_dim].values
+        out[name] = xr.DataArray(
+            warped[name],
+            dims=(band_dim, "lat", "lon"),
+            coords=coords,
+            attrs=da.attrs,
+        )
+
+    return xr.Dataset(out, attrs=ds.attrs)
+
+
+def geocode_many(das, lon_rdr, lat_rdr, max_workers=None, **kwargs):
+    """
+    Geocodes several DataArrays on the same geometry concurrently in a thread
+    pool. GDAL and the numpy gathers release the GIL, so this scales across cores.
+    Extra keyword arguments are passed on to EDKAccessor.geocode.
+    """
+    if kwargs.get("use_index", True):
+        # Build (or load) the shared index once before fanning out
+        get_geolocation_index(lon_rdr, lat_rdr)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = [
+            pool.submit(da.edk.geocode, lon_rdr, lat_rdr, **kwargs) for da in das
+        ]
+        return [f.result() for f in futures]
@@ -0,0 +1,278 @@
+import os
+import logging
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from osgeo import gdal
+from edk_sar.constants import SENTINEL_WAVELENGTH, PI
+from edk_sar.geocoding import iter_row_windows
+
+gdal.UseExceptions()
+
+logger = logging.getLogger(__name__)
+
+# Source window budget for eager product computation, in bytes
+DEFAULT_MAX_MEMORY = 64 * 1024**2
+
+
+def get_real_dtype(dtype):
+    # complex64 -> float32, complex128 -> float64; float32 stays float32 and
+    # integers are computed in float32.
+    dtype = np.dtype(dtype)
+    if np.issubdtype(dtype, np.complexfloating):
+        return np.empty(0, dtype).real.dtype
+    if np.issubdtype(dtype, np.floating):
+        return dtype
+    return np.dtype(np.float32)
+
+
+def phase_kernel(arr, out=None):
+    # arctan2 on the real/imag views: no complex temporaries
+    out = np.empty(arr.shape, get_real_dtype(arr.dtype)) if out is None else out
+    return np.arctan2(arr.imag, arr.real, out=out)
+
+
+def amplitude_kernel(arr, out=None):
+    out = np.empty(arr.shape, get_real_dtype(arr.dtype)) if out is None else out
+    return np.abs(arr, out=out)
+
+
+def los_displacement_kernel(arr, wavelength=SENTINEL_WAVELENGTH, out=None):
+    # Complex input is an interferogram, real input is already phase. The scale
+    # is cast to the output dtype so float32 is never promoted.
+    out = np.empty(arr.shape, get_real_dtype(arr.dtype)) if out is None else out
+    scale = out.dtype.type(wavelength / (4 * PI))
+    if np.iscomplexobj(arr):
+        phase_kernel(arr, out=out)
+        return np.multiply(out, scale, out=out)
+    return np.multiply(arr, scale, out=out, casting="same_kind")
+
+
+def apply_kernel(da, kernel, out=None, max_memory=None, **kwargs):
+    """
+    Applies an elementwise kernel to a DataArray in one pass per window.
+
+    Dask-backed arrays stay lazy (the kernel runs per chunk) unless out is
+    given. Otherwise row windows are read one at a time and the kernel writes
+    straight into out (allocated when not given), so the only full-size
+    array is the result.
+    """
+    dtype = get_real_dtype(da.dtype)
+
+    if out is None and getattr(da, "chunks", None):
+        lazy = da.data.map_blocks(
+            kernel, dtype=dtype, meta=np.empty((0,) * da.ndim, dtype), **kwargs
+        )
+        return da.copy(data=lazy)
+
+    if out is None:
+        out = np.empty(da.shape, dtype)
+    elif out.shape != da.shape:
+        raise ValueError(f"out has shape {out.shape}, expected {da.shape}")
+
+    if da.ndim < 2:
+        kernel(np.asarray(da.values), out=out, **kwargs)
+    else:
+        row_bytes = da.dtype.itemsize * da.size // da.shape[-2]
+        max_rows = max(1, int((max_memory or DEFAULT_MAX_MEMORY) // max(row_bytes, 1)))
+        for y0, y1 in iter_row_windows(da, max_rows):
+            window = np.asarray(da[..., y0:y1, :].values)
+            kernel(window, out=out[..., y0:y1, :], **kwargs)
+
+    return da.copy(data=out)
+
+
+def phase(da, out=None, max_memory=None):
+    result = apply_kernel(da, phase_kernel, out=out, max_memory=max_memory)
+    result.attrs.update({"units": "radians"})
+    return result
+
+
+def amplitude(da, out=None, max_memory=None):
+    return apply_kernel(da, amplitude_kernel, out=out, max_memory=max_memory)
+
+
+def los_displacement(da, wavelength=SENTINEL_WAVELENGTH, out=None, max_memory=None):
+    result = apply_kernel(
+        da,
+        los_displacement_kernel,
+        out=out,
+        max_memory=max_memory,
+        wavelength=wavelength,
+    )
+    result.attrs.update({"units": "meters"})
+    return result
+
+
+def box_sum(arr, window):
+    """
+    Sum over a (rows, cols) window centred on every pixel of a 2-D array,
+    from cumulative sums along each axis: O(1) per pixel whatever the window
+    size. Windows are truncated at the array edges.
+    """
+    for axis, size in enumerate(window):
+        # Zero padding makes edge windows equal to their truncated sums
+        pad = [(0, 0)] * arr.ndim
+        pad[axis] = ((size - 1) // 2 + 1, size // 2)
+        csum = np.cumsum(np.pad(arr, pad), axis=axis)
+        hi = [slice(None)] * arr.ndim
+        lo = [slice(None)] * arr.ndim
+        hi[axis] = slice(size, None)
+        lo[axis] = slice(0, -size)
+        arr = csum[tuple(hi)] - csum[tuple(lo)]
+    return arr
+
+
+def coherence_kernel(slc1, slc2, window=(5, 5)):
+    # |<s1 s2*>| / sqrt(<|s1|^2> <|s2|^2>), accumulated in double precision
+    slc1 = slc1.astype(np.complex128, copy=False)
+    slc2 = slc2.astype(np.complex128, copy=False)
+    num = np.abs(box_sum(slc1 * np.conj(slc2), window))
+    den = np.sqrt(
+        box_sum(np.abs(slc1) ** 2, window) * box_sum(np.abs(slc2) ** 2, window)
+    )
+    with np.errstate(invalid="ignore", divide="ignore"):
+        coh = np.where(den > 0, num / den, 0)
+    return np.clip(coh, 0, 1).astype(np.float32)
+
+
+def coherence(
+    slc1,
+    slc2,
+    window=(5, 5),
+    tile_rows=512,
+    max_workers=None,
+    out=None,
+):
+    """
+    Windowed coherence of two coregistered complex DataArrays of the same
+    shape, (y, x) or stacks such as (pair, y, x). window is (azimuth, range)
+    pixels or a single odd size.
+
+    The image is split into row tiles read with a halo of half a window, so
+    results match a whole-image computation, and tiles are processed on a
+    thread pool. Output is float32, written into out when given.
+    """
+    if isinstance(window, int):
+        window = (window, window)
+    if slc1.shape != slc2.shape:
+        raise ValueError(f"Shapes differ: {slc1.shape} vs {slc2.shape}")
+
+    ny = slc1.shape[-2]
+    if out is None:
+        out = np.empty(slc1.shape, np.float32)
+    elif out.shape != slc1.shape:
+        raise ValueError(f"out has shape {out.shape}, expected {slc1.shape}")
+
+    halo = window[0] // 2
+    lead_shape = slc1.shape[:-2]
+
+    def _tile(lead, y0, y1):
+        a0 = max(y0 - halo, 0)
+        a1 = min(y1 + halo, ny)
+        s1 = np.asarray(slc1[lead + (slice(a0, a1),)].values)
+        s2 = np.asarray(slc2[lead + (slice(a0, a1),)].values)
+        coh = coherence_kernel(s1, s2, window)
+        out[lead + (slice(y0, y1),)] = coh[y0 - a0 : y0 - a0 + (y1 - y0)]
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = [
+            pool.submit(_tile, lead, y0, y1)
+            for lead in np.ndindex(*lead_shape)
+            for y0, y1 in iter_row_windows(slc1, tile_rows)
+        ]
+        for f in futures:
+            f.result()
+
+    result = slc1.copy(data=out)
+    result.attrs.update({"window": list(window)})
+    return result.rename("coherence")
+
+
+def _nanmean(arr, axis=None):
+    with warnings.catch_warnings():
+        # All-NaN blocks stay NaN
+        warnings.simplefilter("ignore", RuntimeWarning)
+        return np.nanmean(arr, axis=axis)
+
+
+def multilook(da, azimuth_looks, range_looks):
+    """
+    Averages azimuth_looks x range_looks blocks over the last two dims,
+    trimming the remainder. Complex data is averaged as complex values (the
+    interferometric multilook), real data skipping NaNs. Lazy on dask arrays.
+    """
+    y_dim, x_dim = da.dims[-2:]
+    coarse = da.coarsen({y_dim: azimuth_looks, x_dim: range_looks}, boundary="trim")
+    result = coarse.reduce(np.mean if np.iscomplexobj(da) else _nanmean)
+    if np.issubdtype(da.dtype, np.inexact):
+        result = result.astype(da.dtype)
+    result.attrs.update(da.attrs)
+    result.attrs.update({"looks": [azimuth_looks, range_looks]})
+    return result
+
+
+def get_multilooked_path(path, azimuth_looks, range_looks, output_dir=None):
+    root = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(
+        output_dir or os.path.dirname(path),
+        f"{root}.{azimuth_looks}x{range_looks}.tif",
+    )
+
+
+def multilook_raster(
+    path, azimuth_looks, range_looks, output_path=None, block_rows=1024
+):
+    """
+    Multilooks a single-band raster (e.g. lon.rdr / lat.rdr) to a GeoTIFF with
+    the same block averaging (NaN-skipping) and trimming as multilook(). Read
+    in row blocks and written to a temporary file that replaces the output on
+    success; skipped when the output is newer than the input.
+    """
+    output_path = output_path or get_multilooked_path(path, azimuth_looks, range_looks)
+    if os.path.exists(output_path) and os.path.getmtime(
+        output_path
+    ) >= os.path.getmtime(path):
+        return output_path
+
+    src = gdal.Open(path)
+    band = src.GetRasterBand(1)
+    ny = src.RasterYSize // azimuth_looks
+    nx = src.RasterXSize // range_looks
+    tmp_path = f"{output_path}.tmp"
+    dst = gdal.GetDriverByName("GTiff").Create(tmp_path, nx, ny, 1, band.DataType)
+
+    # Whole looks per block
+    rows = max(1, block_rows // azimuth_looks)
+    for r0 in range(0, ny, rows):
+        r1 = min(r0 + rows, ny)
+        arr = band.ReadAsArray(
+            0, r0 * azimuth_looks, nx * range_looks, (r1 - r0) * azimuth_looks
+        )
+        blocks = arr.reshape(r1 - r0, azimuth_looks, nx, range_looks)
+        looked = _nanmean(blocks, axis=(1, 3))
+        dst.GetRasterBand(1).WriteArray(looked.astype(arr.dtype), 0, r0)
+
+    dst.FlushCache()
+    dst = None
+    src = None
+    # A crash above never leaves a truncated output that looks up to date
+    os.replace(tmp_path, output_path)
+    logger.info(f"Multilooked {path} -> {output_path}")
+    return output_path
+
+
+def multilook_geometry(lon_rdr, lat_rdr, azimuth_looks, range_looks, output_dir=None):
+    """
+    Multilooked lon/lat rasters matching multilook(da, azimuth_looks,
+    range_looks), so the multilooked product can still be geocoded.
+    """
+    return tuple(
+        multilook_raster(
+            path,
+            azimuth_looks,
+            range_looks,
+            get_multilooked_path(path, azimuth_looks, range_looks, output_dir),
+        )
+        for path in (lon_rdr, lat_rdr)
+    )
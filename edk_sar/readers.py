@@ -0,0 +1,255 @@
+import os
+import glob
+import logging
+import threading
+import xml.etree.ElementTree as ET
+import numpy as np
+import xarray as xr
+from xarray.backends import BackendArray
+from xarray.core import indexing
+from edk_sar.constants import DATA_DIR
+
+logger = logging.getLogger(__name__)
+
+MERGED_DIR = os.path.join(DATA_DIR, "stack", "merged")
+
+# Variable name -> (file in merged/interferograms/<pair>/, band)
+PRODUCTS = {
+    "interferogram": ("filt_fine.int", 1),
+    "coherence": ("filt_fine.cor", 1),
+    "unwrapped_phase": ("filt_fine.unw", 2),
+}
+
+VRT_DTYPES = {
+    "Byte": "u1",
+    "Int16": "i2",
+    "UInt16": "u2",
+    "Int32": "i4",
+    "UInt32": "u4",
+    "Float32": "f4",
+    "Float64": "f8",
+    "CFloat32": "c8",
+    "CFloat64": "c16",
+}
+ISCE_DTYPES = {
+    "BYTE": "u1",
+    "SHORT": "i2",
+    "INT": "i4",
+    "FLOAT": "f4",
+    "DOUBLE": "f8",
+    "CFLOAT": "c8",
+    "CDOUBLE": "c16",
+}
+
+
+class RasterLayout:
+    """
+    Where one band of a flat binary raster lives in its file: byte offset of
+    the first pixel, pixel and line strides, dtype (with byte order) and size.
+    """
+
+    def __init__(self, path, rows, cols, dtype, offset, pixel_stride, line_stride):
+        self.path = path
+        self.rows = rows
+        self.cols = cols
+        self.dtype = np.dtype(dtype)
+        self.offset = offset
+        self.pixel_stride = pixel_stride
+        self.line_stride = line_stride
+
+    @property
+    def shape(self):
+        return (self.rows, self.cols)
+
+    def memmap(self):
+        # Strided view over the mapped file: no copy, pages are read on access
+        raw = np.memmap(self.path, dtype=np.uint8, mode="r")
+        return np.ndarray(
+            self.shape,
+            dtype=self.dtype,
+            buffer=raw,
+            offset=self.offset,
+            strides=(self.line_stride, self.pixel_stride),
+        )
+
+
+def parse_vrt(vrt_path, band=1):
+    # ISCE2 writes VRTRawRasterBand sidecars next to every product
+    root = ET.parse(vrt_path).getroot()
+    rows = int(root.get("rasterYSize"))
+    cols = int(root.get("rasterXSize"))
+    el = root.findall("VRTRasterBand")[band - 1]
+    if el.get("subClass") != "VRTRawRasterBand":
+        raise ValueError(f"{vrt_path} band {band} is not a raw raster band")
+
+    source = el.find("SourceFilename")
+    path = source.text
+    if source.get("relativeToVRT") == "1":
+        path = os.path.join(os.path.dirname(vrt_path), path)
+    order = "<" if (el.findtext("ByteOrder") or "LSB").upper() == "LSB" else ">"
+    dtype = np.dtype(order + VRT_DTYPES[el.get("dataType")])
+    return RasterLayout(
+        path,
+        rows,
+        cols,
+        dtype,
+        int(el.findtext("ImageOffset") or 0),
+        int(el.findtext("PixelOffset") or dtype.itemsize),
+        int(el.findtext("LineOffset") or dtype.itemsize * cols),
+    )
+
+
+def parse_isce_xml(xml_path, band=1):
+    props = {
+        p.get("name").lower(): p.findtext("value")
+        for p in ET.parse(xml_path).getroot().iter("property")
+    }
+    rows = int(props["length"])
+    cols = int(props["width"])
+    n_bands = int(props.get("number_bands") or 1)
+    order = "<" if (props.get("byte_order") or "l").lower().startswith("l") else ">"
+    dtype = np.dtype(order + ISCE_DTYPES[props["data_type"].upper()])
+    size = dtype.itemsize
+    b = band - 1
+
+    scheme = (props.get("scheme") or "BIP").upper()
+    if scheme == "BIL":
+        offset, pixel, line = b * cols * size, size, n_bands * cols * size
+    elif scheme == "BSQ":
+        offset, pixel, line = b * rows * cols * size, size, cols * size
+    else:
+        offset, pixel, line = b * size, n_bands * size, n_bands * cols * size
+
+    path = os.path.splitext(xml_path)[0]
+    return RasterLayout(path, rows, cols, dtype, offset, pixel, line)
+
+
+def get_layout(path, band=1):
+    """
+    Band layout of an ISCE2 raster from its .vrt sidecar, or its .xml one.
+    """
+    if os.path.exists(f"{path}.vrt"):
+        return parse_vrt(f"{path}.vrt", band)
+    if os.path.exists(f"{path}.xml"):
+        return parse_isce_xml(f"{path}.xml", band)
+    raise FileNotFoundError(f"No .vrt or .xml sidecar for {path}")
+
+
+class MemmapStackArray(BackendArray):
+    """
+    Lazy (n, rows, cols) array over n same-shaped memory-mapped rasters.
+    Files are mapped on first access, and only the pages of the requested
+    window are read.
+    """
+
+    def __init__(self, layouts):
+        self.layouts = layouts
+        self.shape = (len(layouts),) + layouts[0].shape
+        self.dtype = layouts[0].dtype.newbyteorder("=")
+        self._arrays = [None] * len(layouts)
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # Only the layouts travel to other processes, which map the files again
+        return {"layouts": self.layouts}
+
+    def __setstate__(self, state):
+        self.__init__(state["layouts"])
+
+    def _get_array(self, i):
+        if self._arrays[i] is None:
+            with self._lock:
+                if self._arrays[i] is None:
+                    self._arrays[i] = self.layouts[i].memmap()
+        return self._arrays[i]
+
+    def _raw_indexing_method(self, key):
+        k0, k1, k2 = key
+        if isinstance(k0, (int, np.integer)):
+            return self._get_array(k0)[k1][..., k2].astype(self.dtype, copy=False)
+        items = np.arange(self.shape[0])[k0]
+        return np.stack([self._get_array(i)[k1][..., k2] for i in items]).astype(
+            self.dtype, copy=False
+        )
+
+    def __getitem__(self, key):
+        return indexing.explicit_indexing_adapter(
+            key, self.shape, indexing.IndexingSupport.OUTER, self._raw_indexing_method
+        )
+
+
+def open_raster(path, band=1):
+    """
+    Lazy (y, x) DataArray over an ISCE2 raster (e.g. lon.rdr, filt_fine.cor).
+    """
+    layout = get_layout(path, band)
+    var = xr.Variable(
+        ("_stack", "y", "x"), indexing.LazilyIndexedArray(MemmapStackArray([layout]))
+    )[0]
+    return xr.DataArray(var, name=os.path.basename(path))
+
+
+def get_pair_dates(pair):
+    # "20240101_20240113" -> reference and secondary dates
+    reference, secondary = pair.split("_")[:2]
+    return (
+        np.datetime64(f"{reference[:4]}-{reference[4:6]}-{reference[6:8]}"),
+        np.datetime64(f"{secondary[:4]}-{secondary[4:6]}-{secondary[6:8]}"),
+    )
+
+
+def open_interferograms(merged_dir=MERGED_DIR, products=None):
+    """
+    Opens merged/interferograms/<pair>/ as one lazy (date_pair, y, x)
+    Dataset without reading any pixels. Flat binaries are memory mapped from
+    their .vrt/.xml sidecars; lon/lat come from merged/geom_reference as 2-D
+    coordinates, and their paths are kept in attrs for geocoding.
+
+    products maps variable names to (file name, band) and defaults to
+    PRODUCTS; a product is included when every pair has it.
+    """
+    products = products or PRODUCTS
+    pair_dirs = sorted(glob.glob(os.path.join(merged_dir, "interferograms", "*_*")))
+    pairs = [os.path.basename(d) for d in pair_dirs if os.path.isdir(d)]
+    if not pairs:
+        raise FileNotFoundError(f"No interferograms in {merged_dir}")
+
+    data_vars = {}
+    shape = None
+    for name, (filename, band) in products.items():
+        paths = [os.path.join(merged_dir, "interferograms", p, filename) for p in pairs]
+        if not all(os.path.exists(p) for p in paths):
+            logger.debug(f"Skipping {name}: {filename} missing for some pairs")
+            continue
+        layouts = [get_layout(p, band) for p in paths]
+        if any(layout.shape != layouts[0].shape for layout in layouts):
+            raise ValueError(f"{filename} shapes differ between pairs")
+        shape = shape or layouts[0].shape
+        if layouts[0].shape != shape:
+            raise ValueError(f"{filename} shape differs from the other products")
+        data_vars[name] = xr.Variable(
+            ("date_pair", "y", "x"),
+            indexing.LazilyIndexedArray(MemmapStackArray(layouts)),
+        )
+
+    dates = [get_pair_dates(p) for p in pairs]
+    coords = {
+        "date_pair": pairs,
+        "reference_date": ("date_pair", [d[0] for d in dates]),
+        "secondary_date": ("date_pair", [d[1] for d in dates]),
+    }
+
+    attrs = {}
+    geom_dir = os.path.join(merged_dir, "geom_reference")
+    for coord in ("lon", "lat"):
+        path = os.path.join(geom_dir, f"{coord}.rdr")
+        if not (os.path.exists(path) and shape):
+            continue
+        da = open_raster(path)
+        if da.shape != shape:
+            logger.warning(f"{path} is {da.shape}, interferograms are {shape}")
+            continue
+        coords[coord] = da.variable
+        attrs[f"{coord}_rdr"] = f"{path}.vrt" if os.path.exists(f"{path}.vrt") else path
+
+    return xr.Dataset(data_vars, coords=coords, attrs=attrs)
@@ -0,0 +1,227 @@
+import os
+import logging
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import xarray as xr
+from edk_sar import tracing
+from edk_sar.constants import SENTINEL_WAVELENGTH, PI
+from edk_sar.geocoding import iter_row_windows
+
+logger = logging.getLogger(__name__)
+
+# Working memory of one inversion chunk, per worker
+DEFAULT_CHUNK_MEMORY = 128 * 1024**2
+# Mask patterns whose pseudo-inverse is kept per worker
+MAX_CACHED_PATTERNS = 4096
+
+
+def get_dates(reference_dates, secondary_dates):
+    return np.unique(np.concatenate([reference_dates, secondary_dates]))
+
+
+def get_design_matrix(reference_dates, secondary_dates):
+    """
+    SBAS design matrix (n_pairs, n_dates - 1): each interferogram is the
+    difference between its secondary and reference date, with the first date
+    as the zero reference.
+    """
+    dates = get_dates(reference_dates, secondary_dates)
+    index = {d: i for i, d in enumerate(dates)}
+    A = np.zeros((len(reference_dates), len(dates) - 1), np.float64)
+    for k, (ref, sec) in enumerate(zip(reference_dates, secondary_dates)):
+        if index[sec] > 0:
+            A[k, index[sec] - 1] += 1
+        if index[ref] > 0:
+            A[k, index[ref] - 1] -= 1
+    return A, dates
+
+
+class PatternSolver:
+    """
+    Pseudo-inverses of the design matrix restricted to the interferograms a
+    pixel keeps after coherence masking, computed once per mask pattern. The
+    SVD-based pinv gives the minimum-norm solution when masking splits the
+    network.
+    """
+
+    def __init__(self, A):
+        self.A = A
+        self._pinv = {np.ones(A.shape[0], bool).tobytes(): np.linalg.pinv(A)}
+
+    def get_pinv(self, mask):
+        key = mask.tobytes()
+        pinv = self._pinv.get(key)
+        if pinv is None:
+            if len(self._pinv) >= MAX_CACHED_PATTERNS:
+                self._pinv.clear()
+            pinv = np.linalg.pinv(self.A[mask])
+            self._pinv[key] = pinv
+        return pinv
+
+    def solve(self, phase, valid):
+        """
+        phase, valid: (n_pairs, n_pixels). Returns (n_dates - 1, n_pixels),
+        NaN where no interferogram is valid. Pixels are grouped by mask
+        pattern and each group is solved as one matrix product.
+        """
+        n_pairs, n_pixels = phase.shape
+        out = np.full((self.A.shape[1], n_pixels), np.nan)
+        if n_pixels == 0:
+            return out
+
+        packed = np.packbits(valid, axis=0).T
+        patterns, inverse = np.unique(packed, axis=0, return_inverse=True)
+        inverse = inverse.ravel()
+        order = np.argsort(inverse, kind="stable")
+        bounds = np.searchsorted(inverse[order], np.arange(len(patterns) + 1))
+
+        for g in range(len(patterns)):
+            pixels = order[bounds[g] : bounds[g + 1]]
+            mask = valid[:, pixels[0]]
+            if not mask.any():
+                continue
+            out[:, pixels] = self.get_pinv(mask) @ phase[np.ix_(mask, pixels)]
+        return out
+
+
+# Per-process solver, reused across the chunks a worker handles
+_solver = None
+
+
+def _invert_chunk(
+    unwrapped, coherence, A, y0, y1, out_path, threshold, scale, reference
+):
+    global _solver
+    if _solver is None or not np.array_equal(_solver.A, A):
+        _solver = PatternSolver(A)
+
+    phase = np.asarray(unwrapped.values, np.float64)
+    n_pairs, ny, nx = phase.shape
+    if reference is not None:
+        phase -= reference[:, None, None]
+    valid = np.isfinite(phase)
+    if coherence is not None:
+        valid &= np.asarray(coherence.values) >= threshold
+    phase = np.where(valid, phase, 0).reshape(n_pairs, -1)
+    valid = valid.reshape(n_pairs, -1)
+
+    solved = _solver.solve(phase, valid)
+    out = np.load(out_path, mmap_mode="r+")
+    out[1:, y0:y1, :] = (solved * scale).reshape(-1, ny, nx)
+    out[0, y0:y1, :] = np.where(valid.any(axis=0), 0, np.nan).reshape(ny, nx)
+    out.flush()
+    return y0, y1
+
+
+def get_row_bytes(unwrapped, coherence, n_dates):
+    """
+    Peak bytes _invert_chunk holds per image row: the inputs as read, the
+    float64 phase and its np.where copy, the validity masks, and the float64
+    solution and its scaled copy.
+    """
+    n_pairs, _, nx = unwrapped.shape
+    per_pair = unwrapped.dtype.itemsize + 8 + 8 + 2
+    if coherence is not None:
+        per_pair += coherence.dtype.itemsize
+    return nx * (n_pairs * per_pair + (n_dates - 1) * 8 * 2)
+
+
+@tracing.trace("timeseries.invert")
+def invert(
+    stack,
+    out_path,
+    coherence_threshold=0.3,
+    wavelength=SENTINEL_WAVELENGTH,
+    reference_pixel=None,
+    max_workers=None,
+    chunk_memory=DEFAULT_CHUNK_MEMORY,
+):
+    """
+    SBAS inversion of an unwrapped interferogram stack into a (date, y, x)
+    LOS displacement cube in meters.
+
+    stack is a (date_pair, y, x) Dataset with unwrapped_phase, optional
+    coherence and reference_date/secondary_date coordinates, e.g. from
+    readers.open_interferograms. Interferograms with coherence below
+    coherence_threshold are dropped per pixel. Row chunks are inverted in a
+    process pool and written to out_path (.npy); the result is a memory-mapped
+    DataArray over that file. reference_pixel=(y, x) removes the phase of a
+    stable pixel from every interferogram first.
+    """
+    unwrapped = stack["unwrapped_phase"]
+    coherence = stack["coherence"] if "coherence" in stack else None
+    A, dates = get_design_matrix(
+        stack["reference_date"].values, stack["secondary_date"].values
+    )
+    n_pairs, ny, nx = unwrapped.shape
+    logger.info(
+        f"Inverting {n_pairs} interferograms into {len(dates)} dates "
+        f"({ny}x{nx} pixels)"
+    )
+
+    reference = None
+    if reference_pixel is not None:
+        y, x = reference_pixel
+        reference = np.asarray(unwrapped[:, y, x].values, np.float64)
+        bad = ~np.isfinite(reference)
+        if bad.any():
+            # Subtracting NaN would drop those interferograms at every pixel
+            pairs = stack["date_pair"].values[bad] if "date_pair" in stack else []
+            raise ValueError(
+                f"Reference pixel {tuple(reference_pixel)} has no unwrapped "
+                f"phase in {bad.sum()} of {n_pairs} interferograms "
+                f"({', '.join(map(str, pairs))}); pick a pixel valid in all"
+            )
+
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+    out = np.lib.format.open_memmap(
+        out_path, mode="w+", dtype=np.float32, shape=(len(dates), ny, nx)
+    )
+    del out
+
+    max_rows = max(
+        1,
+        int(chunk_memory // get_row_bytes(unwrapped, coherence, len(dates))),
+    )
+    scale = wavelength / (4 * PI)
+
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        futures = [
+            pool.submit(
+                _invert_chunk,
+                unwrapped[:, y0:y1, :],
+                coherence[:, y0:y1, :] if coherence is not None else None,
+                A,
+                y0,
+                y1,
+                out_path,
+                coherence_threshold,
+                scale,
+                reference,
+            )
+            for y0, y1 in iter_row_windows(unwrapped, max_rows)
+        ]
+        for f in futures:
+            f.result()
+
+    return open_displacement(out_path, stack)
+
+
+def open_displacement(out_path, stack):
+    """
+    Memory-mapped (date, y, x) DataArray over an inversion written by invert,
+    with the dates, radar lon/lat and geometry attrs (lon_rdr/lat_rdr) of
+    the stack it was inverted from.
+    """
+    dates = get_dates(stack["reference_date"].values, stack["secondary_date"].values)
+    coords = {"date": dates}
+    for name in ("lon", "lat"):
+        if name in stack.coords and stack[name].dims == ("y", "x"):
+            coords[name] = stack[name]
+    return xr.DataArray(
+        np.load(out_path, mmap_mode="r"),
+        dims=("date", "y", "x"),
+        coords=coords,
+        name="displacement",
+        attrs={"units": "meters", **stack.attrs},
+    )
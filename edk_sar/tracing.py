@@ -0,0 +1,261 @@
+import os
+import json
+import time
+import logging
+import resource
+import functools
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Off unless EDK_SAR_TRACE is set or enable() is called
+_enabled = os.environ.get("EDK_SAR_TRACE", "").lower() in ("1", "true", "yes")
+_events = []
+_events_lock = threading.Lock()
+_origin = time.perf_counter()
+
+# How often the RSS of the process is sampled while spans are open
+RSS_SAMPLE_INTERVAL = 0.01
+
+
+def enable():
+    global _enabled
+    _enabled = True
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def is_enabled():
+    return _enabled
+
+
+def reset():
+    with _events_lock:
+        _events.clear()
+
+
+def get_events():
+    with _events_lock:
+        return list(_events)
+
+
+def _read_proc_io():
+    # Bytes actually read from / written to storage by this process (Linux only)
+    try:
+        with open("/proc/self/io") as f:
+            values = dict(line.split(":") for line in f)
+        return int(values["read_bytes"]), int(values["write_bytes"])
+    except (OSError, KeyError, ValueError):
+        return 0, 0
+
+
+def _process_peak_rss_bytes():
+    # High-water mark of the whole process; ru_maxrss is KiB on Linux, bytes on
+    # macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if os.uname().sysname == "Darwin" else rss * 1024
+
+
+def _current_rss_bytes():
+    # Resident set size right now (Linux only, None elsewhere)
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class _RssSampler:
+    """
+    Samples the current RSS on a background thread while any span is open and
+    keeps the maximum seen by each open span. The thread exits when the last
+    span closes.
+    """
+
+    def __init__(self, interval=RSS_SAMPLE_INTERVAL):
+        self.interval = interval
+        self._peaks = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self, key, rss):
+        with self._lock:
+            self._peaks[key] = rss
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+
+    def stop(self, key, rss):
+        with self._lock:
+            return max(self._peaks.pop(key), rss)
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            rss = _current_rss_bytes() or 0
+            with self._lock:
+                if not self._peaks:
+                    self._thread = None
+                    return
+                for key, peak in self._peaks.items():
+                    if rss > peak:
+                        self._peaks[key] = rss
+
+
+_rss_sampler = _RssSampler()
+
+
+def _cpu_seconds():
+    # This process and its finished children (e.g. local backend commands)
+    t = os.times()
+    return t.user + t.system + t.children_user + t.children_system
+
+
+def record(name, start, duration, **args):
+    """
+    Adds a span recorded elsewhere (e.g. stats reported by a container command).
+    """
+    event = {
+        "name": name,
+        "ts": (start - _origin) * 1e6,
+        "dur": duration * 1e6,
+        "tid": threading.get_ident(),
+        "args": args,
+    }
+    with _events_lock:
+        _events.append(event)
+
+
+class trace:
+    """
+    Context manager and decorator recording wall time, CPU time, peak RSS and
+    file I/O of a block. The peak RSS is sampled while the block runs and
+    reported above the RSS it started with, so it is the block's own. When
+    tracing is disabled it does nothing beyond a flag check.
+
+        with tracing.trace("geocode"):
+            ...
+
+        @tracing.trace("download_dem")
+        def download_dem(bbox): ...
+    """
+
+    def __init__(self, name, **args):
+        self.name = name
+        self.args = args
+        self._active = False
+
+    def __enter__(self):
+        self._active = _enabled
+        if self._active:
+            self._io = _read_proc_io()
+            self._cpu = _cpu_seconds()
+            self._rss = _current_rss_bytes()
+            if self._rss is not None:
+                _rss_sampler.start(id(self), self._rss)
+            self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if not self._active:
+            return False
+
+        end = time.perf_counter()
+        read_bytes, write_bytes = _read_proc_io()
+        peak_rss = None
+        if self._rss is not None:
+            peak_rss = _rss_sampler.stop(id(self), _current_rss_bytes() or 0)
+            peak_rss -= self._rss
+        record(
+            self.name,
+            self._start,
+            end - self._start,
+            cpu_s=_cpu_seconds() - self._cpu,
+            peak_rss_bytes=peak_rss,
+            process_peak_rss_bytes=_process_peak_rss_bytes(),
+            read_bytes=read_bytes - self._io[0],
+            write_bytes=write_bytes - self._io[1],
+            error=exc_type.__name__ if exc_type else None,
+            **self.args,
+        )
+        return False
+
+    def __call__(self, func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with trace(self.name, **self.args):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+
+def export_chrome_trace(path):
+    """
+    Writes the recorded spans as Chrome trace / Perfetto JSON.
+    """
+    pid = os.getpid()
+    trace_events = [
+        {
+            "name": e["name"],
+            "ph": "X",
+            "ts": e["ts"],
+            "dur": e["dur"],
+            "pid": pid,
+            "tid": e["tid"],
+            "args": e["args"],
+        }
+        for e in get_events()
+    ]
+    with open(path, "w") as f:
+        json.dump({"traceEvents": trace_events, "displayTimeUnit": "ms"}, f)
+    return path
+
+
+def summary():
+    """
+    Per-name totals: calls, wall/cpu seconds, max peak RSS above the start of
+    the span and bytes read/written.
+    """
+    rows = {}
+    for e in get_events():
+        row = rows.setdefault(
+            e["name"],
+            {
+                "calls": 0,
+                "wall_s": 0.0,
+                "cpu_s": 0.0,
+                "peak_rss_bytes": 0,
+                "read_bytes": 0,
+                "write_bytes": 0,
+            },
+        )
+        args = e["args"]
+        row["calls"] += 1
+        row["wall_s"] += e["dur"] / 1e6
+        row["peak_rss_bytes"] = max(
+            row["peak_rss_bytes"], args.get("peak_rss_bytes") or 0
+        )
+        # Totals include what container commands reported for themselves
+        for key in ("cpu_s", "read_bytes", "write_bytes"):
+            row[key] += (args.get(key) or 0) + (args.get(f"container_{key}") or 0)
+    return rows
+
+
+def format_summary():
+    header = (
+        f"{'stage':<40} {'calls':>5} {'wall s':>10} {'cpu s':>10} "
+        f"{'peak RSS MB':>12} {'read MB':>10} {'write MB':>10}"
+    )
+    lines = [header, "-" * len(header)]
+    for name, row in sorted(summary().items(), key=lambda kv: -kv[1]["wall_s"]):
+        lines.append(
+            f"{name:<40} {row['calls']:>5} {row['wall_s']:>10.2f} {row['cpu_s']:>10.2f} "
+            f"{row['peak_rss_bytes'] / 1e6:>12.1f} {row['read_bytes'] / 1e6:>10.1f} "
+            f"{row['write_bytes'] / 1e6:>10.1f}"
+        )
+    return "\n".join(lines)
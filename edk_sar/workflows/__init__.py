@@ -1,3 +1,8 @@
+import edk_sar.workflows.pipeline
+import edk_sar.workflows.scheduler
+import edk_sar.workflows.catalog
 import edk_sar.workflows.coregister
 import edk_sar.workflows.base
 import edk_sar.workflows.interferograms
+
+from edk_sar.workflows.catalog import scan
@@ -0,0 +1,239 @@
+import os
+import math
+import json
+import glob
+import shutil
+import hashlib
+import logging
+import xml.etree.ElementTree as ET
+import edk_sar as es
+from osgeo import gdal
+from edk_sar.constants import DATA_DIR
+from edk_sar.workflows.base import staging
+
+gdal.UseExceptions()
+
+logger = logging.getLogger(__name__)
+
+# Persistent store of 1x1 degree DEM tiles, shared across stacks and runs
+DEM_TILE_DIR = os.environ.get(
+    "EDK_SAR_DEM_TILE_DIR", os.path.join(DATA_DIR, "dem_tiles")
+)
+# Optional local directory of ready-made tiles (N37E014.tif, N37E014.dem, ...)
+# used before fetching anything; tiles must be WGS84-ellipsoid heights, which
+# is checked before they are mosaicked.
+DEM_SOURCE_DIR = os.environ.get("EDK_SAR_DEM_SOURCE_DIR")
+
+# Flat mosaics shared by every stack over the same tile set, keyed by the tiles
+MOSAIC_DIR = os.path.join(DEM_TILE_DIR, "mosaics")
+
+# Tiles are fetched by the ISCE2 container under the /data mount
+FETCH_DIR = os.path.join(DATA_DIR, "dem_tiles", ".fetch")
+CONTAINER_FETCH_DIR = "/data/dem_tiles/.fetch"
+
+TILE_EXTENSIONS = (".tif", ".tiff", ".hgt", ".dem")
+
+
+def get_tile_key(lat, lon):
+    # SRTM style name of the tile whose south-west corner is (lat, lon)
+    ns = "N" if lat >= 0 else "S"
+    ew = "E" if lon >= 0 else "W"
+    return f"{ns}{abs(lat):02d}{ew}{abs(lon):03d}"
+
+
+def get_tiles(bbox, pad=0.25):
+    # Integer-degree tiles covering bbox (min_lon, min_lat, max_lon, max_lat) + pad
+    south = math.floor(bbox[1] - pad)
+    north = math.ceil(bbox[3] + pad)
+    west = math.floor(bbox[0] - pad)
+    east = math.ceil(bbox[2] + pad)
+
+    return [(lat, lon) for lat in range(south, north) for lon in range(west, east)]
+
+
+def find_tile(tile_dir, key):
+    # Fetched tiles are ISCE outputs in <key>/, sourced ones are plain rasters
+    isce_vrt = os.path.join(tile_dir, key, "dem.wgs84.vrt")
+    if os.path.exists(isce_vrt):
+        return isce_vrt
+
+    for ext in TILE_EXTENSIONS:
+        for path in (
+            os.path.join(tile_dir, key, key + ext),
+            os.path.join(tile_dir, key + ext),
+        ):
+            if os.path.exists(path):
+                return path
+    return None
+
+
+def copy_tile_from_source(key, source_dir, tile_dir):
+    src = find_tile(source_dir, key)
+    if src is None:
+        return None
+
+    dest_dir = os.path.join(tile_dir, key)
+    os.makedirs(dest_dir, exist_ok=True)
+    dest = os.path.join(dest_dir, key + os.path.splitext(src)[1])
+    staging.stage_file(src, dest)
+    return dest
+
+
+def fetch_tile(lat, lon, tile_dir):
+    # Download and stitch one tile with dem.py inside the ISCE2 container
+    key = get_tile_key(lat, lon)
+    fetch_dir = os.path.join(FETCH_DIR, key)
+    shutil.rmtree(fetch_dir, ignore_errors=True)
+
+    dem_args = [
+        "bash",
+        "/workspace/workflows/base/get_dem.sh",
+        str(lat),
+        str(lat + 1),
+        str(lon),
+        str(lon + 1),
+        f"{CONTAINER_FETCH_DIR}/{key}",
+    ]
+    es.frameworks.isce2.run_cmd(" ".join(dem_args), check=True)
+
+    if not os.path.exists(os.path.join(fetch_dir, "dem.wgs84.vrt")):
+        raise RuntimeError(f"DEM tile {key} was not produced in {fetch_dir}")
+
+    dest_dir = os.path.join(tile_dir, key)
+    if os.path.abspath(fetch_dir) != os.path.abspath(dest_dir):
+        shutil.rmtree(dest_dir, ignore_errors=True)
+        shutil.move(fetch_dir, dest_dir)
+    return find_tile(tile_dir, key)
+
+
+def get_tile(lat, lon, tile_dir=None, source_dir=None):
+    """
+    Path of a tile in the store, pulling it from source_dir or the ISCE2
+    container only when it is missing.
+    """
+    tile_dir = tile_dir or DEM_TILE_DIR
+    source_dir = source_dir or DEM_SOURCE_DIR
+    key = get_tile_key(lat, lon)
+
+    path = find_tile(tile_dir, key)
+    if path is not None:
+        return path
+
+    if source_dir:
+        path = copy_tile_from_source(key, source_dir, tile_dir)
+        if path is not None:
+            logger.info(f"DEM tile {key} taken from {source_dir}")
+            return path
+
+    logger.info(f"Fetching DEM tile {key}")
+    return fetch_tile(lat, lon, tile_dir)
+
+
+def get_vertical_reference(path):
+    """
+    "ellipsoid" or "geoid" for the heights a tile holds, None when the tile
+    doesn't say. Raw SRTM .hgt tiles are EGM96 heights, ISCE DEMs carry their
+    reference in the .xml, other rasters in a 3-D or compound CRS.
+    """
+    if path.lower().endswith(".hgt"):
+        return "geoid"
+
+    isce_xml = os.path.splitext(path)[0] + ".xml"
+    if path.endswith(".vrt") and os.path.exists(isce_xml):
+        for prop in ET.parse(isce_xml).getroot().iter("property"):
+            if prop.get("name", "").lower() == "reference":
+                value = (prop.findtext("value") or "").strip().upper()
+                return "ellipsoid" if value == "WGS84" else "geoid"
+        return None
+
+    srs = gdal.Open(path).GetSpatialRef()
+    if srs is None:
+        return None
+    if srs.IsGeographic() and srs.GetAxesCount() == 3:
+        return "ellipsoid"
+    if srs.IsCompound():
+        # A vertical CRS means gravity-related (orthometric) heights
+        return "geoid"
+    return None
+
+
+def check_ellipsoid_heights(tiles):
+    # stackSentinel expects heights above the WGS84 ellipsoid
+    bad = {}
+    for path in tiles:
+        reference = get_vertical_reference(path)
+        if reference != "ellipsoid":
+            bad[path] = reference or "unknown"
+    if bad:
+        listing = ", ".join(f"{path} ({ref})" for path, ref in bad.items())
+        raise ValueError(
+            "DEM tiles must be WGS84-ellipsoid heights; convert geoid tiles and "
+            f"tag the others with a 3-D CRS (e.g. EPSG:4979): {listing}"
+        )
+
+
+def get_mosaic(tiles, mosaic_dir=None):
+    """
+    Flat ISCE mosaic of tiles, written once per tile set under mosaic_dir and
+    reused by every later build over the same tiles.
+    """
+    key = hashlib.sha1(json.dumps(tiles).encode()).hexdigest()[:16]
+    out_dir = os.path.join(mosaic_dir or MOSAIC_DIR, key)
+    dem_path = os.path.join(out_dir, "dem.wgs84")
+    if os.path.exists(dem_path + ".vrt"):
+        return dem_path
+
+    check_ellipsoid_heights(tiles)
+    tmp_dir = f"{out_dir}.{os.getpid()}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    vrt_path = os.path.join(tmp_dir, "dem.vrt")
+    gdal.BuildVRT(vrt_path, tiles).FlushCache()
+    tmp_dem = os.path.join(tmp_dir, "dem.wgs84")
+    ds = gdal.Translate(tmp_dem, vrt_path, format="ISCE")
+    ds = None
+    # Written last: its presence marks a complete mosaic
+    gdal.Translate(tmp_dem + ".vrt", tmp_dem, format="VRT")
+
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.replace(tmp_dir, out_dir)
+    return dem_path
+
+
+def build_dem(bbox, output_dir=None, tile_dir=None, source_dir=None):
+    """
+    Places <output_dir>/dem.wgs84 for bbox, built from the tile store.
+
+    The flat ISCE raster the stack processor needs is the shared mosaic of the
+    covering tiles, hardlinked into output_dir (only its small .xml/.vrt
+    headers are copied), so the DEM data is written once per tile set and
+    repeated runs over the same area don't touch it at all.
+    """
+    output_dir = output_dir or os.path.join(DATA_DIR, "dem")
+    os.makedirs(output_dir, exist_ok=True)
+
+    tiles = [get_tile(lat, lon, tile_dir, source_dir) for lat, lon in get_tiles(bbox)]
+
+    dem_path = os.path.join(output_dir, "dem.wgs84")
+    record_path = os.path.join(output_dir, "dem.tiles.json")
+    if os.path.exists(dem_path) and os.path.exists(record_path):
+        with open(record_path) as f:
+            if json.load(f) == tiles:
+                logger.info(f"DEM at {dem_path} already covers the requested tiles")
+                return dem_path
+
+    mosaic_dir = os.path.join(tile_dir, "mosaics") if tile_dir else None
+    mosaic_path = get_mosaic(tiles, mosaic_dir)
+
+    for path in glob.glob(dem_path + "*"):
+        os.remove(path)
+    method = staging.stage_file(mosaic_path, dem_path)
+    for ext in (".xml", ".vrt"):
+        shutil.copyfile(mosaic_path + ext, dem_path + ext)
+    logger.info(f"DEM at {dem_path} staged from {mosaic_path} ({method})")
+
+    with open(record_path, "w") as f:
+        json.dump(tiles, f)
+
+    return dem_path
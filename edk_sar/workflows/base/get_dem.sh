@@ -1,13 +1,14 @@
 #!/bin/bash
 
-# Usage: dem.sh <W> <S> <E> <N> <output_dir>
-# Example: ./dem.sh -123.5 45.0 -122.0 46.0. Downloads in current directory
+# Usage: dem.sh <S> <N> <W> <E> [output_dir]
+# Example: ./dem.sh 45 46 -124 -123. Downloads in output_dir (default /data/dem)
 S=$1
 N=$2
 W=$3
 E=$4
+OUTPUT_DIR=${5:-/data/dem}
 
-mkdir -p /data/dem
-cd /data/dem
+mkdir -p $OUTPUT_DIR
+cd $OUTPUT_DIR
 
 /usr/lib/python3.8/dist-packages/isce2/applications/dem.py -f -a stitch -b $S $N $W $E -r -s 1 -c -o dem
\ No newline at end of file
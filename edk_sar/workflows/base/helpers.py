@@ -1,13 +1,21 @@
 import os
+import json
 import subprocess
+import threading
+from concurrent.futures import ProcessPoolExecutor
 from osgeo import gdal, osr
 from lxml import etree
 from shapely.geometry import Polygon, box
 import zipfile
 import logging
+from edk_sar import tracing
+from edk_sar.constants import CACHE_DIR
 
 logger = logging.getLogger(__name__)
 
+FOOTPRINT_CACHE_PATH = os.path.join(CACHE_DIR, "footprints.json")
+_footprint_cache_lock = threading.Lock()
+
 
 def get_bbox_from_gcps(raster_path):
     ds = gdal.Open(raster_path)
@@ -21,51 +29,66 @@ def get_bbox_from_gcps(raster_path):
     tgt_srs = osr.SpatialReference()
     tgt_srs.ImportFromEPSG(4326)  # WGS 84
 
+    srs.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
+    tgt_srs.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
+
     transform = osr.CoordinateTransformation(srs, tgt_srs)
 
-    # Convert all GCPs to lat/lon
-    points = []
-    for gcp in gcps:
-        x, y, _ = transform.TransformPoint(gcp.GCPX, gcp.GCPY)
-        points.append((x, y))  # (lon, lat)
+    # Convert all GCPs to lon/lat in one call
+    points = transform.TransformPoints([(gcp.GCPX, gcp.GCPY) for gcp in gcps])
+    points = [(x, y) for x, y, _ in points]  # (lon, lat)
 
     polygon = Polygon(points)
     return polygon.bounds  # (min_lon, min_lat, max_lon, max_lat)
 
 
+def get_safe_dir(names):
+    # Find the .SAFE root directory from the zip member names
+    safe_dirs = set()
+    for name in names:
+        if ".SAFE/" in name:
+            safe_dirs.add(name.split(".SAFE/")[0] + ".SAFE/")
+    if not safe_dirs:
+        return None
+    return sorted(safe_dirs)[0]
+
+
+def get_safe_file_paths(names, folder):
+    # Files directly inside <root>.SAFE/<folder>/ (sub-folders excluded)
+    safe_dir = get_safe_dir(names)
+    if safe_dir is None:
+        return []
+
+    prefix = safe_dir + folder + "/"
+    return [
+        name
+        for name in names
+        if name.startswith(prefix) and "/" not in name[len(prefix) :]
+    ]
+
+
 def get_measurement_file_paths(safe_fp):
     # Get all file paths inside the 'measurement' directory within the zip, without extracting
-    measurement_file_paths = []
     with zipfile.ZipFile(safe_fp, "r") as zf:
-        # Find the .SAFE root directory in the zip
-        safe_dirs = set()
-        for name in zf.namelist():
-            if name.endswith(".SAFE/"):
-                safe_dirs.add(name)
-        if not safe_dirs:
-            # Try to infer .SAFE root from file paths
-            for name in zf.namelist():
-                if ".SAFE/" in name:
-                    safe_dirs.add(name.split(".SAFE/")[0] + ".SAFE/")
-        if not safe_dirs:
-            logger.warning(f"No .SAFE directory found in {safe_fp}")
-        else:
-            safe_dir = sorted(safe_dirs)[0]
-            measurement_prefix = safe_dir + "measurement/"
-            for name in zf.namelist():
-                if name.startswith(measurement_prefix) and not name.endswith("/"):
-                    measurement_file_paths.append(name)
-    return measurement_file_paths
+        names = zf.namelist()
 
+    if get_safe_dir(names) is None:
+        logger.warning(f"No .SAFE directory found in {safe_fp}")
+    return get_safe_file_paths(names, "measurement")
 
-def get_bbox(slc_path):
-    measurement_file_paths = get_measurement_file_paths(slc_path)
 
-    bboxes = []
-    for mfp in measurement_file_paths:
-        bbox = get_bbox_from_gcps(f"/vsizip/{slc_path}/{mfp}")
-        bboxes.append(bbox)
+def get_bbox_from_annotation(tree):
+    # The geolocation grid in the annotation XML is what the GCPs of the
+    # measurement TIFFs are generated from, already in lat/lon.
+    lons = [float(v) for v in tree.xpath("//geolocationGridPoint/longitude/text()")]
+    lats = [float(v) for v in tree.xpath("//geolocationGridPoint/latitude/text()")]
+    if not lons:
+        return None
+    return (min(lons), min(lats), max(lons), max(lats))
 
+
+def merge_bboxes(bboxes):
+    bboxes = [b for b in bboxes if b is not None]
     if not bboxes:
         return None
     min_lon = min(b[0] for b in bboxes)
@@ -76,6 +99,92 @@ def get_bbox(slc_path):
     return (min_lon, min_lat, max_lon, max_lat)
 
 
+def get_bbox(slc_path):
+    with zipfile.ZipFile(slc_path, "r") as zf:
+        names = zf.namelist()
+        if get_safe_dir(names) is None:
+            logger.warning(f"No .SAFE directory found in {slc_path}")
+            return None
+
+        bboxes = []
+        for name in get_safe_file_paths(names, "annotation"):
+            if name.endswith(".xml"):
+                with zf.open(name) as f:
+                    bboxes.append(get_bbox_from_annotation(etree.parse(f)))
+
+    bbox = merge_bboxes(bboxes)
+    if bbox is not None:
+        return bbox
+
+    # Fall back to the GCPs of the measurement rasters
+    logger.debug(f"No annotation geolocation grid in {slc_path}, reading GCPs")
+    bboxes = []
+    for mfp in get_safe_file_paths(names, "measurement"):
+        bboxes.append(get_bbox_from_gcps(f"/vsizip/{slc_path}/{mfp}"))
+
+    return merge_bboxes(bboxes)
+
+
+def _get_file_signature(path):
+    st = os.stat(path)
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def load_footprint_cache(cache_path=FOOTPRINT_CACHE_PATH):
+    if not os.path.exists(cache_path):
+        return {}
+    try:
+        with open(cache_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        logger.warning(f"Ignoring unreadable footprint cache {cache_path}")
+        return {}
+
+
+def save_footprint_cache(cache, cache_path=FOOTPRINT_CACHE_PATH):
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(cache, f)
+    os.replace(tmp_path, cache_path)
+
+
+def get_bboxes(slc_paths, max_workers=None, cache_path=FOOTPRINT_CACHE_PATH):
+    """
+    Footprints for many SLCs. Cached entries (keyed by path, size and mtime)
+    are reused, the rest are extracted in a process pool and written back.
+    """
+    slc_paths = [os.path.abspath(p) for p in slc_paths]
+    with _footprint_cache_lock:
+        cache = load_footprint_cache(cache_path) if cache_path else {}
+
+        signatures = {p: _get_file_signature(p) for p in slc_paths}
+        missing = []
+        for p in slc_paths:
+            entry = cache.get(p)
+            if entry is None or any(
+                entry.get(k) != v for k, v in signatures[p].items()
+            ):
+                missing.append(p)
+
+        if missing:
+            logger.info(
+                f"Extracting footprints for {len(missing)} of {len(slc_paths)} SLCs"
+            )
+            if len(missing) == 1 or max_workers == 1:
+                bboxes = [get_bbox(p) for p in missing]
+            else:
+                with ProcessPoolExecutor(max_workers=max_workers) as pool:
+                    bboxes = list(pool.map(get_bbox, missing))
+
+            for p, bbox in zip(missing, bboxes):
+                cache[p] = dict(signatures[p], bbox=bbox)
+            if cache_path:
+                save_footprint_cache(cache, cache_path)
+
+    return [tuple(cache[p]["bbox"]) if cache[p]["bbox"] else None for p in slc_paths]
+
+
 def get_common_bbox_from_boxes(bboxes):
     if not bboxes or any(b is None for b in bboxes):
         logger.error("Could not compute bounding boxes.")
@@ -92,12 +201,10 @@ def get_common_bbox_from_boxes(bboxes):
     return intersection.bounds  # (min_lon, min_lat, max_lon, max_lat)
 
 
-def get_common_bbox(slc_paths):
+@tracing.trace("get_common_bbox")
+def get_common_bbox(slc_paths, max_workers=None):
     # Get bounding box for all SLCs
-    bboxes = []
-    for slc_path in slc_paths:
-        bbox = get_bbox(slc_path)
-        bboxes.append(bbox)
+    bboxes = get_bboxes(slc_paths, max_workers=max_workers)
 
     common_bbox = get_common_bbox_from_boxes(bboxes)
 
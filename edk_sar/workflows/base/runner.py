@@ -1,44 +1,70 @@
-import math
 import edk_sar as es
 import os
+from edk_sar.constants import DATA_DIR
 from edk_sar.workflows.base.helpers import get_common_bbox, get_bbox
+from edk_sar.workflows.base import staging
+from edk_sar.workflows.base import dem
+from edk_sar.workflows import scheduler
 
 
 def download_dem(bbox):
-    dem_args = [
-        "bash",
-        "/workspace/workflows/base/get_dem.sh",
-        str(math.floor(bbox[1] - 0.25)),
-        str(math.ceil(bbox[3] + 0.25)),
-        str(math.floor(bbox[0] - 0.25)),
-        str(math.ceil(bbox[2] + 0.25)),
-    ]
-
-    dem_cmd = " ".join(dem_args)
-    es.frameworks.isce2.run_cmd(dem_cmd)
+    # Assemble the DEM from the local tile store, fetching only missing tiles
+    return dem.build_dem(bbox)
 
 
 def create_folders():
-    es.frameworks.isce2.run_cmd("mkdir -p /data/slcs")
-    es.frameworks.isce2.run_cmd("mkdir -p /data/dem")
-    es.frameworks.isce2.run_cmd("mkdir -p /data/orbits")
-    es.frameworks.isce2.run_cmd("mkdir -p /data/aux_cal")
-    es.frameworks.isce2.run_cmd("mkdir -p /data/stack")
+    es.frameworks.isce2.run_cmds(
+        [
+            "mkdir -p /data/slcs",
+            "mkdir -p /data/dem",
+            "mkdir -p /data/orbits",
+            "mkdir -p /data/aux_cal",
+            "mkdir -p /data/stack",
+        ],
+        check=True,
+    )
 
 
-def copy_slcs(slc_path):
-    # Copy and move files to edk_sar/data/slcs/ using cp
-    dest_dir = os.path.abspath(
-        os.path.join(os.path.dirname(__file__), "../../data/slcs/")
+def copy_slcs(slc_path, checksum=False, max_workers=4):
+    # Stage SLC zips into edk_sar/data/slcs/, skipping ones already staged
+    dest_dir = os.path.join(DATA_DIR, "slcs")
+    return staging.stage_slcs(
+        slc_path, dest_dir, checksum=checksum, max_workers=max_workers
     )
-    os.makedirs(dest_dir, exist_ok=True)
-
-    os.system(f"cp -r {os.path.join(slc_path, '*.zip')} {dest_dir}/")
 
 
 def get_aux_file():
-    es.frameworks.isce2.run_cmd("bash /workspace/workflows/base/get_aux_file.sh")
+    es.frameworks.isce2.run_cmd(
+        "bash /workspace/workflows/base/get_aux_file.sh", check=True
+    )
 
 
 def create_netrc():
-    es.frameworks.isce2.run_cmd("bash /workspace/workflows/base/create_netrc.sh")
+    es.frameworks.isce2.run_cmd(
+        "bash /workspace/workflows/base/create_netrc.sh", check=True
+    )
+
+
+def get_run_files_marker(workflow):
+    # Both workflows share stack/run_files; the marker tells them apart
+    return os.path.join(DATA_DIR, "stack", "run_files", f".{workflow}")
+
+
+def generate_run_files(workflow, cmd, step):
+    """
+    Runs stackSentinel (cmd) for a workflow and checks that it wrote a run
+    file for step, then writes the workflow's marker: the output of its
+    generate stage. A stale marker is removed first, so a failed run never
+    leaves it behind.
+    """
+    marker = get_run_files_marker(workflow)
+    if os.path.exists(marker):
+        os.remove(marker)
+
+    es.frameworks.isce2.run_cmd(cmd, check=True)
+    if not any(step in name for name in scheduler.get_run_files()):
+        raise RuntimeError(f"stackSentinel wrote no {step} run file for {workflow}")
+
+    with open(marker, "w") as f:
+        f.write(cmd + "\n")
+    return marker
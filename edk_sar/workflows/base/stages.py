@@ -0,0 +1,87 @@
+import os
+import glob
+from edk_sar.constants import DATA_DIR
+from edk_sar.workflows.pipeline import Stage
+from edk_sar.workflows.base.runner import (
+    create_netrc,
+    create_folders,
+    copy_slcs,
+    get_aux_file,
+    download_dem,
+)
+from edk_sar.workflows.base.helpers import get_common_bbox, get_bboxes
+
+STATE_PATH = os.path.join(DATA_DIR, ".edk_pipeline.json")
+AUX_CAL_FILE = "S1A_AUX_CAL_V20140908T000000_G20190626T100201.SAFE.zip"
+
+
+def get_slcs(slc_path):
+    # A directory of SLC zips, or a list of zips (e.g. from workflows.scan)
+    if isinstance(slc_path, (list, tuple)):
+        return sorted(os.path.abspath(p) for p in slc_path)
+    return sorted(glob.glob(os.path.join(slc_path, "*.zip")))
+
+
+def get_files_signature(paths):
+    # Identity of the input files: any new, removed or touched SLC changes it
+    signature = []
+    for p in paths:
+        st = os.stat(p)
+        signature.append([os.path.abspath(p), st.st_size, st.st_mtime_ns])
+    return signature
+
+
+def get_stack_bbox(slcs):
+    # Common footprint of the stack, or a ValueError saying why there is none
+    if not slcs:
+        raise ValueError("No SLC zips to process")
+    bbox = get_common_bbox(slcs)
+    if bbox is None:
+        unreadable = [p for p, b in zip(slcs, get_bboxes(slcs)) if b is None]
+        raise ValueError(
+            f"Could not read the footprint of {len(unreadable)} SLC(s): "
+            + ", ".join(os.path.basename(p) for p in unreadable)
+        )
+    return list(bbox)
+
+
+def get_setup_stages(slc_path):
+    """
+    Setup stages shared by the coregister and interferograms workflows.
+    """
+    slcs = get_slcs(slc_path)
+    slcs_signature = get_files_signature(slcs)
+
+    return [
+        Stage("create_netrc", lambda ctx: create_netrc(), always=True),
+        Stage(
+            "create_folders",
+            lambda ctx: create_folders(),
+            outputs=[
+                os.path.join(DATA_DIR, d)
+                for d in ("slcs", "dem", "orbits", "aux_cal", "stack")
+            ],
+        ),
+        Stage(
+            "copy_slcs",
+            lambda ctx: copy_slcs(slc_path),
+            inputs={"slcs": slcs_signature},
+            outputs=[os.path.join(DATA_DIR, "slcs", os.path.basename(p)) for p in slcs],
+        ),
+        Stage(
+            "get_aux_file",
+            lambda ctx: get_aux_file(),
+            outputs=[os.path.join(DATA_DIR, "aux_cal", AUX_CAL_FILE)],
+        ),
+        Stage(
+            "common_bbox",
+            lambda ctx: get_stack_bbox(slcs),
+            inputs={"slcs": slcs_signature},
+        ),
+        Stage(
+            "download_dem",
+            lambda ctx: download_dem(ctx["common_bbox"]),
+            inputs=lambda ctx: {"bbox": ctx["common_bbox"]},
+            outputs=[os.path.join(DATA_DIR, "dem", "dem.wgs84")],
+        ),
+    ]
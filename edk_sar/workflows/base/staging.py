@@ -0,0 +1,199 @@
+import os
+import json
+import glob
+import shutil
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = ".staged.json"
+
+# ioctl request number for FICLONE (copy-on-write clone) on Linux
+FICLONE = 0x40049409
+
+
+def get_checksum(path, block_size=8 * 1024 * 1024):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def load_manifest(dest_dir):
+    path = os.path.join(dest_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        logger.warning(f"Ignoring unreadable staging manifest {path}")
+        return {}
+
+
+def save_manifest(dest_dir, manifest):
+    path = os.path.join(dest_dir, MANIFEST_NAME)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def is_staged(src, dest, entry, checksum=False):
+    """
+    Whether dest is still the staged copy of src. Size and mtime decide; with
+    checksum the content of dest is also checked against the sha256 stored
+    when it was staged, but only re-hashed when dest changed since.
+    """
+    if entry is None or not os.path.exists(dest):
+        return False
+
+    st = os.stat(src)
+    dest_st = os.stat(dest)
+    if dest_st.st_size != st.st_size:
+        return False
+    if entry.get("size") != st.st_size or entry.get("mtime_ns") != st.st_mtime_ns:
+        return False
+    if not checksum:
+        return True
+    if "sha256" not in entry:
+        return False
+    if entry.get("dest_mtime_ns") == dest_st.st_mtime_ns:
+        return True
+    if entry["sha256"] != get_checksum(dest):
+        return False
+    entry["dest_mtime_ns"] = dest_st.st_mtime_ns
+    return True
+
+
+def _reflink(src, dest):
+    import fcntl
+
+    with open(src, "rb") as fsrc, open(dest, "wb") as fdst:
+        fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+
+
+def stage_file(src, dest):
+    """
+    Places src at dest as cheaply as possible: hardlink, then reflink, then a
+    full copy. Returns the method used.
+    """
+    tmp_dest = f"{dest}.staging"
+    if os.path.lexists(tmp_dest):
+        os.remove(tmp_dest)
+
+    try:
+        os.link(src, tmp_dest)
+        method = "hardlink"
+    except OSError:
+        try:
+            _reflink(src, tmp_dest)
+            shutil.copystat(src, tmp_dest)
+            method = "reflink"
+        except (OSError, ImportError):
+            # copyfile uses sendfile/copy_file_range where the kernel allows it
+            shutil.copyfile(src, tmp_dest)
+            shutil.copystat(src, tmp_dest)
+            method = "copy"
+
+    os.replace(tmp_dest, dest)
+    return method
+
+
+def stage_files(src_paths, dest_dir, checksum=False, max_workers=4):
+    """
+    Incrementally stages files into dest_dir.
+
+    Files already staged and unchanged (size, mtime and optionally the sha256
+    of the staged copy) are skipped; the rest are hardlinked/reflinked when
+    possible and otherwise copied in parallel, and with checksum hashed once
+    as staged. Returns a summary dict.
+    """
+    os.makedirs(dest_dir, exist_ok=True)
+    manifest = load_manifest(dest_dir)
+
+    stats = {
+        "skipped": 0,
+        "hardlink": 0,
+        "reflink": 0,
+        "copy": 0,
+        "bytes_copied": 0,
+        "bytes_avoided": 0,
+    }
+
+    pending = []
+    for src in src_paths:
+        name = os.path.basename(src)
+        dest = os.path.join(dest_dir, name)
+        size = os.path.getsize(src)
+        if is_staged(src, dest, manifest.get(name), checksum=checksum):
+            stats["skipped"] += 1
+            stats["bytes_avoided"] += size
+        else:
+            pending.append((src, dest, size))
+
+    def _stage(item):
+        src, dest, _ = item
+        method = stage_file(src, dest)
+        return method, get_checksum(dest) if checksum else None
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        staged = list(pool.map(_stage, pending))
+
+    for (src, dest, size), (method, sha256) in zip(pending, staged):
+        stats[method] += 1
+        if method == "copy":
+            stats["bytes_copied"] += size
+        else:
+            stats["bytes_avoided"] += size
+
+        st = os.stat(src)
+        entry = {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+        if checksum:
+            entry["sha256"] = sha256
+            entry["dest_mtime_ns"] = os.stat(dest).st_mtime_ns
+        manifest[os.path.basename(src)] = entry
+
+    save_manifest(dest_dir, manifest)
+
+    logger.info(
+        f"Staged {len(src_paths)} files into {dest_dir}: "
+        f"{stats['skipped']} unchanged, {stats['hardlink']} hardlinked, "
+        f"{stats['reflink']} reflinked, {stats['copy']} copied "
+        f"({stats['bytes_copied'] / 1e9:.2f} GB copied, "
+        f"{stats['bytes_avoided'] / 1e9:.2f} GB avoided)"
+    )
+    return stats
+
+
+def unstage_files(dest_dir, keep_names):
+    """
+    Removes staged files not in keep_names, so dest_dir mirrors the current
+    selection. Staged links are cheap to recreate if they are needed again.
+    """
+    manifest = load_manifest(dest_dir)
+    removed = [name for name in manifest if name not in keep_names]
+    for name in removed:
+        path = os.path.join(dest_dir, name)
+        if os.path.exists(path):
+            os.remove(path)
+        del manifest[name]
+    if removed:
+        save_manifest(dest_dir, manifest)
+        logger.info(f"Unstaged {len(removed)} files from {dest_dir}")
+    return removed
+
+
+def stage_slcs(slc_path, dest_dir, checksum=False, max_workers=4):
+    # slc_path is a directory of zips or a list of zip paths
+    if isinstance(slc_path, (list, tuple)):
+        slcs = sorted(slc_path)
+    else:
+        slcs = sorted(glob.glob(os.path.join(slc_path, "*.zip")))
+    stats = stage_files(slcs, dest_dir, checksum=checksum, max_workers=max_workers)
+    # ISCE2 processes every zip in dest_dir, so drop SLCs of earlier selections
+    unstage_files(dest_dir, {os.path.basename(p) for p in slcs})
+    return stats
@@ -0,0 +1,326 @@
+import os
+import re
+import glob
+import sqlite3
+import zipfile
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from lxml import etree
+from shapely.geometry import box
+from shapely.strtree import STRtree
+from edk_sar.constants import CACHE_DIR
+from edk_sar.workflows.base import helpers
+
+logger = logging.getLogger(__name__)
+
+CATALOG_PATH = os.environ.get(
+    "EDK_SAR_CATALOG", os.path.join(CACHE_DIR, "catalog.sqlite")
+)
+
+# S1A_IW_SLC__1SDV_20240101T050000_20240101T050030_051234_0630AB_1C2D
+SAFE_NAME_RE = re.compile(
+    r"(?P<mission>S1[A-D])_(?P<mode>\w\w)_SLC__1S(?P<pol>[SD][VH])_"
+    r"(?P<start>\d{8}T\d{6})_(?P<stop>\d{8}T\d{6})_(?P<orbit>\d{6})_"
+)
+POLARIZATIONS = {"SV": "VV", "DV": "VV VH", "SH": "HH", "DH": "HH HV"}
+# Relative orbit = (absolute orbit - offset) % 175 + 1
+ORBIT_OFFSETS = {"S1A": 73, "S1B": 27, "S1C": 172, "S1D": 0}
+SWATH_RE = re.compile(r"-(iw\d|ew\d|s\d)-slc-(\w\w)-", re.IGNORECASE)
+
+COLUMNS = [
+    "path",
+    "size",
+    "mtime_ns",
+    "mission",
+    "mode",
+    "start_time",
+    "stop_time",
+    "absolute_orbit",
+    "track",
+    "swaths",
+    "polarizations",
+    "min_lon",
+    "min_lat",
+    "max_lon",
+    "max_lat",
+]
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS slcs (path TEXT PRIMARY KEY, {", ".join(COLUMNS[1:])});
+CREATE INDEX IF NOT EXISTS slcs_start_time ON slcs (start_time);
+CREATE TABLE IF NOT EXISTS failed (path TEXT PRIMARY KEY, size, mtime_ns);
+"""
+
+
+def _parse_time(value):
+    return datetime.strptime(value, "%Y%m%dT%H%M%S").isoformat()
+
+
+def _upper_bound(end):
+    # Exclusive bound one unit past end, so end is inclusive at the precision
+    # it was given: "2024-06-30" covers the whole day
+    end = np.datetime64(end)
+    return end + np.timedelta64(1, np.datetime_data(end.dtype)[0])
+
+
+def get_track(mission, absolute_orbit, manifest=None):
+    # The manifest states the relative orbit; the formula is the fallback
+    if manifest is not None:
+        values = manifest.xpath("//*[local-name()='relativeOrbitNumber']/text()")
+        if values:
+            return int(values[0])
+    return (absolute_orbit - ORBIT_OFFSETS.get(mission, 0)) % 175 + 1
+
+
+def get_slc_metadata(slc_path):
+    """
+    Catalog row for one SLC zip: acquisition times, orbit, track, swaths and
+    polarizations from the SAFE name, manifest and annotation file names, and
+    the footprint from helpers.get_bbox.
+    """
+    st = os.stat(slc_path)
+    row = {"path": slc_path, "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+    with zipfile.ZipFile(slc_path, "r") as zf:
+        names = zf.namelist()
+        safe_dir = helpers.get_safe_dir(names)
+        manifest = None
+        if safe_dir and safe_dir + "manifest.safe" in names:
+            with zf.open(safe_dir + "manifest.safe") as f:
+                try:
+                    manifest = etree.parse(f)
+                except etree.XMLSyntaxError:
+                    logger.warning(f"Unreadable manifest in {slc_path}")
+
+    match = SAFE_NAME_RE.search(safe_dir or os.path.basename(slc_path))
+    if match is None:
+        logger.warning(f"Unrecognised SLC name {slc_path}")
+        return None
+
+    orbit = int(match["orbit"])
+    swaths = set()
+    pols = set()
+    for name in helpers.get_safe_file_paths(names, "annotation"):
+        swath_match = SWATH_RE.search(os.path.basename(name))
+        if swath_match:
+            swaths.add(swath_match.group(1).upper())
+            pols.add(swath_match.group(2).upper())
+
+    bbox = helpers.get_bbox(slc_path) or (None,) * 4
+    row.update(
+        {
+            "mission": match["mission"],
+            "mode": match["mode"],
+            "start_time": _parse_time(match["start"]),
+            "stop_time": _parse_time(match["stop"]),
+            "absolute_orbit": orbit,
+            "track": get_track(match["mission"], orbit, manifest),
+            "swaths": " ".join(sorted(swaths)),
+            "polarizations": " ".join(sorted(pols)) or POLARIZATIONS[match["pol"]],
+            "min_lon": bbox[0],
+            "min_lat": bbox[1],
+            "max_lon": bbox[2],
+            "max_lat": bbox[3],
+        }
+    )
+    return row
+
+
+def _read_slc_metadata(slc_path):
+    # None for zips that can't be read, instead of failing the whole update
+    try:
+        return get_slc_metadata(slc_path)
+    except (OSError, zipfile.BadZipFile, etree.XMLSyntaxError, ValueError) as e:
+        logger.warning(f"Could not catalog {slc_path}: {e}")
+        return None
+
+
+class Catalog:
+    """
+    Persistent SQLite catalog of local SLC zips with an in-memory STRtree over
+    their footprints. update() only parses new or modified files (zips that
+    can't be parsed are recorded too, and retried once they change); query()
+    answers bbox/time/track/polarization filters without touching the zips.
+    """
+
+    def __init__(self, path=CATALOG_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+        self._index = None
+
+    @contextmanager
+    def _connect(self):
+        # Commits on success, always closes
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def update(self, paths, max_workers=None, prune=True):
+        """
+        Adds or refreshes the SLC zips in paths (files or directories of
+        *.zip). With prune, entries under the given directories whose file is
+        gone are dropped. Returns the number of files parsed.
+        """
+        files = []
+        dirs = []
+        for p in [paths] if isinstance(paths, str) else paths:
+            p = os.path.abspath(p)
+            if os.path.isdir(p):
+                dirs.append(p)
+                files += glob.glob(os.path.join(p, "*.zip"))
+            else:
+                files.append(p)
+
+        with self._lock, self._connect() as conn:
+            known = {
+                path: (size, mtime_ns)
+                for path, size, mtime_ns in conn.execute(
+                    "SELECT path, size, mtime_ns FROM slcs "
+                    "UNION ALL SELECT path, size, mtime_ns FROM failed"
+                )
+            }
+            changed = []
+            for f in sorted(set(files)):
+                st = os.stat(f)
+                if known.get(f) != (st.st_size, st.st_mtime_ns):
+                    changed.append(f)
+
+            if changed:
+                logger.info(f"Cataloguing {len(changed)} of {len(files)} SLCs")
+                if len(changed) == 1 or max_workers == 1:
+                    rows = [_read_slc_metadata(f) for f in changed]
+                else:
+                    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+                        rows = list(pool.map(_read_slc_metadata, changed))
+                # A file is either catalogued or recorded as failed
+                for table in ("slcs", "failed"):
+                    conn.executemany(
+                        f"DELETE FROM {table} WHERE path = ?", [(f,) for f in changed]
+                    )
+                conn.executemany(
+                    f"INSERT INTO slcs ({', '.join(COLUMNS)}) "
+                    f"VALUES ({', '.join('?' * len(COLUMNS))})",
+                    [[row[c] for c in COLUMNS] for row in rows if row],
+                )
+                conn.executemany(
+                    "INSERT INTO failed (path, size, mtime_ns) VALUES (?, ?, ?)",
+                    [
+                        (f, os.stat(f).st_size, os.stat(f).st_mtime_ns)
+                        for f, row in zip(changed, rows)
+                        if row is None
+                    ],
+                )
+
+            removed = []
+            if prune:
+                removed = [
+                    (path,)
+                    for path in known
+                    if any(path.startswith(d + os.sep) for d in dirs)
+                    and not os.path.exists(path)
+                ]
+                for table in ("slcs", "failed"):
+                    conn.executemany(f"DELETE FROM {table} WHERE path = ?", removed)
+
+            if changed or removed:
+                self._index = None
+        return len(changed)
+
+    def _get_index(self):
+        # Rows and STRtree are rebuilt only after the catalog changed
+        if self._index is None:
+            with self._connect() as conn:
+                rows = conn.execute(
+                    f"SELECT {', '.join(COLUMNS)} FROM slcs "
+                    "WHERE min_lon IS NOT NULL ORDER BY start_time"
+                ).fetchall()
+            rows = [dict(zip(COLUMNS, r)) for r in rows]
+            tree = STRtree(
+                [
+                    box(r["min_lon"], r["min_lat"], r["max_lon"], r["max_lat"])
+                    for r in rows
+                ]
+            )
+            starts = np.array([r["start_time"] for r in rows], dtype="datetime64[s]")
+            self._index = (rows, tree, starts)
+        return self._index
+
+    def query(
+        self, bbox=None, start=None, end=None, track=None, polarization=None, swath=None
+    ):
+        """
+        Catalog rows intersecting bbox (min_lon, min_lat, max_lon, max_lat)
+        and acquired in [start, end], ordered by acquisition time. Both bounds
+        are inclusive at the precision given: end="2024-06-30" includes
+        acquisitions made during 30 June.
+        """
+        rows, tree, starts = self._get_index()
+        if bbox is not None:
+            selected = np.sort(tree.query(box(*bbox), predicate="intersects"))
+        else:
+            selected = np.arange(len(rows))
+
+        if start is not None:
+            selected = selected[starts[selected] >= np.datetime64(start)]
+        if end is not None:
+            selected = selected[starts[selected] < _upper_bound(end)]
+
+        result = []
+        for i in selected:
+            row = rows[i]
+            if track is not None and row["track"] != track:
+                continue
+            if (
+                polarization
+                and polarization.upper() not in row["polarizations"].split()
+            ):
+                continue
+            if swath and swath.upper() not in row["swaths"].split():
+                continue
+            result.append(row)
+        return result
+
+
+_catalogs = {}
+
+
+def get_catalog(path=CATALOG_PATH):
+    # One Catalog (and STRtree) per path and process
+    if path not in _catalogs:
+        _catalogs[path] = Catalog(path)
+    return _catalogs[path]
+
+
+def scan(
+    bbox=None,
+    start=None,
+    end=None,
+    slc_dirs=None,
+    track=None,
+    polarization=None,
+    catalog_path=CATALOG_PATH,
+    max_workers=None,
+):
+    """
+    Local SLC zips covering bbox between start and end (both inclusive, e.g.
+    "YYYY-MM-DD"), as a list of paths that the workflows accept in place of
+    a directory. slc_dirs (directories
+    or files) are catalogued first; only new or modified zips are parsed.
+    """
+    catalog = get_catalog(catalog_path)
+    if slc_dirs:
+        catalog.update(slc_dirs, max_workers=max_workers)
+    rows = catalog.query(
+        bbox=bbox, start=start, end=end, track=track, polarization=polarization
+    )
+    return [row["path"] for row in rows]
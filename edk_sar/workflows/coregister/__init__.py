@@ -1,5 +1,5 @@
 import edk_sar.workflows.coregister.runner as runner
 
 
-def run(slc_path):
-    runner.run(slc_path)
+def run(slc_path, force=False):
+    runner.run(slc_path, force=force)
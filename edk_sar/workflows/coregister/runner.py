@@ -1,10 +1,19 @@
 import edk_sar as es
+from edk_sar import tracing
 from osgeo import gdal
 import math
 import os
 import logging
 import xml.etree.ElementTree as ET
 import glob
+from edk_sar.constants import DATA_DIR
+from edk_sar.workflows.pipeline import Pipeline, Stage
+from edk_sar.workflows.base import stages
+from edk_sar.workflows import scheduler
+from edk_sar.workflows.base.runner import (
+    generate_run_files as generate_stack_run_files,
+    get_run_files_marker,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -14,35 +23,36 @@ def generate_run_files():
         "bash",
         "/workspace/workflows/coregister/generate_run_files.sh",
     ]
-    es.frameworks.isce2.run_cmd(" ".join(run_files_cmd))
-
-
-def execute_run_files():
-    es.frameworks.isce2.run_cmd(
-        "bash /workspace/workflows/coregister/execute_run_files.sh"
+    return generate_stack_run_files(
+        "coregister", " ".join(run_files_cmd), "merge_reference_secondary_slc"
     )
 
 
-def run(slc_path):
-    es.workflows.base.create_netrc()
-
-    # Creating folders in docker container
-    es.workflows.base.create_folders()
-
-    # Copy SLCs to docker container
-    es.workflows.base.copy_slcs(slc_path)
-
-    # Get aux file
-    es.workflows.base.get_aux_file()
-
-    slcs = glob.glob(os.path.join(slc_path, "*.zip"))
-    # Getting common bounding box for all SLCs
-    common_bbox = es.workflows.base.get_common_bbox(slcs)
-    # Download DEM
-    es.workflows.base.download_dem(common_bbox)
+def execute_run_files(max_cpus=None, max_memory_gb=None):
+    # Steps run in order, independent commands within a step concurrently
+    scheduler.execute_run_files(max_cpus=max_cpus, max_memory_gb=max_memory_gb)
+
+
+def get_stages(slc_path):
+    return stages.get_setup_stages(slc_path) + [
+        # Generate run_files for coregistration
+        Stage(
+            "coregister.generate_run_files",
+            lambda ctx: generate_run_files(),
+            inputs=lambda ctx: {"bbox": ctx["common_bbox"]},
+            outputs=[get_run_files_marker("coregister")],
+        ),
+        # Executing run files
+        Stage(
+            "coregister.execute_run_files",
+            lambda ctx: execute_run_files(),
+            outputs=[os.path.join(DATA_DIR, "stack", "merged", "SLC")],
+        ),
+    ]
 
-    # Generate run_files for coregistration
-    generate_run_files()
 
-    # Executing run files one by one
-    execute_run_files()
+@tracing.trace("coregister.run")
+def run(slc_path, force=False):
+    # Completed stages are skipped; a failed run resumes where it stopped
+    pipeline = Pipeline(get_stages(slc_path), stages.STATE_PATH)
+    pipeline.run(force=force)
@@ -1,5 +1,25 @@
 import edk_sar.workflows.interferograms.runner as runner
 
 
-def run(slc_path, polarization=None, swath_nums=None):
-    runner.run(slc_path, polarization=polarization, swath_nums=swath_nums)
+def run(
+    slc_path,
+    polarization=None,
+    swath_nums=None,
+    force=False,
+    max_memory_gb=None,
+    network=None,
+    reference_pixel=None,
+):
+    runner.run(
+        slc_path,
+        polarization=polarization,
+        swath_nums=swath_nums,
+        force=force,
+        max_memory_gb=max_memory_gb,
+        network=network,
+        reference_pixel=reference_pixel,
+    )
+
+
+def open_timeseries(out_path=runner.TIMESERIES_PATH):
+    return runner.open_timeseries(out_path)
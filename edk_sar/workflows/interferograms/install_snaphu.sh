@@ -0,0 +1,26 @@
+#!/bin/bash
+
+# Usage: install_snaphu.sh [prefix]
+# Builds snaphu from source into <prefix>/bin/snaphu (default /data/tools/snaphu)
+# when the ISCE2 image has no snaphu binary. The prefix lives on the /data
+# mount, so the build survives container rebuilds.
+set -e
+PREFIX=${1:-/data/tools/snaphu}
+VERSION=2.0.7
+
+if [ -x "$PREFIX/bin/snaphu" ]; then
+  exit 0
+fi
+
+BUILD_DIR=$(mktemp -d)
+trap 'rm -rf "$BUILD_DIR"' EXIT
+cd "$BUILD_DIR"
+wget -q "https://web.stanford.edu/group/radar/softwareandlinks/sw/snaphu/snaphu_v${VERSION}.tar.gz"
+tar xzf "snaphu_v${VERSION}.tar.gz"
+cd "snaphu-v${VERSION}/src"
+make
+
+mkdir -p "$PREFIX/bin"
+# Renamed into place so a partial copy is never taken for an install
+cp "$(find .. -type f -name snaphu -perm -u+x | head -n 1)" "$PREFIX/bin/snaphu.tmp"
+mv "$PREFIX/bin/snaphu.tmp" "$PREFIX/bin/snaphu"
@@ -0,0 +1,396 @@
+import os
+import re
+import math
+import shutil
+import zipfile
+import logging
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from lxml import etree
+from edk_sar.workflows import scheduler
+from edk_sar.workflows.base import helpers
+from edk_sar.workflows.interferograms import unwrap
+
+logger = logging.getLogger(__name__)
+
+STRATEGIES = ("small-baseline", "sequential", "max-temporal-span")
+DEFAULT_MAX_DAYS = {"small-baseline": 48, "max-temporal-span": 96}
+DEFAULT_MAX_BPERP = 150.0
+DEFAULT_SEQUENTIAL = 3
+
+# Coherence proxy: exp(-dt / tau) * (1 - |Bperp| / Bperp_crit). A C-band
+# temporal decorrelation scale, and the Sentinel-1 IW critical baseline.
+TEMPORAL_DECORRELATION_DAYS = 40.0
+CRITICAL_BPERP = 5000.0
+
+# Run files with one command per interferogram; the other steps (including
+# the ESD pairs of the coregistration) are left untouched
+PAIR_STEPS = ("generate_burst_igram", "merge_burst_igram", "filter_coherence", "unwrap")
+# The pair steps run by the scheduler; unwrapping is the unwrap stage's
+SCHEDULED_PAIR_STEPS = PAIR_STEPS[:-1]
+PAIR_RE = re.compile(r"(\d{8})_(\d{8})")
+# Merged products per pair: .int, filt_fine.int, .cor, filt_fine.cor, .unw
+PAIR_BYTES_PER_PIXEL = 8 + 8 + 4 + 4 + 8
+
+WGS84_A = 6378137.0
+WGS84_E2 = 6.69437999014e-3
+
+
+def lonlath_to_ecef(lon, lat, height=0.0):
+    lon = np.radians(lon)
+    lat = np.radians(lat)
+    n = WGS84_A / np.sqrt(1 - WGS84_E2 * np.sin(lat) ** 2)
+    return np.array(
+        [
+            (n + height) * np.cos(lat) * np.cos(lon),
+            (n + height) * np.cos(lat) * np.sin(lon),
+            (n * (1 - WGS84_E2) + height) * np.sin(lat),
+        ]
+    )
+
+
+def _get_floats(tree, path):
+    return np.array([float(v) for v in tree.xpath(path)])
+
+
+def get_acquisition(slc_path):
+    """
+    Acquisition date, orbit state vectors (times in seconds since the first
+    one, ECEF positions and velocities) and scene centre (ECEF) from the first
+    annotation file of an SLC zip.
+    """
+    with zipfile.ZipFile(slc_path, "r") as zf:
+        names = sorted(
+            n
+            for n in helpers.get_safe_file_paths(zf.namelist(), "annotation")
+            if n.endswith(".xml")
+        )
+        if not names:
+            logger.warning(f"No annotation in {slc_path}")
+            return None
+        with zf.open(names[0]) as f:
+            tree = etree.parse(f)
+
+    start = tree.xpath("//adsHeader/startTime/text()")
+    match = re.search(r"_(\d{8})T\d{6}_", os.path.basename(slc_path))
+    if start:
+        date = start[0][:10].replace("-", "")
+    elif match:
+        date = match.group(1)
+    else:
+        logger.warning(f"No acquisition time for {slc_path}")
+        return None
+
+    times = np.array(
+        tree.xpath("//orbitList/orbit/time/text()"), dtype="datetime64[us]"
+    )
+    acquisition = {"path": slc_path, "date": date, "orbit": None}
+    if len(times) >= 4:
+        seconds = (times - times[0]) / np.timedelta64(1, "s")
+        position = np.stack(
+            [
+                _get_floats(tree, f"//orbitList/orbit/position/{c}/text()")
+                for c in "xyz"
+            ],
+            axis=1,
+        )
+        velocity = np.stack(
+            [
+                _get_floats(tree, f"//orbitList/orbit/velocity/{c}/text()")
+                for c in "xyz"
+            ],
+            axis=1,
+        )
+        acquisition["orbit"] = (seconds, position, velocity)
+
+    lons = _get_floats(tree, "//geolocationGridPoint/longitude/text()")
+    lats = _get_floats(tree, "//geolocationGridPoint/latitude/text()")
+    heights = _get_floats(tree, "//geolocationGridPoint/height/text()")
+    acquisition["centre"] = (
+        lonlath_to_ecef(lons.mean(), lats.mean(), heights.mean() if len(heights) else 0)
+        if len(lons)
+        else None
+    )
+    return acquisition
+
+
+def get_zero_doppler_state(orbit, target, iterations=10):
+    """
+    Satellite position and velocity when the target is at zero Doppler
+    (velocity perpendicular to the line of sight), from cubic fits to the
+    state vectors and Newton iterations.
+    """
+    seconds, position, velocity = orbit
+    # Fit around the closest state vector; the orbit is smooth over minutes
+    i = int(np.argmin(np.linalg.norm(position - target, axis=1)))
+    window = slice(max(i - 4, 0), min(i + 5, len(seconds)))
+    t0 = seconds[window].mean()
+    ts = seconds[window] - t0
+    pos_fit = [np.polyfit(ts, position[window, k], 3) for k in range(3)]
+    vel_fit = [np.polyfit(ts, velocity[window, k], 3) for k in range(3)]
+
+    t = seconds[i] - t0
+    for _ in range(iterations):
+        p = np.array([np.polyval(c, t) for c in pos_fit])
+        v = np.array([np.polyval(c, t) for c in vel_fit])
+        a = np.array([np.polyval(np.polyder(c), t) for c in vel_fit])
+        step = np.dot(v, p - target) / (np.dot(a, p - target) + np.dot(v, v))
+        t -= step
+        if abs(step) < 1e-6:
+            break
+    p = np.array([np.polyval(c, t) for c in pos_fit])
+    v = np.array([np.polyval(c, t) for c in vel_fit])
+    return p, v
+
+
+def get_perpendicular_baselines(acquisitions):
+    """
+    Perpendicular baseline (m) of every acquisition relative to the first, at
+    the scene centre of the first. Positive when the satellite is to the
+    right of the reference line of sight looking along track. NaN when an
+    acquisition has no orbit.
+    """
+    ref = acquisitions[0]
+    if ref["orbit"] is None or ref["centre"] is None:
+        return np.full(len(acquisitions), np.nan)
+
+    target = ref["centre"]
+    p0, v0 = get_zero_doppler_state(ref["orbit"], target)
+    los = (p0 - target) / np.linalg.norm(p0 - target)
+
+    bperp = np.full(len(acquisitions), np.nan)
+    for k, acquisition in enumerate(acquisitions):
+        if acquisition["orbit"] is None:
+            continue
+        p, _ = get_zero_doppler_state(acquisition["orbit"], target)
+        baseline = p - p0
+        perp = baseline - np.dot(baseline, los) * los
+        sign = np.sign(np.dot(np.cross(los, baseline), v0)) or 1.0
+        bperp[k] = sign * np.linalg.norm(perp)
+    return bperp
+
+
+def get_acquisitions(slc_paths, max_workers=None):
+    """
+    Dates ("YYYYMMDD", sorted) and perpendicular baselines (m) of a stack.
+    Slices of the same date share one entry, taken from the first slice with
+    an orbit.
+    """
+    slc_paths = sorted(slc_paths)
+    if len(slc_paths) > 1 and max_workers != 1:
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            parsed = list(pool.map(get_acquisition, slc_paths))
+    else:
+        parsed = [get_acquisition(p) for p in slc_paths]
+
+    by_date = {}
+    for acquisition in filter(None, parsed):
+        current = by_date.get(acquisition["date"])
+        if current is None or (current["orbit"] is None and acquisition["orbit"]):
+            by_date[acquisition["date"]] = acquisition
+
+    dates = sorted(by_date)
+    bperp = get_perpendicular_baselines([by_date[d] for d in dates]) if dates else []
+    if np.isnan(bperp).any():
+        logger.warning("Missing orbit state vectors, baselines assumed zero")
+        bperp = np.nan_to_num(bperp)
+    return dates, np.asarray(bperp, np.float64)
+
+
+def to_datetime64(dates):
+    return np.array(
+        [f"{d[:4]}-{d[4:6]}-{d[6:8]}" for d in dates], dtype="datetime64[D]"
+    )
+
+
+def coherence_proxy(days, bperp):
+    # Temporal and geometric decorrelation; 0 at or beyond the critical baseline
+    temporal = np.exp(-np.abs(days) / TEMPORAL_DECORRELATION_DAYS)
+    geometric = np.clip(1 - np.abs(bperp) / CRITICAL_BPERP, 0, 1)
+    return temporal * geometric
+
+
+def _connect(n_dates, i, j):
+    """
+    Adds consecutive-date pairs between the components of the (i, j) graph,
+    so the SBAS inversion has a single connected network.
+    """
+    parent = list(range(n_dates))
+
+    def find(a):
+        while parent[a] != a:
+            parent[a] = parent[parent[a]]
+            a = parent[a]
+        return a
+
+    for a, b in zip(i, j):
+        parent[find(a)] = find(b)
+
+    bridges = []
+    for a in range(n_dates - 1):
+        if find(a) != find(a + 1):
+            parent[find(a)] = find(a + 1)
+            bridges.append((a, a + 1))
+    return bridges
+
+
+def select_pairs(
+    dates,
+    bperp,
+    strategy="small-baseline",
+    max_days=None,
+    max_bperp=None,
+    n=DEFAULT_SEQUENTIAL,
+    min_coherence=None,
+    connect=True,
+):
+    """
+    Indices (i, j), i < j, of the pairs to form from sorted dates
+    (datetime64) and perpendicular baselines (m).
+
+    small-baseline keeps pairs within max_days and max_bperp, sequential
+    pairs every date with its n next ones, and max-temporal-span keeps every
+    pair within max_days. Pairs whose coherence proxy is below min_coherence
+    are dropped; with connect, consecutive pairs are added back where the
+    network would otherwise be split.
+    """
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown strategy {strategy}, expected one of {STRATEGIES}")
+
+    n_dates = len(dates)
+    i, j = np.triu_indices(n_dates, k=1)
+    days = (dates[j] - dates[i]) / np.timedelta64(1, "D")
+    dbperp = bperp[j] - bperp[i]
+
+    if strategy == "sequential":
+        keep = (j - i) <= n
+    else:
+        keep = days <= (max_days or DEFAULT_MAX_DAYS[strategy])
+        if strategy == "small-baseline":
+            keep &= np.abs(dbperp) <= (max_bperp or DEFAULT_MAX_BPERP)
+    if min_coherence is not None:
+        keep &= coherence_proxy(days, dbperp) >= min_coherence
+
+    pairs = set(zip(i[keep].tolist(), j[keep].tolist()))
+    if connect:
+        pairs.update(_connect(n_dates, i[keep], j[keep]))
+    return sorted(pairs)
+
+
+def estimate_cost(n_dates, n_pairs, shape=None, max_cpus=None, max_memory_gb=None):
+    """
+    Up-front cost of an interferogram network: pair counts against the full
+    network and, per scheduled pair step, how many commands run at once
+    within the CPU/memory budgets (the scheduler defaults), their peak memory
+    and the number of waves. With the (rows, cols) of the merged
+    interferograms, also disk for the merged products and the peak memory of
+    unwrapping one pair within the budget.
+    """
+    max_cpus = max_cpus or scheduler.MAX_CPUS
+    max_memory_gb = max_memory_gb or scheduler.MAX_MEMORY_GB
+    n_all = n_dates * (n_dates - 1) // 2
+
+    steps = {}
+    for step in SCHEDULED_PAIR_STEPS:
+        cpus, memory_gb = scheduler.get_step_resources(step)
+        concurrent = max(
+            1, min(n_pairs, max_cpus // cpus, int(max_memory_gb // memory_gb))
+        )
+        steps[step] = {
+            "concurrent": concurrent,
+            "peak_memory_gb": concurrent * memory_gb,
+            "waves": math.ceil(n_pairs / concurrent),
+        }
+
+    cost = {
+        "dates": n_dates,
+        "pairs": n_pairs,
+        "all_pairs": n_all,
+        "fraction": n_pairs / n_all if n_all else 0.0,
+        "commands": n_pairs * len(SCHEDULED_PAIR_STEPS),
+        "peak_memory_gb": max(s["peak_memory_gb"] for s in steps.values()),
+        "steps": steps,
+    }
+    if shape is not None:
+        rows, cols = shape
+        cost["disk_gb"] = n_pairs * rows * cols * PAIR_BYTES_PER_PIXEL / 1024**3
+        _, cost["unwrap_memory_gb"] = unwrap.choose_tiling(
+            rows, cols, max_memory_gb, max_cpus
+        )
+    return cost
+
+
+def plan_pairs(
+    slc_paths, strategy="small-baseline", shape=None, max_workers=None, **kwargs
+):
+    """
+    Pair network for a stack of SLC zips: dates and perpendicular baselines
+    from the annotation orbits, pairs chosen by select_pairs (keyword
+    arguments are passed on), their coherence proxy and the cost estimate.
+    Returns a JSON-serialisable dict; "pairs" are "YYYYMMDD_YYYYMMDD" names
+    as used by the run files.
+    """
+    dates, bperp = get_acquisitions(slc_paths, max_workers=max_workers)
+    if len(dates) < 2:
+        raise ValueError(f"Need at least two dates, found {len(dates)}")
+
+    dates64 = to_datetime64(dates)
+    indices = select_pairs(dates64, bperp, strategy=strategy, **kwargs)
+    i = np.array([p[0] for p in indices], int)
+    j = np.array([p[1] for p in indices], int)
+    days = (dates64[j] - dates64[i]) / np.timedelta64(1, "D")
+    proxy = coherence_proxy(days, bperp[j] - bperp[i])
+
+    cost = estimate_cost(len(dates), len(indices), shape)
+    logger.info(
+        f"{strategy} network: {cost['pairs']} of {cost['all_pairs']} pairs "
+        f"over {cost['dates']} dates, {cost['commands']} pair commands "
+        f"(peak ~{cost['peak_memory_gb']:.1f} GB), "
+        f"mean coherence proxy {proxy.mean():.2f}"
+    )
+    return {
+        "strategy": strategy,
+        "dates": dates,
+        "bperp": [round(float(b), 2) for b in bperp],
+        "pairs": [f"{dates[a]}_{dates[b]}" for a, b in indices],
+        "coherence_proxy": [round(float(c), 3) for c in proxy],
+        "cost": cost,
+    }
+
+
+def filter_run_files(pairs, run_files_dir=scheduler.RUN_FILES_DIR):
+    """
+    Keeps only the commands of the given pairs in the interferogram run files
+    (PAIR_STEPS). The generated file is kept as <run file>.all, so filtering
+    again with another network starts from the full list; the copy is
+    refreshed when stackSentinel has regenerated the run file since. Returns
+    the number of commands removed.
+    """
+    pairs = set(pairs)
+    removed = 0
+    for step in scheduler.get_run_files(run_files_dir):
+        if not any(s in step for s in PAIR_STEPS):
+            continue
+        path = os.path.join(run_files_dir, step)
+        original = f"{path}.all"
+        if not os.path.exists(original) or (
+            os.stat(path).st_mtime_ns > os.stat(original).st_mtime_ns
+        ):
+            shutil.copy2(path, original)
+
+        lines = []
+        with open(original) as f:
+            for line in f:
+                match = PAIR_RE.search(line)
+                if match and f"{match.group(1)}_{match.group(2)}" not in pairs:
+                    removed += 1
+                    continue
+                lines.append(line)
+        with open(path, "w") as f:
+            f.writelines(lines)
+        # Only a regenerated run file is newer than its .all copy
+        st = os.stat(original)
+        os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns))
+
+    logger.info(f"Removed {removed} commands outside the pair network")
+    return removed
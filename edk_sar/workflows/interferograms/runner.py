@@ -2,29 +2,122 @@ import glob
 import os
 import logging
 import edk_sar as es
-from edk_sar.workflows.base import helpers
+from edk_sar import tracing
+from edk_sar.constants import DATA_DIR
+from edk_sar.workflows.pipeline import Pipeline, Stage
+from edk_sar.workflows.base import stages
+from edk_sar.workflows.base.runner import (
+    generate_run_files as generate_stack_run_files,
+    get_run_files_marker,
+)
+from edk_sar.workflows import scheduler
+from edk_sar.workflows.interferograms import unwrap
+from edk_sar.workflows.interferograms.network import plan_pairs, filter_run_files
+from edk_sar import readers
+from edk_sar import timeseries
 
 logger = logging.getLogger(__name__)
 
+TIMESERIES_PATH = os.path.join(DATA_DIR, "timeseries", "displacement.npy")
 
-def run(slc_path, polarization=None, swath_nums=None):
-    # --- 1. Prepare environment ---
-    es.workflows.base.create_netrc()
-    es.workflows.base.create_folders()
-    es.workflows.base.copy_slcs(slc_path)
-    es.workflows.base.get_aux_file()
 
-    # --- 2. Download DEM ---
-    slcs = glob.glob(os.path.join(slc_path, "*.zip"))
-    common_bbox = helpers.get_common_bbox(slcs)
-    es.workflows.base.download_dem(common_bbox)
+def get_network_options(network):
+    # None (every pair), a strategy name, or a dict of plan_pairs arguments
+    if network is None or isinstance(network, dict):
+        return network
+    return {"strategy": network}
 
-    # --- 3. Generate and execute run files ---
-    generate_run_files(polarization, swath_nums)
-    execute_run_files()
 
+def get_stages(
+    slc_path,
+    polarization=None,
+    swath_nums=None,
+    max_memory_gb=None,
+    network=None,
+    reference_pixel=None,
+):
+    # --- 1. Prepare environment and DEM (shared with coregister) ---
+    result = stages.get_setup_stages(slc_path)
 
-def generate_run_files(polarization=None, swath_nums=None):
+    # --- 2. Plan the pair network (optional, every pair otherwise) ---
+    network = get_network_options(network)
+    if network is not None:
+        slcs = stages.get_slcs(slc_path)
+        result.append(
+            Stage(
+                "interferograms.plan_network",
+                lambda ctx: plan_pairs(slcs, **network),
+                inputs={
+                    "slcs": stages.get_files_signature(slcs),
+                    "network": network,
+                },
+            )
+        )
+
+    def get_pairs(ctx):
+        plan = ctx.get("interferograms.plan_network")
+        return plan["pairs"] if network is not None else None
+
+    return result + [
+        # --- 3. Generate and execute run files ---
+        Stage(
+            "interferograms.generate_run_files",
+            lambda ctx: generate_run_files(polarization, swath_nums, get_pairs(ctx)),
+            inputs=lambda ctx: {
+                "bbox": ctx["common_bbox"],
+                "polarization": polarization,
+                "swath_nums": swath_nums,
+                **({"pairs": get_pairs(ctx)} if network is not None else {}),
+            },
+            outputs=[get_run_files_marker("interferograms")],
+        ),
+        Stage(
+            "interferograms.execute_run_files",
+            lambda ctx: execute_run_files(),
+            outputs=[os.path.join(DATA_DIR, "stack", "merged", "interferograms")],
+        ),
+        # --- 4. Unwrap within the memory budget (replaces run_*_unwrap) ---
+        Stage(
+            "interferograms.unwrap",
+            lambda ctx: unwrap.unwrap_interferograms(max_memory_gb=max_memory_gb),
+            inputs={"max_memory_gb": max_memory_gb},
+        ),
+        # --- 5. SBAS inversion into a (date, y, x) displacement cube ---
+        Stage(
+            "interferograms.timeseries",
+            lambda ctx: invert_timeseries(reference_pixel=reference_pixel),
+            inputs={"reference_pixel": reference_pixel},
+            outputs=[TIMESERIES_PATH],
+        ),
+    ]
+
+
+@tracing.trace("interferograms.run")
+def run(
+    slc_path,
+    polarization=None,
+    swath_nums=None,
+    force=False,
+    max_memory_gb=None,
+    network=None,
+    reference_pixel=None,
+):
+    # Completed stages are skipped; a failed run resumes where it stopped
+    pipeline = Pipeline(
+        get_stages(
+            slc_path,
+            polarization,
+            swath_nums,
+            max_memory_gb=max_memory_gb,
+            network=network,
+            reference_pixel=reference_pixel,
+        ),
+        stages.STATE_PATH,
+    )
+    pipeline.run(force=force)
+
+
+def generate_run_files(polarization=None, swath_nums=None, pairs=None):
     run_files_cmd = [
         "bash",
         "/workspace/workflows/interferograms/generate_run_files.sh",
@@ -39,10 +132,32 @@ def generate_run_files(polarization=None, swath_nums=None):
     cmd_str = " ".join(f'"{x}"' for x in run_files_cmd)
     logger.info(f"Generating run files: {cmd_str}")
 
-    es.frameworks.isce2.run_cmd(cmd_str)
+    generate_stack_run_files("interferograms", cmd_str, "generate_burst_igram")
+
+    # stackSentinel writes every pair; keep only the planned network
+    if pairs is not None:
+        filter_run_files(pairs)
+
+
+def execute_run_files(max_cpus=None, max_memory_gb=None):
+    # Steps run in order, independent commands within a step concurrently
+    # Unwrapping is left to the interferograms.unwrap stage
+    scheduler.execute_run_files(
+        max_cpus=max_cpus, max_memory_gb=max_memory_gb, exclude=["unwrap"]
+    )
+
+
+def invert_timeseries(out_path=TIMESERIES_PATH, **kwargs):
+    # Extra keyword arguments go to timeseries.invert. Returns the path only:
+    # the stage result is checkpointed as JSON.
+    stack = readers.open_interferograms()
+    timeseries.invert(stack, out_path, **kwargs)
+    return out_path
 
 
-def execute_run_files():
-    cmd_str = "bash /workspace/workflows/interferograms/execute_run_files.sh"
-    logger.info(f"Executing run files: {cmd_str}")
-    es.frameworks.isce2.run_cmd(cmd_str)
+def open_timeseries(out_path=TIMESERIES_PATH):
+    """
+    The workflow's (date, y, x) displacement cube as a memory-mapped
+    DataArray, in radar geometry (geocode it before export).
+    """
+    return timeseries.open_displacement(out_path, readers.open_interferograms())
@@ -0,0 +1,309 @@
+import os
+import glob
+import math
+import logging
+import subprocess
+from osgeo import gdal
+import edk_sar as es
+from edk_sar import tracing
+from edk_sar.constants import DATA_DIR
+from edk_sar.workflows import scheduler
+
+gdal.UseExceptions()
+
+logger = logging.getLogger(__name__)
+
+INTERFEROGRAMS_DIR = os.path.join(DATA_DIR, "stack", "merged", "interferograms")
+# Same directory as seen from the stack directory inside the container
+CONTAINER_INTERFEROGRAMS_DIR = "merged/interferograms"
+
+SNAPHU_BIN = os.environ.get("EDK_SAR_SNAPHU", "snaphu")
+# Where install_snaphu.sh builds snaphu in the container when SNAPHU_BIN is missing
+SNAPHU_INSTALL_DIR = "/data/tools/snaphu"
+INSTALLED_SNAPHU_BIN = f"{SNAPHU_INSTALL_DIR}/bin/snaphu"
+# Run ISCE2's own untiled run_*_unwrap when snaphu can't be found or built.
+# Off by default: its memory is not bounded by the budget.
+_fallback = os.environ.get("EDK_SAR_ISCE_UNWRAP_FALLBACK", "").lower()
+ISCE_UNWRAP_FALLBACK = _fallback in ("1", "true", "yes")
+
+# Bytes per pixel of the arrays snaphu 2.x keeps for a tile with statistical
+# (DEFO/SMOOTH) costs on a 64-bit build; there is one row and one column arc
+# per pixel. Inputs and outputs are float32 rasters.
+SNAPHU_PIXEL_BYTES = {
+    "wrapped phase, magnitude, power, correlation": 4 * 4,
+    "unwrapped phase": 4,
+    "costT per arc (4 shorts)": 2 * 8,
+    "flows per arc (short)": 2 * 2,
+    "apexes per arc (pointer)": 2 * 8,
+    "iscandidate per arc (char)": 2 * 1,
+    "nodeT (3 pointers, row/col, level/group, incost/outcost)": 56,
+}
+SNAPHU_BYTES_PER_PIXEL = sum(SNAPHU_PIXEL_BYTES.values())
+DEFAULT_OVERLAP = 400
+# Tiles smaller than this don't unwrap reliably
+MIN_TILE_SIZE = 1000
+
+
+def estimate_memory_gb(rows, cols):
+    return rows * cols * SNAPHU_BYTES_PER_PIXEL / 1024**3
+
+
+def choose_tiling(rows, cols, max_memory_gb, max_cpus, overlap=DEFAULT_OVERLAP):
+    """
+    snaphu tile parameters for a rows x cols interferogram so that the tiles
+    run in parallel (NPROC) fit within max_memory_gb. Returns (params,
+    memory_gb) where memory_gb is the estimated peak of the whole run.
+
+    The grid is refined along its longer tile side until one tile per CPU fits
+    the budget, or tiles reach MIN_TILE_SIZE.
+    """
+    full_gb = estimate_memory_gb(rows, cols)
+    ntilerow = ntilecol = 1
+    while True:
+        n_tiles = ntilerow * ntilecol
+        tile_rows = math.ceil(rows / ntilerow) + (overlap if ntilerow > 1 else 0)
+        tile_cols = math.ceil(cols / ntilecol) + (overlap if ntilecol > 1 else 0)
+        tile_gb = estimate_memory_gb(tile_rows, tile_cols)
+        if n_tiles == 1 and full_gb <= max_memory_gb:
+            break
+        if tile_gb <= max_memory_gb / min(max_cpus, n_tiles):
+            break
+
+        split_rows = tile_rows >= tile_cols
+        next_size = rows / (ntilerow + 1) if split_rows else cols / (ntilecol + 1)
+        if next_size < MIN_TILE_SIZE:
+            if tile_gb > max_memory_gb:
+                raise ValueError(
+                    f"Cannot unwrap {rows}x{cols} within {max_memory_gb:g} GB"
+                )
+            break
+        if split_rows:
+            ntilerow += 1
+        else:
+            ntilecol += 1
+
+    n_tiles = ntilerow * ntilecol
+    nproc = max(1, min(max_cpus, n_tiles, int(max_memory_gb // tile_gb)))
+    params = {
+        "NTILEROW": ntilerow,
+        "NTILECOL": ntilecol,
+        "ROWOVRLP": overlap if ntilerow > 1 else 0,
+        "COLOVRLP": overlap if ntilecol > 1 else 0,
+        "NPROC": nproc,
+    }
+    return params, (tile_gb * nproc if n_tiles > 1 else full_gb)
+
+
+def get_dims(path):
+    # (rows, cols) from the ISCE .vrt sidecar
+    ds = gdal.Open(f"{path}.vrt")
+    dims = (ds.RasterYSize, ds.RasterXSize)
+    ds = None
+    return dims
+
+
+def write_snaphu_config(path, pair_dir, params, cost_mode="DEFO"):
+    """
+    snaphu configuration for one pair. Paths are relative to the stack
+    directory the command runs in. snaphu unwraps the tiles in parallel and
+    re-solves the tile offsets on a secondary network, so the stitched result
+    has consistent phase across tiles.
+
+    Outputs go to .tmp files that are renamed once snaphu succeeded, so a
+    partial output is never taken for a finished one.
+    """
+    lines = [
+        f"OUTFILE {pair_dir}/filt_fine.unw.tmp",
+        f"CONNCOMPFILE {pair_dir}/filt_fine.unw.conncomp.tmp",
+        "INFILEFORMAT COMPLEX_DATA",
+        f"CORRFILE {pair_dir}/filt_fine.cor",
+        "CORRFILEFORMAT FLOAT_DATA",
+        "OUTFILEFORMAT ALT_LINE_DATA",
+        f"STATCOSTMODE {cost_mode}",
+        f"TILEDIR {pair_dir}/snaphu_tiles",
+    ]
+    lines += [f"{key} {value}" for key, value in params.items()]
+    with open(path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+    return path
+
+
+def write_conncomp_vrt(path, rows, cols):
+    # snaphu writes connected components as one byte per pixel
+    name = os.path.basename(path)
+    with open(f"{path}.vrt", "w") as f:
+        f.write(
+            f'<VRTDataset rasterXSize="{cols}" rasterYSize="{rows}">\n'
+            f'  <VRTRasterBand dataType="Byte" band="1" subClass="VRTRawRasterBand">\n'
+            f'    <SourceFilename relativeToVRT="1">{name}</SourceFilename>\n'
+            f"    <ImageOffset>0</ImageOffset>\n"
+            f"    <PixelOffset>1</PixelOffset>\n"
+            f"    <LineOffset>{cols}</LineOffset>\n"
+            f"  </VRTRasterBand>\n"
+            f"</VRTDataset>\n"
+        )
+    return f"{path}.vrt"
+
+
+def write_unw_vrt(path, rows, cols):
+    """
+    VRT sidecar for snaphu ALT_LINE_DATA output: float32 amplitude and phase
+    lines interleaved (ISCE .unw layout), as bands 1 and 2.
+    """
+    name = os.path.basename(path)
+    bands = []
+    for i, offset in enumerate((0, 4 * cols)):
+        bands.append(
+            f'  <VRTRasterBand dataType="Float32" band="{i + 1}" subClass="VRTRawRasterBand">\n'
+            f'    <SourceFilename relativeToVRT="1">{name}</SourceFilename>\n'
+            f"    <ByteOrder>LSB</ByteOrder>\n"
+            f"    <ImageOffset>{offset}</ImageOffset>\n"
+            f"    <PixelOffset>4</PixelOffset>\n"
+            f"    <LineOffset>{8 * cols}</LineOffset>\n"
+            f"  </VRTRasterBand>\n"
+        )
+    with open(f"{path}.vrt", "w") as f:
+        f.write(f'<VRTDataset rasterXSize="{cols}" rasterYSize="{rows}">\n')
+        f.write("".join(bands))
+        f.write("</VRTDataset>\n")
+    return f"{path}.vrt"
+
+
+def get_pairs(interferograms_dir=INTERFEROGRAMS_DIR):
+    return sorted(
+        os.path.basename(os.path.dirname(p))
+        for p in glob.glob(os.path.join(interferograms_dir, "*", "filt_fine.int"))
+    )
+
+
+def find_snaphu(run_cmd=None):
+    # SNAPHU_BIN, else one built by install_snaphu.sh, else None
+    run_cmd = run_cmd or es.frameworks.isce2.run_cmd
+    for path in (SNAPHU_BIN, INSTALLED_SNAPHU_BIN):
+        if run_cmd(scheduler.wrap_cmd(f"command -v {path} > /dev/null")) == 0:
+            return path
+    return None
+
+
+def get_snaphu(run_cmd=None):
+    """
+    snaphu binary in the container. The ISCE2 image does not necessarily ship
+    one, so it is built on first use (install_snaphu.sh). Raises
+    CalledProcessError when that build fails.
+    """
+    run_cmd = run_cmd or es.frameworks.isce2.run_cmd
+    snaphu = find_snaphu(run_cmd)
+    if snaphu is None:
+        logger.info(f"{SNAPHU_BIN} not found, building it in the container")
+        cmd = (
+            "bash /workspace/workflows/interferograms/install_snaphu.sh "
+            f"{SNAPHU_INSTALL_DIR}"
+        )
+        exit_code = run_cmd(cmd)
+        if exit_code:
+            raise subprocess.CalledProcessError(exit_code, cmd)
+        snaphu = INSTALLED_SNAPHU_BIN
+    return snaphu
+
+
+def finish_pair(unw_path, rows, cols):
+    # Moves the outputs of a successful snaphu run into place
+    for path in (f"{unw_path}.conncomp", unw_path):
+        if os.path.exists(f"{path}.tmp"):
+            os.replace(f"{path}.tmp", path)
+    write_conncomp_vrt(f"{unw_path}.conncomp", rows, cols)
+    write_unw_vrt(unw_path, rows, cols)
+
+
+@tracing.trace("interferograms.unwrap")
+def unwrap_interferograms(
+    max_memory_gb=None,
+    max_cpus=None,
+    overlap=DEFAULT_OVERLAP,
+    cost_mode="DEFO",
+    interferograms_dir=INTERFEROGRAMS_DIR,
+    run_cmd=None,
+    isce_fallback=None,
+):
+    """
+    Unwraps every merged/interferograms/<pair>/filt_fine.int with snaphu
+    within a memory budget (defaults to the scheduler budgets). Each pair gets
+    a tiling that fits the budget; pairs then run through the scheduler's
+    resource pool, concurrently where the budget allows. Pairs whose .unw is
+    newer than the interferogram are skipped.
+
+    snaphu is built in the container when it has none. If that fails, the
+    run stops, unless isce_fallback (default: EDK_SAR_ISCE_UNWRAP_FALLBACK)
+    allows ISCE2's own untiled run_*_unwrap step, whose memory the budget
+    does not bound.
+    """
+    max_memory_gb = max_memory_gb or scheduler.MAX_MEMORY_GB
+    max_cpus = max_cpus or scheduler.MAX_CPUS
+    if isce_fallback is None:
+        isce_fallback = ISCE_UNWRAP_FALLBACK
+    try:
+        snaphu = get_snaphu(run_cmd)
+    except subprocess.CalledProcessError as exc:
+        if not isce_fallback:
+            raise RuntimeError(
+                f"No snaphu binary in the container and building it failed ({exc}); "
+                "set EDK_SAR_SNAPHU to one, or EDK_SAR_ISCE_UNWRAP_FALLBACK=1 "
+                "to run ISCE2's untiled unwrapping without a memory bound"
+            ) from exc
+        logger.warning("snaphu unavailable, running the untiled ISCE2 unwrap step")
+        scheduler.execute_run_files(
+            max_cpus=max_cpus,
+            max_memory_gb=max_memory_gb,
+            run_cmd=run_cmd,
+            include=["unwrap"],
+        )
+        return
+    pool = scheduler.ResourcePool(max_cpus, max_memory_gb)
+
+    # Commands grouped by their (cpus, memory) needs
+    jobs = {}
+    for pair in get_pairs(interferograms_dir):
+        int_path = os.path.join(interferograms_dir, pair, "filt_fine.int")
+        unw_path = os.path.join(interferograms_dir, pair, "filt_fine.unw")
+        if os.path.exists(unw_path) and os.path.getmtime(unw_path) >= os.path.getmtime(
+            int_path
+        ):
+            continue
+
+        rows, cols = get_dims(int_path)
+        params, memory_gb = choose_tiling(
+            rows, cols, max_memory_gb, max_cpus, overlap=overlap
+        )
+        logger.info(
+            f"Unwrapping {pair}: {rows}x{cols}, "
+            f"{params['NTILEROW']}x{params['NTILECOL']} tiles, "
+            f"{params['NPROC']} processes, ~{memory_gb:.1f} GB"
+        )
+
+        pair_dir = f"{CONTAINER_INTERFEROGRAMS_DIR}/{pair}"
+        write_snaphu_config(
+            os.path.join(interferograms_dir, pair, "snaphu.conf"),
+            pair_dir,
+            params,
+            cost_mode=cost_mode,
+        )
+        os.makedirs(
+            os.path.join(interferograms_dir, pair, "snaphu_tiles"), exist_ok=True
+        )
+        cmd = f"{snaphu} -f {pair_dir}/snaphu.conf " f"{pair_dir}/filt_fine.int {cols}"
+        jobs.setdefault((params["NPROC"], memory_gb), []).append(
+            (cmd, unw_path, rows, cols)
+        )
+
+    for (cpus, memory_gb), group in jobs.items():
+        failed = scheduler.run_commands(
+            [cmd for cmd, *_ in group], pool, cpus, memory_gb, run_cmd=run_cmd
+        )
+        failed_cmds = {cmd for cmd, _ in failed}
+        for cmd, unw_path, rows, cols in group:
+            if cmd not in failed_cmds:
+                finish_pair(unw_path, rows, cols)
+        if failed:
+            for cmd, code in failed:
+                logger.error(f"Command failed with exit code {code}: {cmd}")
+            raise RuntimeError(f"{len(failed)} unwrapping command(s) failed")
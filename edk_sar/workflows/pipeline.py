@@ -0,0 +1,123 @@
+import os
+import json
+import time
+import hashlib
+import logging
+from edk_sar import tracing
+
+logger = logging.getLogger(__name__)
+
+
+class Stage:
+    """
+    A workflow step.
+
+    func is called with the pipeline context dict and its return value is
+    stored under the stage name (and checkpointed, so skipped stages still
+    provide it). inputs is a JSON-serialisable value, or a callable taking the
+    context, that is fingerprinted; outputs are host paths that must exist for
+    the stage to count as complete. Stages with always=True (e.g. ones whose
+    effect lives inside the container) run every time without invalidating
+    the stages after them.
+    """
+
+    def __init__(self, name, func, inputs=None, outputs=None, always=False):
+        self.name = name
+        self.func = func
+        self.inputs = inputs
+        self.outputs = outputs or []
+        self.always = always
+
+    def get_inputs(self, ctx):
+        if callable(self.inputs):
+            return self.inputs(ctx)
+        return self.inputs
+
+    def fingerprint(self, ctx):
+        payload = json.dumps(
+            {"name": self.name, "inputs": self.get_inputs(ctx)},
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha1(payload.encode()).hexdigest()
+
+    def outputs_exist(self):
+        return all(os.path.exists(p) for p in self.outputs)
+
+
+class Pipeline:
+    """
+    Runs stages in order, checkpointing each one to state_path.
+
+    A stage is skipped when it completed before with the same fingerprint and
+    its outputs still exist. Once a stage actually runs, every later stage runs
+    too, so a failed run resumes from the first incomplete stage.
+    """
+
+    def __init__(self, stages, state_path):
+        self.stages = stages
+        self.state_path = state_path
+
+    def load_state(self):
+        if not os.path.exists(self.state_path):
+            return {}
+        try:
+            with open(self.state_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            logger.warning(f"Ignoring unreadable pipeline state {self.state_path}")
+            return {}
+
+    def save_state(self, state):
+        os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(state, f, indent=2, default=str)
+        os.replace(tmp_path, self.state_path)
+
+    def run(self, force=False, ctx=None):
+        ctx = {} if ctx is None else ctx
+        state = self.load_state()
+        dirty = force
+
+        for stage in self.stages:
+            fingerprint = stage.fingerprint(ctx)
+            record = state.get(stage.name)
+
+            if (
+                not dirty
+                and not stage.always
+                and record is not None
+                and record.get("status") == "done"
+                and record.get("fingerprint") == fingerprint
+                and stage.outputs_exist()
+            ):
+                logger.info(f"Skipping stage {stage.name} (up to date)")
+                ctx[stage.name] = record.get("result")
+                continue
+
+            if not stage.always:
+                dirty = True
+            logger.info(f"Running stage {stage.name}")
+            start = time.time()
+            state[stage.name] = {"status": "running", "fingerprint": fingerprint}
+            self.save_state(state)
+            try:
+                with tracing.trace(stage.name):
+                    result = stage.func(ctx)
+            except BaseException:
+                state[stage.name]["status"] = "failed"
+                self.save_state(state)
+                logger.error(f"Stage {stage.name} failed, rerun to resume from here")
+                raise
+
+            ctx[stage.name] = result
+            state[stage.name] = {
+                "status": "done",
+                "fingerprint": fingerprint,
+                "result": result,
+                "duration": time.time() - start,
+            }
+            self.save_state(state)
+
+        return ctx
@@ -0,0 +1,185 @@
+import os
+import re
+import shlex
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import edk_sar as es
+from edk_sar import tracing
+from edk_sar.constants import DATA_DIR
+
+logger = logging.getLogger(__name__)
+
+RUN_FILES_DIR = os.path.join(DATA_DIR, "stack", "run_files")
+CONTAINER_STACK_DIR = "/data/stack"
+
+ISCE_ENV = (
+    "export ISCE_STACK=/tmp/repos/isce2/contrib/stack; "
+    "export PYTHONPATH=${PYTHONPATH}:${ISCE_STACK}; "
+    "export PATH=${PATH}:${ISCE_STACK}/topsStack"
+)
+
+# Budgets for concurrently running commands; default to the whole machine
+MAX_CPUS = int(os.environ.get("EDK_SAR_MAX_CPUS", os.cpu_count() or 1))
+MAX_MEMORY_GB = float(
+    os.environ.get(
+        "EDK_SAR_MAX_MEMORY_GB",
+        os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") / 1024**3,
+    )
+)
+
+# Rough per-command (cpus, memory GB) needs by run file name. Unwrapping and
+# merging work on full-frame rasters, per-burst steps are light.
+STEP_RESOURCES = [
+    ("unwrap", (1, 16.0)),
+    ("merge", (1, 8.0)),
+    ("filter_coherence", (1, 4.0)),
+    ("generate_burst_igram", (1, 2.0)),
+    ("resample", (1, 2.0)),
+    ("geo2rdr", (1, 2.0)),
+    ("topo", (2, 4.0)),
+]
+DEFAULT_RESOURCES = (1, 1.0)
+
+
+def get_run_files(run_files_dir=RUN_FILES_DIR):
+    # run_01_..., run_02_..., in execution order
+    names = [
+        n
+        for n in os.listdir(run_files_dir)
+        if re.match(r"^run_\d+_", n) and "." not in n
+    ]
+    return sorted(names, key=lambda n: int(n.split("_")[1]))
+
+
+def parse_run_file(path):
+    """
+    Returns the run file as a list of groups of independent commands. ISCE2
+    separates groups that must run one after the other with 'wait'.
+    """
+    groups = [[]]
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if line == "wait":
+                groups.append([])
+                continue
+            groups[-1].append(line.rstrip("&").strip())
+    return [g for g in groups if g]
+
+
+def get_step_resources(step_name, resources=None):
+    for pattern, res in (resources or []) + STEP_RESOURCES:
+        if pattern in step_name:
+            return res
+    return DEFAULT_RESOURCES
+
+
+class ResourcePool:
+    """
+    Admission control on CPU and memory budgets. A request larger than the
+    whole budget is still admitted when nothing else runs, so it can't deadlock.
+    """
+
+    def __init__(self, max_cpus, max_memory_gb):
+        self.max_cpus = max_cpus
+        self.max_memory_gb = max_memory_gb
+        self.cpus = 0
+        self.memory_gb = 0.0
+        self.running = 0
+        self._cond = threading.Condition()
+
+    def _fits(self, cpus, memory_gb):
+        if self.running == 0:
+            return True
+        return (
+            self.cpus + cpus <= self.max_cpus
+            and self.memory_gb + memory_gb <= self.max_memory_gb
+        )
+
+    def acquire(self, cpus, memory_gb):
+        with self._cond:
+            self._cond.wait_for(lambda: self._fits(cpus, memory_gb))
+            self.cpus += cpus
+            self.memory_gb += memory_gb
+            self.running += 1
+
+    def release(self, cpus, memory_gb):
+        with self._cond:
+            self.cpus -= cpus
+            self.memory_gb -= memory_gb
+            self.running -= 1
+            self._cond.notify_all()
+
+
+def wrap_cmd(cmd, cpus=1):
+    # Run inside the stack directory with the ISCE env and a bounded OpenMP pool
+    script = (
+        f"{ISCE_ENV}; export OMP_NUM_THREADS={cpus}; cd {CONTAINER_STACK_DIR}; {cmd}"
+    )
+    return f"bash -c {shlex.quote(script)}"
+
+
+def run_commands(cmds, pool, cpus, memory_gb, run_cmd=None):
+    """
+    Runs independent commands concurrently within the pool budgets. Returns the
+    list of (cmd, exit_code) that failed.
+    """
+    run_cmd = run_cmd or es.frameworks.isce2.run_cmd
+
+    def _run(cmd):
+        pool.acquire(cpus, memory_gb)
+        try:
+            return run_cmd(wrap_cmd(cmd, cpus))
+        finally:
+            pool.release(cpus, memory_gb)
+
+    max_workers = max(1, min(len(cmds), pool.max_cpus // max(cpus, 1)))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        exit_codes = list(executor.map(_run, cmds))
+
+    return [(c, code) for c, code in zip(cmds, exit_codes) if code]
+
+
+def execute_run_files(
+    run_files_dir=RUN_FILES_DIR,
+    max_cpus=None,
+    max_memory_gb=None,
+    resources=None,
+    run_cmd=None,
+    exclude=None,
+    include=None,
+):
+    """
+    Executes the generated ISCE2 run files in order. Steps stay sequential, but
+    the commands inside a step run concurrently as far as the CPU and memory
+    budgets allow. resources is an optional list of (pattern, (cpus, memory_gb))
+    overriding STEP_RESOURCES; run files matching any pattern in exclude are
+    skipped (e.g. steps replaced by an edk-sar stage), and with include only
+    the run files matching one of its patterns are run.
+    """
+    pool = ResourcePool(max_cpus or MAX_CPUS, max_memory_gb or MAX_MEMORY_GB)
+
+    for step in get_run_files(run_files_dir):
+        if any(pattern in step for pattern in exclude or []) or (
+            include is not None and not any(pattern in step for pattern in include)
+        ):
+            logger.info(f"Skipping {step}")
+            continue
+        cpus, memory_gb = get_step_resources(step, resources)
+        groups = parse_run_file(os.path.join(run_files_dir, step))
+        n_cmds = sum(len(g) for g in groups)
+        logger.info(
+            f"Executing {step}: {n_cmds} commands "
+            f"({cpus} cpu, {memory_gb:g} GB each)"
+        )
+
+        with tracing.trace(step, commands=n_cmds):
+            for cmds in groups:
+                failed = run_commands(cmds, pool, cpus, memory_gb, run_cmd=run_cmd)
+                if failed:
+                    for cmd, code in failed:
+                        logger.error(f"Command failed with exit code {code}: {cmd}")
+                    raise RuntimeError(f"{len(failed)} command(s) failed in {step}")
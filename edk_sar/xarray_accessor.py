@@ -4,6 +4,11 @@ import xarray as xr
 import rasterio
 import numpy as np
 from edk_sar import edk_datashader
+from edk_sar import cog
+from edk_sar import geocoding
+from edk_sar import insar
+from edk_sar import tracing
+from edk_sar.constants import SENTINEL_WAVELENGTH
 from osgeo import gdal
 
 gdal.UseExceptions()
@@ -11,158 +16,162 @@ gdal.UseExceptions()
 logger = logging.getLogger(__name__)
 
 
-def get_gdal_dtype(numpy_dtype):
-    # Map numpy data types to GDAL data types
-    numpy_to_gdal_dtype = {
-        np.uint8: gdal.GDT_Byte,
-        np.uint16: gdal.GDT_UInt16,
-        np.int16: gdal.GDT_Int16,
-        np.uint32: gdal.GDT_UInt32,
-        np.int32: gdal.GDT_Int32,
-        np.float32: gdal.GDT_Float32,
-        np.float64: gdal.GDT_Float64,
-        np.complex64: gdal.GDT_CFloat32,
-        np.complex128: gdal.GDT_CFloat64,
-    }
-    # Convert numpy dtype objects to their type
-    if hasattr(numpy_dtype, "type"):
-        numpy_dtype = numpy_dtype.type
-
-    return numpy_to_gdal_dtype.get(
-        numpy_dtype, gdal.GDT_Float32
-    )  # Default to Float32 if type not found
-
-
 @xr.register_dataarray_accessor("edk")
 class EDKAccessor:
     def __init__(self, xarray_obj):
         self._obj = xarray_obj
 
-    def geocode(self, lon_rdr, lat_rdr):
+    @tracing.trace("EDKAccessor.geocode")
+    def geocode(
+        self, lon_rdr, lat_rdr, use_index=True, max_memory=None, out_path=None
+    ):
+        """
+        Geocode a (band, y, x) radar-geometry DataArray onto a regular lon/lat grid.
+
+        With use_index=True the radar-to-geo lookup table for lon_rdr/lat_rdr is
+        built once, cached on disk and reused by every later call on the same
+        geometry. use_index=False runs a full GDAL geolocation warp instead.
+
+        Passing max_memory (bytes) streams the source in row windows (dask chunks
+        are never loaded whole) instead of calling .values on the full array;
+        out_path additionally backs the output with a memory-mapped file.
+        """
         da_src = self._obj
 
-        # 1) Create an in-memory GDAL source from the DataArray
-        arr = da_src.values
-        nb, ny, nx = arr.shape
-
-        mem_tif = "/vsimem/src.tif"
-        tif_ds = gdal.GetDriverByName("GTiff").Create(
-            mem_tif,
-            nx,
-            ny,
-            nb,
-            get_gdal_dtype(arr.dtype),
-            options=["TILED=YES", "COMPRESS=DEFLATE"],
-        )
-        for i in range(nb):
-            tif_ds.GetRasterBand(i + 1).WriteArray(arr[i])
-        tif_ds.FlushCache()
-        tif_ds = None  # close
-
-        # No geotransform/projection on source (curvilinear); we'll supply GEOLOCATION arrays via VRT.
-
-        # 2) Wrap the MEM dataset in a /vsimem/ VRT
-        vrt_path = "/vsimem/src.vrt"
-        vrt_ds = gdal.Translate(vrt_path, mem_tif, format="VRT")  # no georef required
-        if vrt_ds is None:
-            raise RuntimeError("Translate to VRT failed")
-
-        # 2) Add GEOLOCATION metadata once (applies to all bands)
-        from osgeo import osr
-
-        # Create SRS object
-        srs = osr.SpatialReference()
-        srs.ImportFromEPSG(4326)
-        wkt_4326 = srs.ExportToWkt()
-
-        # Add GEOLOCATION metadata
-        vrt_ds.SetMetadata(
-            {
-                "X_DATASET": lon_rdr,
-                "X_BAND": "1",
-                "Y_DATASET": lat_rdr,
-                "Y_BAND": "1",
-                "PIXEL_OFFSET": "0",
-                "LINE_OFFSET": "0",
-                "PIXEL_STEP": "1",
-                "LINE_STEP": "1",
-                "SRS": wkt_4326, 
-            },
-            "GEOLOCATION",
-        )
+        if use_index:
+            index = geocoding.get_geolocation_index(lon_rdr, lat_rdr)
+            return index.geocode(da_src, max_memory=max_memory, out_path=out_path)
+        if max_memory is not None or out_path is not None:
+            raise ValueError("Streaming geocode requires use_index=True")
 
+        return geocoding.warp(da_src, lon_rdr, lat_rdr)
 
-        vrt_ds.FlushCache()
+    @tracing.trace("EDKAccessor.phase")
+    def phase(self, out=None, max_memory=None):
+        """
+        Interferometric phase (radians) of a complex DataArray, in the matching
+        real dtype (complex64 -> float32). Dask arrays stay lazy; otherwise the
+        result is computed window by window into out (a NumPy array of the
+        same shape) when given.
+        """
+        return insar.phase(self._obj, out=out, max_memory=max_memory)
 
-        # 4) Warp the VRT entirely in memory
-        warped_ds = gdal.Warp(
-            "",
-            vrt_ds,
-            format="MEM",
-            dstSRS="EPSG:4326",
-            multithread=True,
-        )
-        vrt_ds = None  # close
-
-        # 6) Read the data and build an xarray.DataArray WITHOUT rasterio
-        out_arr = warped_ds.ReadAsArray()
-        if nb == 1:
-            out_arr = np.array([out_arr])
-
-        gt = warped_ds.GetGeoTransform()  # (x0, dx, rx, y0, ry, dy)
-        # Build 1D x/y coords for north-up rasters (rx == ry == 0). Warp above uses north-up.
-
-        x0, dx, rx, y0, ry, dy = gt
-        nx_out = warped_ds.RasterXSize
-        ny_out = warped_ds.RasterYSize
-        # Pixel-center coordinates
-        x = x0 + dx * (np.arange(nx_out) + 0.5)
-        y = y0 + dy * (np.arange(ny_out) + 0.5)  # dy negative for north-up; that’s fine
-        # Create DataArray; name & attrs carried from source if available
-        da_warped = xr.DataArray(
-            out_arr,
-            dims=("band", "lat", "lon"),
-            coords={"band": 1 + np.arange(nb), "lat": y, "lon": x},
-            name=getattr(da_src, "name", None),
+    @tracing.trace("EDKAccessor.amplitude")
+    def amplitude(self, out=None, max_memory=None):
+        """
+        Magnitude of a complex DataArray; same dtype and out handling as phase.
+        """
+        return insar.amplitude(self._obj, out=out, max_memory=max_memory)
+
+    @tracing.trace("EDKAccessor.los_displacement")
+    def los_displacement(
+        self, wavelength=SENTINEL_WAVELENGTH, out=None, max_memory=None
+    ):
+        """
+        Line-of-sight displacement (meters) from a complex interferogram or a
+        phase DataArray, computed in one pass without promoting float32.
+        """
+        return insar.los_displacement(
+            self._obj, wavelength=wavelength, out=out, max_memory=max_memory
         )
 
-        # Cleanup (you can unlink now if you don’t need bytes again)
-        gdal.Unlink(vrt_path)
+    @tracing.trace("EDKAccessor.coherence")
+    def coherence(
+        self, other, window=(5, 5), tile_rows=512, max_workers=None, out=None
+    ):
+        """
+        Windowed coherence between this complex SLC (or stack of SLCs) and a
+        coregistered other of the same shape. window is (azimuth, range) pixels;
+        tiles of tile_rows rows are processed on max_workers threads. Returns
+        float32, written into out when given.
+        """
+        return insar.coherence(
+            self._obj,
+            other,
+            window=window,
+            tile_rows=tile_rows,
+            max_workers=max_workers,
+            out=out,
+        )
 
-        # Close datasets
-        warped_ds = None
-        vrt_ds = None
-        tif_ds = None
+    @tracing.trace("EDKAccessor.multilook")
+    def multilook(self, azimuth_looks, range_looks, lon_rdr=None, lat_rdr=None):
+        """
+        Block-average azimuth_looks x range_looks pixels (complex data is
+        averaged as complex). Lazy on dask arrays.
 
-        return da_warped
+        When lon_rdr/lat_rdr are given, multilooked copies are written next to
+        them and (da, lon_ml, lat_ml) is returned, ready for geocode.
+        """
+        result = insar.multilook(self._obj, azimuth_looks, range_looks)
+        if lon_rdr is None and lat_rdr is None:
+            return result
+        lon_ml, lat_ml = insar.multilook_geometry(
+            lon_rdr, lat_rdr, azimuth_looks, range_looks
+        )
+        return result, lon_ml, lat_ml
 
     # TODO: Add legend block
-    def plot(self, colors="linear", opacity=0.8):
-        da = self._obj
-
-        # Extract and preprocess data
-        if np.iscomplexobj(da):
-            logger.info("Found complex object, will plot phase")
-            da = xr.apply_ufunc(np.angle, da)  # phase for complex data
+    @tracing.trace("EDKAccessor.plot")
+    def plot(self, colors="linear", opacity=0.8, inspect=None):
+        """
+        colors: a colormap name ("linear", "cyclic", "diverging" or a colorcet
+        palette) or a list of colors. Complex data is plotted as phase.
 
-        m = edk_datashader.Datashader(da)
+        inspect: optional {name: DataArray} of extra geocoded layers (2-D or
+        stacks such as (date, lat, lon)) whose values are shown on tap.
+        """
+        m = edk_datashader.Datashader(
+            self._obj, inspect=inspect, colors=colors, opacity=opacity
+        )
         return m.plot()
 
-    def export(self, output_path: str, compress="LZW"):
+    @tracing.trace("EDKAccessor.export")
+    def export(
+        self,
+        output_path: str,
+        compress="LZW",
+        num_threads="ALL_CPUS",
+        streaming=False,
+        max_memory=None,
+    ):
         """
         Export the geocoded DataArray to a GeoTIFF (COG recommended).
+
+        Compression uses num_threads threads and a predictor chosen from the
+        dtype. With streaming=True the array is written window by window (dask
+        chunks are computed one at a time) and overviews are built as the
+        windows are written, instead of materializing the full array.
         """
         da = self._obj
         if not hasattr(da, "lon") or not hasattr(da, "lat"):
             raise ValueError(
                 "DataArray must be geocoded (have lon/lat coords) before export."
             )
+        if "lon" not in da.dims or "lat" not in da.dims:
+            # e.g. readers/timeseries outputs: 2-D lon/lat on radar (y, x)
+            raise ValueError(
+                "DataArray is in radar geometry (lon/lat are not dimensions); "
+                "geocode it first, e.g. "
+                "da.edk.geocode(da.attrs['lon_rdr'], da.attrs['lat_rdr'])."
+            )
 
         # Create parent directory if it doesn't exist
         output_dir = os.path.dirname(output_path)
         if output_dir and not os.path.exists(output_dir):
             os.makedirs(output_dir, exist_ok=True)
 
+        if streaming:
+            cog.write_cog(
+                da,
+                output_path,
+                compress=compress,
+                num_threads=num_threads,
+                max_memory=max_memory or cog.DEFAULT_MAX_MEMORY,
+            )
+            print(f"[OK] DataArray exported as COG: {output_path}")
+            return output_path
+
         # Tell rioxarray which are the spatial dims
         da_to_save = da.rio.set_spatial_dims(x_dim="lon", y_dim="lat", inplace=False)
 
@@ -170,5 +179,55 @@ class EDKAccessor:
         da_to_save.rio.write_crs("EPSG:4326", inplace=True)
 
         # Export as GeoTIFF
-        da_to_save.rio.to_raster(output_path, driver="COG", compress=compress)
+        options = {"compress": compress, "num_threads": num_threads}
+        predictor = cog.get_predictor(da.dtype, compress)
+        if predictor:
+            options["predictor"] = predictor
+        da_to_save.rio.to_raster(output_path, driver="COG", **options)
         print(f"[OK] DataArray exported as COG: {output_path}")
+        return output_path
+
+
+@xr.register_dataset_accessor("edk")
+class EDKDatasetAccessor:
+    def __init__(self, xarray_obj):
+        self._obj = xarray_obj
+
+    @tracing.trace("EDKDatasetAccessor.geocode")
+    def geocode(self, lon_rdr, lat_rdr, use_index=True, max_memory=None):
+        """
+        Geocode all data variables in one pass; the geolocation transform and
+        output grid are computed once and shared by every variable.
+        """
+        return geocoding.geocode_dataset(
+            self._obj, lon_rdr, lat_rdr, use_index=use_index, max_memory=max_memory
+        )
+
+    @tracing.trace("EDKDatasetAccessor.plot")
+    def plot(self, colors=None, opacity=0.8, inspect=None):
+        """
+        One map with every 2-D data variable as a toggleable layer. colors and
+        opacity apply to all layers or are given per layer as {name: value}.
+        """
+        layers = {
+            name: da for name, da in self._obj.data_vars.items() if da.ndim == 2
+        }
+        m = edk_datashader.Datashader(
+            layers, inspect=inspect, colors=colors, opacity=opacity
+        )
+        return m.plot()
+
+    @tracing.trace("EDKDatasetAccessor.export")
+    def export(self, output_dir, max_workers=None, **kwargs):
+        """
+        Export every data variable to <output_dir>/<name>.tif concurrently.
+        Extra keyword arguments go to EDKAccessor.export.
+        """
+        names = list(self._obj.data_vars)
+        paths = [os.path.join(output_dir, f"{name}.tif") for name in names]
+        return cog.export_many(
+            [self._obj[name] for name in names],
+            paths,
+            max_workers=max_workers,
+            **kwargs,
+        )
@@ -54,12 +54,11 @@ def run_mount_etna_workflow():
     print("[OK] Geocoding complete")
 
     # Compute phase from complex interferogram
-    phase = xr.apply_ufunc(np.angle, geocoded_interferogram)
-    geocoded_phase = phase.edk.geocode()
+    geocoded_phase = geocoded_interferogram.edk.phase()
     print(f"Phase range: {geocoded_phase.min().values:.3f} to {geocoded_phase.max().values:.3f}")
 
     # Compute LOS displacement
-    displacement = (geocoded_phase * WAVELENGTH) / (4 * np.pi)
+    displacement = geocoded_phase.edk.los_displacement(WAVELENGTH)
     displacement.attrs.update({
         "units": "meters",
         "description": "Line-of-sight displacement over Mount Etna"
@@ -0,0 +1,71 @@
+import zipfile
+from edk_sar.workflows import catalog
+
+
+def write_slc(path, start, lon=10.0, lat=45.0):
+    # Minimal SAFE zip: manifest and one annotation with a geolocation grid
+    stamp = start.replace("-", "").replace(":", "")
+    name = f"S1A_IW_SLC__1SDV_{stamp}_{stamp}_054321_069ABC_1A2B.SAFE"
+    points = "".join(
+        "<geolocationGridPoint>"
+        f"<latitude>{lat + dy}</latitude><longitude>{lon + dx}</longitude>"
+        "</geolocationGridPoint>"
+        for dx in (0, 1)
+        for dy in (0, 1)
+    )
+    with zipfile.ZipFile(path, "w") as zf:
+        zf.writestr(
+            f"{name}/manifest.safe",
+            '<m xmlns:safe="s"><safe:relativeOrbitNumber>117'
+            "</safe:relativeOrbitNumber></m>",
+        )
+        zf.writestr(
+            f"{name}/annotation/s1a-iw1-slc-vv-{stamp.lower()}-001.xml",
+            f"<product><geolocationGrid>{points}</geolocationGrid></product>",
+        )
+    return str(path)
+
+
+def test_query_date_bounds_are_inclusive(tmp_path):
+    slc_dir = tmp_path / "slcs"
+    slc_dir.mkdir()
+    paths = {
+        day: write_slc(slc_dir / f"{day}.zip", f"2024-06-{day}T05:12:00")
+        for day in ("29", "30")
+    }
+    write_slc(slc_dir / "01.zip", "2024-07-01T05:12:00")
+
+    cat = catalog.Catalog(str(tmp_path / "catalog.sqlite"))
+    assert cat.update(str(slc_dir), max_workers=1) == 3
+
+    rows = cat.query(start="2024-06-30", end="2024-06-30")
+    assert [r["path"] for r in rows] == [paths["30"]]
+
+    rows = cat.query(bbox=(10.2, 45.2, 10.4, 45.4), end="2024-06-30")
+    assert [r["path"] for r in rows] == [paths["29"], paths["30"]]
+
+    # Bounds with a time are exact
+    assert cat.query(end="2024-06-30T05:11:59") == cat.query(end="2024-06-29")
+    assert len(cat.query(start="2024-06-30T05:12:00")) == 2
+
+
+def test_unreadable_zips_are_not_reparsed(tmp_path, monkeypatch):
+    slc_dir = tmp_path / "slcs"
+    slc_dir.mkdir()
+    write_slc(slc_dir / "good.zip", "2024-06-30T05:12:00")
+    (slc_dir / "broken.zip").write_bytes(b"not a zip")
+
+    calls = []
+    get_slc_metadata = catalog.get_slc_metadata
+
+    def counting(path):
+        calls.append(path)
+        return get_slc_metadata(path)
+
+    monkeypatch.setattr(catalog, "get_slc_metadata", counting)
+    cat = catalog.Catalog(str(tmp_path / "catalog.sqlite"))
+    assert cat.update(str(slc_dir), max_workers=1) == 2
+    assert len(cat.query()) == 1
+
+    assert cat.update(str(slc_dir), max_workers=1) == 0
+    assert len(calls) == 2
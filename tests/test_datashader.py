@@ -0,0 +1,56 @@
+import os
+import numpy as np
+import pytest
+import xarray as xr
+from edk_sar import edk_datashader
+from edk_sar.edk_datashader import Pyramid, PyramidGrid
+
+
+def make_layer(value, shape=(50, 70)):
+    lat = np.linspace(46.0, 45.0, shape[0])
+    lon = np.linspace(10.0, 11.5, shape[1])
+    arr = np.random.default_rng(value).random(shape).astype(np.float32) + value
+    arr[:3, :3] = np.nan
+    return xr.DataArray(arr, dims=("lat", "lon"), coords={"lat": lat, "lon": lon})
+
+
+@pytest.mark.filterwarnings("ignore:Mean of empty slice")
+def test_layers_share_one_grid(tmp_path):
+    layers = [make_layer(i) for i in range(3)]
+    grid = PyramidGrid.from_dataarray(layers[0], cache_dir=str(tmp_path), min_size=20)
+    assert grid.shapes == [(50, 70), (25, 35), (13, 18)]
+
+    pyramids = [
+        Pyramid.from_dataarray(da, cache_dir=str(tmp_path), grid=grid) for da in layers
+    ]
+    # Coordinates are stored once, per layer only values from level 1 up
+    assert os.listdir(tmp_path / "pyramids") == [os.path.basename(grid.path)]
+    for pyramid in pyramids:
+        files = sorted(os.listdir(pyramid.path))
+        assert files == ["level_1.npy", "level_2.npy", "levels.json"]
+        assert os.path.dirname(pyramid.path) == grid.path
+        for k in range(grid.n_levels):
+            assert pyramid.levels[k][0] is grid.levels[k][0]
+
+    da = layers[1]
+    level_1 = pyramids[1].levels[1][2]
+    expected = np.nanmean(
+        np.asarray(da).reshape(25, 2, 35, 2), axis=(1, 3), dtype=np.float64
+    )
+    np.testing.assert_allclose(level_1[1:], expected[1:], rtol=1e-6)
+    assert np.isnan(level_1[0, 0])
+
+    # Level 0 reads the layer itself
+    x, y, values = pyramids[1].window(0)
+    np.testing.assert_array_equal(values, np.asarray(da))
+    assert len(x) == 70 and len(y) == 50
+
+    # A second build reuses the cached grid and values
+    grid = PyramidGrid.from_dataarray(da, cache_dir=str(tmp_path), min_size=20)
+    again = Pyramid.from_dataarray(da, cache_dir=str(tmp_path), grid=grid)
+    assert again.path == pyramids[1].path
+    assert edk_datashader.get_fingerprint(da) == os.path.basename(again.path)
+
+    # Another level count is another grid, with its own values
+    coarse = Pyramid.from_dataarray(da, cache_dir=str(tmp_path))
+    assert coarse.n_levels == 1 and coarse.path != again.path
@@ -0,0 +1,28 @@
+import pytest
+from edk_sar.workflows.base import dem
+
+
+def write_isce_tile(tile_dir, reference):
+    tile_dir.mkdir()
+    (tile_dir / "dem.wgs84.vrt").write_text("<VRTDataset/>")
+    (tile_dir / "dem.wgs84.xml").write_text(
+        "<imageFile>"
+        '<property name="reference"><value>' + reference + "</value></property>"
+        "</imageFile>"
+    )
+    return str(tile_dir / "dem.wgs84.vrt")
+
+
+def test_tiles_must_be_ellipsoid_heights(tmp_path):
+    ellipsoid = write_isce_tile(tmp_path / "N37E014", "WGS84")
+    geoid = write_isce_tile(tmp_path / "N37E015", "EGM96")
+    hgt = tmp_path / "N38E014.hgt"
+    hgt.write_bytes(b"")
+
+    assert dem.get_vertical_reference(ellipsoid) == "ellipsoid"
+    assert dem.get_vertical_reference(geoid) == "geoid"
+    assert dem.get_vertical_reference(str(hgt)) == "geoid"
+
+    dem.check_ellipsoid_heights([ellipsoid])
+    with pytest.raises(ValueError, match="N37E015.*N38E014.hgt"):
+        dem.check_ellipsoid_heights([ellipsoid, geoid, str(hgt)])
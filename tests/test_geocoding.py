@@ -0,0 +1,81 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import xarray as xr
+from edk_sar import geocoding
+
+
+def make_index(src_shape=(6, 5), dst_shape=(4, 4), seed=0):
+    rng = np.random.default_rng(seed)
+    n_dst = dst_shape[0] * dst_shape[1]
+    dst_index = np.sort(rng.choice(n_dst, n_dst - 3, replace=False))
+    src_index = rng.integers(0, src_shape[0] * src_shape[1], len(dst_index))
+    return geocoding.GeolocationIndex(
+        src_shape, dst_shape, (10.0, 0.1, 0.0, 20.0, 0.0, -0.1), src_index, dst_index
+    )
+
+
+def test_geocode_dataset_mixed_2d_3d(monkeypatch):
+    index = make_index()
+    monkeypatch.setattr(geocoding, "get_geolocation_index", lambda *args: index)
+
+    rng = np.random.default_rng(1)
+    ny, nx = index.src_shape
+    coherence = rng.random((ny, nx)).astype(np.float32)
+    stack = rng.random((3, ny, nx)).astype(np.float32)
+    mask = rng.integers(0, 100, (ny, nx)).astype(np.int16)
+    ds = xr.Dataset(
+        {
+            "coherence": (("y", "x"), coherence),
+            "phase": (("date", "y", "x"), stack),
+            "mask": (("y", "x"), mask),
+        },
+        coords={"date": [10, 20, 30]},
+    )
+    # Chunked input and a tiny budget go through several row windows
+    ds["lazy"] = ds["coherence"].chunk({"y": 2})
+
+    out = geocoding.geocode_dataset(ds, "lon.rdr", "lat.rdr", max_memory=64)
+
+    assert out["coherence"].dims == ("lat", "lon")
+    assert out["mask"].dims == ("lat", "lon")
+    assert out["phase"].dims == ("date", "lat", "lon")
+    assert "band" not in out.dims
+    assert list(out["date"].values) == [10, 20, 30]
+    assert out["mask"].dtype == np.int16
+    assert out["coherence"].dtype == np.float32
+
+    np.testing.assert_array_equal(out["coherence"], index.apply(coherence[None])[0])
+    np.testing.assert_array_equal(out["lazy"], index.apply(coherence[None])[0])
+    np.testing.assert_array_equal(out["mask"], index.apply(mask[None])[0])
+    np.testing.assert_array_equal(out["phase"], index.apply(stack))
+    assert not np.isnan(out["coherence"]).any()
+
+    x, y = index.coords()
+    np.testing.assert_allclose(out["lon"], x)
+    np.testing.assert_allclose(out["lat"], y)
+
+
+def test_geolocation_index_builds_per_geometry(monkeypatch, tmp_path):
+    # Two geometries must build at the same time, one geometry only once
+    barrier = threading.Barrier(2, timeout=5)
+    builds = []
+
+    def build(lon_rdr, lat_rdr):
+        builds.append(lon_rdr)
+        barrier.wait()
+        return make_index()
+
+    monkeypatch.setattr(geocoding, "_indices", {})
+    monkeypatch.setattr(geocoding, "get_index_key", lambda lon, lat: lon)
+    monkeypatch.setattr(geocoding.GeolocationIndex, "build", build)
+
+    with ThreadPoolExecutor(4) as pool:
+        futures = [
+            pool.submit(geocoding.get_geolocation_index, lon, "lat", str(tmp_path))
+            for lon in ("a", "b", "a", "b")
+        ]
+        indices = [f.result() for f in futures]
+
+    assert sorted(builds) == ["a", "b"]
+    assert indices[0] is indices[2] and indices[1] is indices[3]
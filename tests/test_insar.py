@@ -0,0 +1,97 @@
+import numpy as np
+import xarray as xr
+from edk_sar import insar
+
+
+def random_slc(shape, seed):
+    rng = np.random.default_rng(seed)
+    return (rng.normal(size=shape) + 1j * rng.normal(size=shape)).astype(np.complex64)
+
+
+def naive_coherence(slc1, slc2, window):
+    # Direct sums over each (edge-truncated) window
+    ny, nx = slc1.shape
+    hy, hx = window[0] // 2, window[1] // 2
+    out = np.zeros((ny, nx))
+    for y in range(ny):
+        for x in range(nx):
+            ys = slice(max(y - hy, 0), y + window[0] - hy)
+            xs = slice(max(x - hx, 0), x + window[1] - hx)
+            s1 = slc1[ys, xs].astype(np.complex128)
+            s2 = slc2[ys, xs].astype(np.complex128)
+            num = np.abs(np.sum(s1 * np.conj(s2)))
+            den = np.sqrt(np.sum(np.abs(s1) ** 2) * np.sum(np.abs(s2) ** 2))
+            out[y, x] = num / den if den > 0 else 0
+    return out
+
+
+def test_box_sum_matches_direct_sums():
+    arr = np.random.default_rng(0).random((9, 7))
+    for window in ((3, 3), (5, 3), (4, 2), (1, 1)):
+        # Even windows extend one pixel further after the centre
+        hy, hx = (window[0] - 1) // 2, (window[1] - 1) // 2
+        expected = [
+            [
+                arr[
+                    max(y - hy, 0) : y + window[0] - hy,
+                    max(x - hx, 0) : x + window[1] - hx,
+                ].sum()
+                for x in range(7)
+            ]
+            for y in range(9)
+        ]
+        np.testing.assert_allclose(insar.box_sum(arr, window), expected)
+
+
+def test_coherence_matches_naive_reference():
+    shape = (2, 23, 17)
+    slc1 = random_slc(shape, 1)
+    # Partly correlated second image, with a dead patch to hit den == 0
+    slc2 = 0.7 * slc1 + 0.3 * random_slc(shape, 2)
+    slc1[:, :4, :4] = 0
+    window = (5, 3)
+
+    da1 = xr.DataArray(slc1, dims=("pair", "y", "x"))
+    da2 = xr.DataArray(slc2, dims=("pair", "y", "x"))
+    # Small tiles make the halo handling matter
+    coh = insar.coherence(da1, da2, window=window, tile_rows=4, max_workers=2)
+
+    assert coh.dtype == np.float32 and coh.dims == ("pair", "y", "x")
+    for k in range(shape[0]):
+        expected = naive_coherence(slc1[k], slc2[k], window)
+        np.testing.assert_allclose(coh[k], expected, atol=1e-5)
+    assert float(coh.min()) >= 0 and float(coh.max()) <= 1
+
+
+def test_multilook_complex_averages_complex_values():
+    slc = random_slc((2, 7, 10), 3)
+    da = xr.DataArray(slc, dims=("pair", "y", "x"), attrs={"units": "rad"})
+
+    looked = insar.multilook(da, 3, 4)
+    # Remainder rows/cols are trimmed
+    assert looked.shape == (2, 2, 2)
+    assert looked.dtype == np.complex64
+    assert looked.attrs == {"units": "rad", "looks": [3, 4]}
+    expected = slc[:, :6, :8].reshape(2, 2, 3, 2, 4).mean(axis=(2, 4))
+    np.testing.assert_allclose(looked, expected, rtol=1e-6)
+    # Not the mean of the phases
+    assert not np.allclose(
+        np.angle(looked),
+        np.angle(slc[:, :6, :8]).reshape(2, 2, 3, 2, 4).mean(axis=(2, 4)),
+    )
+
+    # Lazy on dask arrays, same result
+    lazy = insar.multilook(da.chunk({"y": 3}), 3, 4)
+    assert lazy.chunks is not None
+    np.testing.assert_allclose(lazy.compute(), expected, rtol=1e-6)
+
+
+def test_multilook_real_skips_nans():
+    arr = np.arange(16, dtype=np.float32).reshape(4, 4)
+    arr[0, 0] = np.nan
+    arr[2:, 2:] = np.nan
+    looked = insar.multilook(xr.DataArray(arr, dims=("y", "x")), 2, 2)
+    assert looked.dtype == np.float32
+    np.testing.assert_allclose(looked[0, 0], (1 + 4 + 5) / 3)
+    np.testing.assert_allclose(looked[1, 0], arr[2:, :2].mean())
+    assert np.isnan(looked[1, 1])
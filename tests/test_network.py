@@ -0,0 +1,69 @@
+import os
+import numpy as np
+from edk_sar.workflows.interferograms import network
+
+
+def stack(n_dates=100, revisit=12):
+    dates = np.datetime64("2024-01-01") + revisit * np.arange(n_dates)
+    bperp = np.random.default_rng(0).normal(0.0, 80.0, n_dates)
+    return dates, bperp
+
+
+def is_connected(n_dates, pairs):
+    i, j = (np.array(x) for x in zip(*pairs))
+    return network._connect(n_dates, i, j) == []
+
+
+def test_select_pairs_strategies():
+    dates, bperp = stack()
+    n_all = len(dates) * (len(dates) - 1) // 2
+
+    sequential = network.select_pairs(dates, bperp, "sequential", n=3)
+    assert len(sequential) == 97 + 98 + 99
+
+    pairs = network.select_pairs(dates, bperp, "small-baseline")
+    assert len(pairs) < n_all // 10
+    assert is_connected(len(dates), pairs)
+    for i, j in pairs:
+        within = (dates[j] - dates[i]) / np.timedelta64(1, "D") <= 48 and abs(
+            bperp[j] - bperp[i]
+        ) <= 150
+        # Anything outside the limits is a bridge between consecutive dates
+        assert within or j == i + 1
+
+    # A 6-day revisit keeps twice as many neighbours within the same window
+    dates, bperp = stack(revisit=6)
+    assert len(network.select_pairs(dates, bperp, "small-baseline")) > len(pairs)
+
+
+def test_connect_bridges_split_network():
+    assert network._connect(4, np.array([0]), np.array([1])) == [(1, 2), (2, 3)]
+    assert network._connect(3, np.array([0, 1]), np.array([1, 2])) == []
+
+    dates, bperp = stack(n_dates=20)
+    bridged = network.select_pairs(dates, bperp, min_coherence=0.99)
+    assert is_connected(len(dates), bridged)
+    pairs = network.select_pairs(dates, bperp, min_coherence=0.99, connect=False)
+    assert set(pairs) < set(bridged)
+
+
+def test_filter_run_files_refreshes_regenerated(tmp_path):
+    def write_run_file(dates):
+        path = tmp_path / "run_16_generate_burst_igram"
+        path.write_text(
+            "".join(f"generate {a}_{b}\n" for a, b in zip(dates, dates[1:]))
+        )
+        return path
+
+    path = write_run_file(["20240101", "20240113", "20240125"])
+    assert network.filter_run_files({"20240101_20240113"}, str(tmp_path)) == 1
+    assert path.read_text() == "generate 20240101_20240113\n"
+    # Filtering again starts from the full list
+    assert network.filter_run_files({"20240113_20240125"}, str(tmp_path)) == 1
+
+    # stackSentinel regenerates the run file for a longer date list
+    path = write_run_file(["20240101", "20240113", "20240125", "20240206"])
+    stamp = os.stat(f"{path}.all").st_mtime_ns + 10**9
+    os.utime(path, ns=(stamp, stamp))
+    assert network.filter_run_files({"20240125_20240206"}, str(tmp_path)) == 2
+    assert path.read_text() == "generate 20240125_20240206\n"
@@ -0,0 +1,110 @@
+import json
+import pytest
+from edk_sar.workflows.pipeline import Pipeline, Stage
+
+
+class FakeStage:
+    # Counts calls and can be told to fail
+    def __init__(self, name, result=None, fail=False):
+        self.name = name
+        self.result = result
+        self.fail = fail
+        self.calls = 0
+
+    def __call__(self, ctx):
+        self.calls += 1
+        if self.fail:
+            raise RuntimeError(f"{self.name} failed")
+        return self.result
+
+
+def make_pipeline(tmp_path, inputs=None, outputs=None):
+    funcs = {name: FakeStage(name, result=f"{name}-out") for name in "abc"}
+    stages = [
+        Stage(
+            name,
+            funcs[name],
+            inputs=(inputs or {}).get(name),
+            outputs=(outputs or {}).get(name),
+        )
+        for name in "abc"
+    ]
+    return Pipeline(stages, str(tmp_path / "state.json")), funcs
+
+
+def calls(funcs):
+    return [funcs[name].calls for name in "abc"]
+
+
+def test_fingerprint_depends_on_inputs():
+    ctx = {"bbox": [1, 2, 3, 4]}
+    stage = Stage("dem", None, inputs=lambda ctx: ctx["bbox"])
+    assert stage.fingerprint(ctx) == Stage("dem", None, [1, 2, 3, 4]).fingerprint({})
+    assert stage.fingerprint(ctx) != stage.fingerprint({"bbox": [1, 2, 3, 5]})
+    assert stage.fingerprint(ctx) != Stage("geo", None, [1, 2, 3, 4]).fingerprint({})
+
+
+def test_skips_completed_stages_and_restores_results(tmp_path):
+    pipeline, funcs = make_pipeline(tmp_path)
+    assert pipeline.run()["c"] == "c-out"
+
+    ctx = pipeline.run()
+    assert calls(funcs) == [1, 1, 1]
+    assert ctx == {"a": "a-out", "b": "b-out", "c": "c-out"}
+
+    pipeline.run(force=True)
+    assert calls(funcs) == [2, 2, 2]
+
+
+def test_changed_inputs_rerun_stage_and_later_ones(tmp_path):
+    pipeline, funcs = make_pipeline(tmp_path, inputs={"b": [1]})
+    pipeline.run()
+
+    pipeline.stages[1].inputs = [2]
+    pipeline.run()
+    assert calls(funcs) == [1, 2, 2]
+
+
+def test_missing_outputs_rerun_stage(tmp_path):
+    output = tmp_path / "b.out"
+    output.write_text("")
+    pipeline, funcs = make_pipeline(tmp_path, outputs={"b": [str(output)]})
+    pipeline.run()
+
+    output.unlink()
+    pipeline.run()
+    assert calls(funcs) == [1, 2, 2]
+
+
+def test_always_stage_runs_without_invalidating_later_ones(tmp_path):
+    pipeline, funcs = make_pipeline(tmp_path)
+    pipeline.stages[0].always = True
+    pipeline.run()
+    pipeline.run()
+    assert calls(funcs) == [2, 1, 1]
+
+
+def test_resumes_from_failed_stage(tmp_path):
+    pipeline, funcs = make_pipeline(tmp_path)
+    funcs["b"].fail = True
+    with pytest.raises(RuntimeError, match="b failed"):
+        pipeline.run()
+    assert calls(funcs) == [1, 1, 0]
+
+    with open(tmp_path / "state.json") as f:
+        state = json.load(f)
+    assert state["a"]["status"] == "done"
+    assert state["b"]["status"] == "failed"
+    assert "c" not in state
+
+    funcs["b"].fail = False
+    ctx = pipeline.run()
+    assert calls(funcs) == [1, 2, 1]
+    assert ctx["a"] == "a-out"
+
+
+def test_unreadable_state_runs_everything(tmp_path):
+    pipeline, funcs = make_pipeline(tmp_path)
+    (tmp_path / "state.json").write_text("{not json")
+    pipeline.run()
+    assert calls(funcs) == [1, 1, 1]
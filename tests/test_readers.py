@@ -0,0 +1,97 @@
+import numpy as np
+import pytest
+from edk_sar import readers
+
+
+def make_bands(n_bands=3, rows=4, cols=5):
+    return np.arange(n_bands * rows * cols, dtype=np.float32).reshape(
+        n_bands, rows, cols
+    )
+
+
+def interleave(bands, scheme):
+    # (band, row, col) in the file order of each ISCE scheme
+    axes = {"BSQ": (0, 1, 2), "BIL": (1, 0, 2), "BIP": (1, 2, 0)}[scheme]
+    return np.ascontiguousarray(bands.transpose(axes))
+
+
+def write_isce_xml(path, rows, cols, n_bands, scheme, data_type="FLOAT"):
+    props = {
+        "length": rows,
+        "width": cols,
+        "number_bands": n_bands,
+        "data_type": data_type,
+        "scheme": scheme,
+        "byte_order": "l",
+    }
+    body = "".join(
+        f'<property name="{k}"><value>{v}</value></property>' for k, v in props.items()
+    )
+    with open(f"{path}.xml", "w") as f:
+        f.write(f"<imageFile>{body}</imageFile>")
+
+
+@pytest.mark.parametrize("scheme", ["BIL", "BIP", "BSQ"])
+def test_parse_isce_xml_band_offsets(tmp_path, scheme):
+    bands = make_bands()
+    path = str(tmp_path / "raster.bin")
+    interleave(bands, scheme).tofile(path)
+    write_isce_xml(path, 4, 5, 3, scheme)
+
+    for band in (1, 2, 3):
+        layout = readers.parse_isce_xml(f"{path}.xml", band)
+        assert layout.path == path and layout.shape == (4, 5)
+        np.testing.assert_array_equal(layout.memmap(), bands[band - 1])
+        np.testing.assert_array_equal(readers.open_raster(path, band), bands[band - 1])
+
+
+def test_parse_vrt_big_endian_bil(tmp_path):
+    # Two-band BIL like filt_fine.unw (amplitude, phase), big-endian
+    bands = make_bands(n_bands=2)
+    path = tmp_path / "filt_fine.unw"
+    interleave(bands, "BIL").astype(">f4").tofile(path)
+    cols, size = 5, 4
+    band_xml = "".join(
+        f'<VRTRasterBand dataType="Float32" band="{b + 1}" '
+        'subClass="VRTRawRasterBand">'
+        '<SourceFilename relativeToVRT="1">filt_fine.unw</SourceFilename>'
+        "<ByteOrder>MSB</ByteOrder>"
+        f"<ImageOffset>{b * cols * size}</ImageOffset>"
+        f"<PixelOffset>{size}</PixelOffset>"
+        f"<LineOffset>{2 * cols * size}</LineOffset>"
+        "</VRTRasterBand>"
+        for b in range(2)
+    )
+    (tmp_path / "filt_fine.unw.vrt").write_text(
+        f'<VRTDataset rasterXSize="{cols}" rasterYSize="4">{band_xml}</VRTDataset>'
+    )
+
+    layout = readers.parse_vrt(f"{path}.vrt", band=2)
+    assert layout.path == str(path)
+    assert layout.dtype == np.dtype(">f4")
+    phase = readers.open_raster(str(path), band=2)
+    assert phase.dtype == np.dtype("float32")
+    np.testing.assert_array_equal(phase, bands[1])
+    # Windows only touch the requested pixels
+    np.testing.assert_array_equal(phase[1:3, 2:], bands[1, 1:3, 2:])
+
+
+def test_open_interferograms(tmp_path):
+    rng = np.random.default_rng(0)
+    merged = tmp_path / "merged"
+    stacks = {}
+    for pair in ("20240101_20240113", "20240113_20240125"):
+        pair_dir = merged / "interferograms" / pair
+        pair_dir.mkdir(parents=True)
+        ifg = (rng.random((4, 5)) + 1j * rng.random((4, 5))).astype(np.complex64)
+        ifg.tofile(pair_dir / "filt_fine.int")
+        write_isce_xml(str(pair_dir / "filt_fine.int"), 4, 5, 1, "BIP", "CFLOAT")
+        stacks.setdefault("interferogram", []).append(ifg)
+
+    ds = readers.open_interferograms(str(merged))
+    assert list(ds.data_vars) == ["interferogram"]
+    assert ds["interferogram"].dims == ("date_pair", "y", "x")
+    assert ds["reference_date"].values[1] == np.datetime64("2024-01-13")
+    np.testing.assert_array_equal(
+        ds["interferogram"], np.stack(stacks["interferogram"])
+    )
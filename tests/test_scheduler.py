@@ -0,0 +1,92 @@
+import time
+import threading
+import pytest
+from edk_sar.workflows import scheduler
+
+
+def test_parse_run_file_groups(tmp_path):
+    path = tmp_path / "run_03_topo"
+    path.write_text(
+        "# generated\n" "cmd a &\n" "cmd b\n" "\n" "wait\n" "cmd c\n" "wait\n" "wait\n"
+    )
+    assert scheduler.parse_run_file(str(path)) == [["cmd a", "cmd b"], ["cmd c"]]
+
+
+def test_get_step_resources():
+    assert scheduler.get_step_resources("run_15_unwrap") == (1, 16.0)
+    assert scheduler.get_step_resources("run_05_merge_reference_secondary_slc") == (
+        1,
+        8.0,
+    )
+    assert scheduler.get_step_resources("run_01_unpack") == (
+        scheduler.DEFAULT_RESOURCES
+    )
+    override = [("unwrap", (4, 32.0))]
+    assert scheduler.get_step_resources("run_15_unwrap", override) == (4, 32.0)
+
+
+class Recorder:
+    # Fake run_cmd tracking how many commands and how much memory run at once
+    def __init__(self, pool=None, fail=()):
+        self.pool = pool
+        self.fail = fail
+        self.lock = threading.Lock()
+        self.running = 0
+        self.max_running = 0
+        self.max_memory_gb = 0.0
+        self.cmds = []
+
+    def __call__(self, cmd):
+        with self.lock:
+            self.cmds.append(cmd)
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+            if self.pool is not None:
+                self.max_memory_gb = max(self.max_memory_gb, self.pool.memory_gb)
+        time.sleep(0.02)
+        with self.lock:
+            self.running -= 1
+        return 1 if any(f in cmd for f in self.fail) else 0
+
+
+def test_resource_pool_admits_within_budgets():
+    pool = scheduler.ResourcePool(max_cpus=8, max_memory_gb=10.0)
+    recorder = Recorder(pool)
+    cmds = [f"cmd {i}" for i in range(12)]
+    assert scheduler.run_commands(cmds, pool, 1, 4.0, run_cmd=recorder) == []
+
+    # CPUs would allow 8, memory only 2 commands of 4 GB
+    assert recorder.max_running == 2
+    assert recorder.max_memory_gb <= 10.0
+    assert len(recorder.cmds) == 12
+    assert pool.running == 0 and pool.cpus == 0 and pool.memory_gb == 0
+
+
+def test_resource_pool_runs_oversized_command_alone():
+    pool = scheduler.ResourcePool(max_cpus=2, max_memory_gb=4.0)
+    recorder = Recorder(pool)
+    failed = scheduler.run_commands(["a", "b"], pool, 1, 16.0, run_cmd=recorder)
+    assert failed == []
+    assert recorder.max_running == 1
+
+
+def test_execute_run_files(tmp_path):
+    (tmp_path / "run_01_unpack").write_text("unpack a\nunpack b\n")
+    (tmp_path / "run_02_topo").write_text("topo\nwait\ngeo2rdr\n")
+    (tmp_path / "run_10_unwrap").write_text("unwrap a\n")
+    (tmp_path / "run_02_topo.all").write_text("ignored\n")
+
+    recorder = Recorder()
+    scheduler.execute_run_files(
+        str(tmp_path), 4, 16.0, run_cmd=recorder, exclude=["unwrap"]
+    )
+    cmds = [c.rsplit("; ", 1)[1].rstrip("'") for c in recorder.cmds]
+    assert sorted(cmds[:2]) == ["unpack a", "unpack b"]
+    assert cmds[2:] == ["topo", "geo2rdr"]
+
+    recorder = Recorder(fail=["unwrap"])
+    with pytest.raises(RuntimeError, match="1 command"):
+        scheduler.execute_run_files(
+            str(tmp_path), 4, 16.0, run_cmd=recorder, include=["unwrap"]
+        )
+    assert len(recorder.cmds) == 1
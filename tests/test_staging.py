@@ -0,0 +1,50 @@
+import os
+from edk_sar.workflows.base import staging
+
+
+def test_checksum_skip_hashes_only_changed_copies(monkeypatch, tmp_path):
+    src_dir, dest_dir = tmp_path / "src", tmp_path / "dest"
+    src_dir.mkdir()
+    srcs = []
+    for i in range(3):
+        path = src_dir / f"S1A_{i}.zip"
+        path.write_bytes(bytes([i]) * 1024)
+        srcs.append(str(path))
+
+    # Force full copies so the staged files are independent of the sources
+    def no_link(src, dest):
+        raise OSError("cross-device link")
+
+    monkeypatch.setattr(staging.os, "link", no_link)
+    monkeypatch.setattr(staging, "_reflink", no_link)
+    hashed = []
+    get_checksum = staging.get_checksum
+
+    def counting_checksum(path):
+        hashed.append(os.path.basename(path))
+        return get_checksum(path)
+
+    monkeypatch.setattr(staging, "get_checksum", counting_checksum)
+
+    stats = staging.stage_files(srcs, str(dest_dir), checksum=True)
+    assert stats["copy"] == 3 and len(hashed) == 3
+
+    # Unchanged: skipped without hashing anything
+    hashed.clear()
+    assert staging.stage_files(srcs, str(dest_dir), checksum=True)["skipped"] == 3
+    assert hashed == []
+
+    # Touched but intact: hashed once, then trusted again
+    touched = dest_dir / "S1A_0.zip"
+    os.utime(touched, ns=(0, 10**9))
+    assert staging.stage_files(srcs, str(dest_dir), checksum=True)["skipped"] == 3
+    assert hashed == ["S1A_0.zip"]
+    hashed.clear()
+    assert staging.stage_files(srcs, str(dest_dir), checksum=True)["skipped"] == 3
+    assert hashed == []
+
+    # Corrupted staged copy of the same size: detected and staged again
+    (dest_dir / "S1A_1.zip").write_bytes(b"\xff" * 1024)
+    stats = staging.stage_files(srcs, str(dest_dir), checksum=True)
+    assert stats["skipped"] == 2 and stats["copy"] == 1
+    assert (dest_dir / "S1A_1.zip").read_bytes() == bytes([1]) * 1024
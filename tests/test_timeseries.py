@@ -0,0 +1,97 @@
+import numpy as np
+import pytest
+import xarray as xr
+from edk_sar import timeseries
+
+DATES = np.datetime64("2024-01-01") + 12 * np.arange(5)
+# Small-baseline network over 5 dates: every date with its 2 next ones
+PAIRS = [(0, 1), (0, 2), (1, 2), (1, 3), (2, 3), (2, 4), (3, 4)]
+
+
+def test_design_matrix():
+    A, dates = timeseries.get_design_matrix(
+        DATES[[i for i, _ in PAIRS]], DATES[[j for _, j in PAIRS]]
+    )
+    np.testing.assert_array_equal(dates, DATES)
+    assert A.shape == (7, 4)
+    # First date is the zero reference
+    np.testing.assert_array_equal(A[0], [1, 0, 0, 0])
+    np.testing.assert_array_equal(A[3], [-1, 0, 1, 0])
+
+
+def test_pattern_solver_masked_pixels():
+    A, _ = timeseries.get_design_matrix(
+        DATES[[i for i, _ in PAIRS]], DATES[[j for _, j in PAIRS]]
+    )
+    rng = np.random.default_rng(0)
+    truth = rng.normal(size=(4, 6))
+    phase = A @ truth
+    valid = np.ones(phase.shape, bool)
+    valid[1, 2] = False  # still connected
+    valid[[0, 2, 4], 3] = False  # still connected
+    valid[:, 5] = False  # nothing left
+
+    solver = timeseries.PatternSolver(A)
+    solved = solver.solve(np.where(valid, phase, 0), valid)
+    np.testing.assert_allclose(solved[:, :5], truth[:, :5], atol=1e-10)
+    assert np.isnan(solved[:, 5]).all()
+
+    # Masking every pair touching date 2 splits the network: minimum norm
+    valid = np.ones((7, 1), bool)
+    valid[[1, 2, 4, 5], 0] = False
+    solved = solver.solve(np.where(valid, phase[:, :1], 0), valid)
+    np.testing.assert_allclose(solved[[0, 2, 3], 0], truth[[0, 2, 3], 0])
+    assert solved[1, 0] == pytest.approx(0)
+
+
+def make_stack(ny=6, nx=4):
+    rng = np.random.default_rng(1)
+    displacement = np.cumsum(rng.normal(size=(5, ny, nx)), axis=0)
+    displacement -= displacement[0]
+    ref, sec = [i for i, _ in PAIRS], [j for _, j in PAIRS]
+    phase = (displacement[sec] - displacement[ref]).astype(np.float32)
+    coherence = np.ones(phase.shape, np.float32)
+    stack = xr.Dataset(
+        {
+            "unwrapped_phase": (("date_pair", "y", "x"), phase),
+            "coherence": (("date_pair", "y", "x"), coherence),
+        },
+        coords={
+            "date_pair": [f"p{k}" for k in range(len(PAIRS))],
+            "reference_date": ("date_pair", DATES[ref]),
+            "secondary_date": ("date_pair", DATES[sec]),
+        },
+    )
+    return stack, displacement
+
+
+def test_invert_recovers_displacement(tmp_path):
+    stack, displacement = make_stack()
+    # Low coherence on one pair of one pixel drops it there only
+    stack["coherence"][3, 2, 1] = 0.1
+    # Small chunks go through several workers' row windows
+    out = timeseries.invert(
+        stack,
+        str(tmp_path / "ts.npy"),
+        wavelength=4 * np.pi,
+        max_workers=2,
+        chunk_memory=1,
+    )
+    assert out.dims == ("date", "y", "x")
+    np.testing.assert_allclose(out, displacement, atol=1e-5)
+
+
+def test_invert_rejects_nan_reference_pixel(tmp_path):
+    stack, _ = make_stack()
+    stack["unwrapped_phase"][4, 0, 0] = np.nan
+    with pytest.raises(ValueError, match="1 of 7 interferograms \\(p4\\)"):
+        timeseries.invert(stack, str(tmp_path / "ts.npy"), reference_pixel=(0, 0))
+
+
+def test_row_bytes_cover_float64_working_set():
+    stack, _ = make_stack(nx=100)
+    row_bytes = timeseries.get_row_bytes(
+        stack["unwrapped_phase"], stack["coherence"], 5
+    )
+    # float32 phase and coherence, float64 phase and copy, masks, solution
+    assert row_bytes == 100 * (7 * (4 + 4 + 8 + 8 + 2) + 4 * 16)
@@ -0,0 +1,76 @@
+import subprocess
+import pytest
+from edk_sar.workflows import scheduler
+from edk_sar.workflows.interferograms import unwrap
+
+
+def test_snaphu_bytes_per_pixel_from_its_arrays():
+    assert unwrap.SNAPHU_BYTES_PER_PIXEL == sum(unwrap.SNAPHU_PIXEL_BYTES.values())
+    # A Sentinel-1 merged interferogram at full resolution, untiled
+    assert unwrap.estimate_memory_gb(13000, 68000) == pytest.approx(
+        13000 * 68000 * 114 / 1024**3
+    )
+
+
+@pytest.mark.parametrize("budget_gb,cpus", [(64, 16), (16, 8), (8, 2), (4, 1)])
+def test_choose_tiling_fits_budget(budget_gb, cpus):
+    rows, cols = 13000, 68000
+    params, memory_gb = unwrap.choose_tiling(rows, cols, budget_gb, cpus)
+    assert memory_gb <= budget_gb
+    assert 1 <= params["NPROC"] <= cpus
+    assert params["NTILEROW"] * params["NTILECOL"] > 1
+
+
+def test_choose_tiling_small_interferogram_untiled():
+    params, memory_gb = unwrap.choose_tiling(2000, 3000, 64, 8)
+    assert params["NTILEROW"] == params["NTILECOL"] == 1
+    assert memory_gb == unwrap.estimate_memory_gb(2000, 3000)
+
+
+def test_choose_tiling_impossible_budget():
+    with pytest.raises(ValueError, match="Cannot unwrap"):
+        unwrap.choose_tiling(13000, 68000, 0.01, 4)
+
+
+class FakeContainer:
+    # run_cmd without snaphu; the install script exits with install_code
+    def __init__(self, install_code):
+        self.install_code = install_code
+        self.cmds = []
+
+    def __call__(self, cmd):
+        self.cmds.append(cmd)
+        if "install_snaphu.sh" in cmd:
+            return self.install_code
+        return 1
+
+
+def test_missing_snaphu_is_built():
+    container = FakeContainer(install_code=0)
+    assert unwrap.get_snaphu(container) == unwrap.INSTALLED_SNAPHU_BIN
+    assert any("install_snaphu.sh /data/tools/snaphu" in c for c in container.cmds)
+
+
+def test_failed_snaphu_build_stops_without_fallback(monkeypatch, tmp_path):
+    executed = []
+    monkeypatch.setattr(
+        scheduler, "execute_run_files", lambda **kwargs: executed.append(kwargs)
+    )
+
+    with pytest.raises(RuntimeError, match="EDK_SAR_ISCE_UNWRAP_FALLBACK"):
+        unwrap.unwrap_interferograms(
+            interferograms_dir=str(tmp_path),
+            run_cmd=FakeContainer(install_code=2),
+            isce_fallback=False,
+        )
+    assert executed == []
+
+    # Opt-in: ISCE2's own unwrap run files
+    unwrap.unwrap_interferograms(
+        interferograms_dir=str(tmp_path),
+        run_cmd=FakeContainer(install_code=2),
+        isce_fallback=True,
+    )
+    assert executed[0]["include"] == ["unwrap"]
+    with pytest.raises(subprocess.CalledProcessError):
+        unwrap.get_snaphu(FakeContainer(install_code=2))